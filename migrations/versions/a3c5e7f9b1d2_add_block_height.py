@@ -0,0 +1,32 @@
+"""Add block height to transaction and payout_tx
+
+Revision ID: a3c5e7f9b1d2
+Revises: e4f8a9b2c1d8
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e7f9b1d2'
+down_revision = 'e4f8a9b2c1d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('block_height', sa.Integer(), nullable=True))
+
+    with op.batch_alter_table('payout_tx', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('block_height', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('payout_tx', schema=None) as batch_op:
+        batch_op.drop_column('block_height')
+
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_column('block_height')
@@ -0,0 +1,61 @@
+"""Typed state and timestamps for bitcoin_lightning_invoice
+
+Revision ID: b7d2e4f6a8c0
+Revises: a3c5e7f9b1d2
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e4f6a8c0'
+down_revision = 'a3c5e7f9b1d2'
+branch_labels = None
+depends_on = None
+
+lightninginvoicestate = sa.Enum(
+    'OPEN', 'SETTLED', 'CANCELED', 'ACCEPTED', name='lightninginvoicestate'
+)
+timestamp_columns = ('expiry', 'creation_date', 'settle_date')
+
+
+def upgrade():
+    lightninginvoicestate.create(op.get_bind(), checkfirst=True)
+
+    with op.batch_alter_table('bitcoin_lightning_invoice', schema=None) as batch_op:
+        batch_op.alter_column(
+            'state',
+            existing_type=sa.String(),
+            type_=lightninginvoicestate,
+            postgresql_using='state::lightninginvoicestate',
+        )
+        for column in timestamp_columns:
+            batch_op.alter_column(
+                column,
+                existing_type=sa.String(),
+                type_=sa.BigInteger(),
+                postgresql_using=f'{column}::bigint',
+            )
+        batch_op.create_index(
+            'ix_bli_state_sent_to_shkeeper', ['state', 'sent_to_shkeeper']
+        )
+        batch_op.create_index(
+            'ix_bli_state_creation_date', ['state', 'creation_date']
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('bitcoin_lightning_invoice', schema=None) as batch_op:
+        batch_op.drop_index('ix_bli_state_creation_date')
+        batch_op.drop_index('ix_bli_state_sent_to_shkeeper')
+        for column in timestamp_columns:
+            batch_op.alter_column(
+                column, existing_type=sa.BigInteger(), type_=sa.String()
+            )
+        batch_op.alter_column(
+            'state', existing_type=lightninginvoicestate, type_=sa.String()
+        )
+
+    lightninginvoicestate.drop(op.get_bind(), checkfirst=True)
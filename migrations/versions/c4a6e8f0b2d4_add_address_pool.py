@@ -0,0 +1,43 @@
+"""Add address_pool
+
+Revision ID: c4a6e8f0b2d4
+Revises: b7d2e4f6a8c0
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a6e8f0b2d4'
+down_revision = 'b7d2e4f6a8c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() runs before the upgrade and may have created it already
+    if sa.inspect(op.get_bind()).has_table('address_pool'):
+        return
+
+    op.create_table(
+        'address_pool',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('crypto', sa.String(), nullable=False),
+        sa.Column('addr', sa.String(), nullable=False),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('crypto', 'addr'),
+    )
+    op.create_index(
+        'ix_address_pool_crypto_claimed_at',
+        'address_pool',
+        ['crypto', 'claimed_at'],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_address_pool_crypto_claimed_at', table_name='address_pool')
+    op.drop_table('address_pool')
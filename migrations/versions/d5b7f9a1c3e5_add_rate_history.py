@@ -0,0 +1,44 @@
+"""Add rate_history
+
+Revision ID: d5b7f9a1c3e5
+Revises: c4a6e8f0b2d4
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5b7f9a1c3e5'
+down_revision = 'c4a6e8f0b2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() runs before the upgrade and may have created it already
+    if sa.inspect(op.get_bind()).has_table('rate_history'):
+        return
+
+    op.create_table(
+        'rate_history',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('crypto', sa.String(), nullable=False),
+        sa.Column('fiat', sa.String(), nullable=False),
+        sa.Column('resolution', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('rate', sa.Numeric(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('crypto', 'fiat', 'resolution', 'bucket'),
+    )
+    op.create_index(
+        'ix_rate_history_resolution_bucket',
+        'rate_history',
+        ['resolution', 'bucket'],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_rate_history_resolution_bucket', table_name='rate_history')
+    op.drop_table('rate_history')
@@ -0,0 +1,40 @@
+"""Add quote
+
+Revision ID: e6c8a0b2d4f6
+Revises: d5b7f9a1c3e5
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6c8a0b2d4f6'
+down_revision = 'd5b7f9a1c3e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() runs before the upgrade and may have created it already
+    if sa.inspect(op.get_bind()).has_table('quote'):
+        return
+
+    op.create_table(
+        'quote',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('crypto', sa.String(), nullable=False),
+        sa.Column('fiat', sa.String(), nullable=False),
+        sa.Column('amount_fiat', sa.Numeric(), nullable=False),
+        sa.Column('amount_crypto', sa.Numeric(), nullable=False),
+        sa.Column('exchange_rate', sa.Numeric(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_quote_expires_at', 'quote', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_quote_expires_at', table_name='quote')
+    op.drop_table('quote')
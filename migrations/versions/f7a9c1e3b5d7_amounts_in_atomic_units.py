@@ -0,0 +1,108 @@
+"""Store money columns as integer atomic units
+
+Revision ID: f7a9c1e3b5d7
+Revises: e6c8a0b2d4f6
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a9c1e3b5d7'
+down_revision = 'e6c8a0b2d4f6'
+branch_labels = None
+depends_on = None
+
+# scales as of this revision, see shkeeper.services.money
+DEFAULT_PRECISION = 8
+FIAT_PRECISION = 8
+PRECISION = {'XMR': 12}
+
+crypto_columns = {
+    'invoice': ('amount_crypto', 'balance_crypto'),
+    'unconfirmed_transaction': ('amount_crypto',),
+    'transaction': ('amount_crypto',),
+    'payout': ('amount',),
+    'notification': ('amount_crypto',),
+    'quote': ('amount_crypto',),
+}
+fiat_columns = {
+    'invoice': ('amount_fiat', 'balance_fiat'),
+    'transaction': ('amount_fiat',),
+    # exchange rates are stored as fiat amounts
+    'quote': ('amount_fiat', 'exchange_rate'),
+}
+
+
+def _scales(table):
+    crypto_scale = sa.case(
+        *((table.c.crypto == name, 10**places) for name, places in PRECISION.items()),
+        else_=10**DEFAULT_PRECISION,
+    )
+    for column in crypto_columns.get(table.name, ()):
+        yield column, crypto_scale
+    for column in fiat_columns.get(table.name, ()):
+        yield column, 10**FIAT_PRECISION
+
+
+def _table(name):
+    columns = {*crypto_columns.get(name, ()), *fiat_columns.get(name, ())}
+    return sa.table(name, sa.column('crypto'), *map(sa.column, columns))
+
+
+def upgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for name in crypto_columns:
+        table = _table(name)
+        scales = list(_scales(table))
+        # one pass over each table, converting every money column of a row
+        op.execute(
+            table.update().values(
+                {
+                    column: sa.cast(
+                        sa.func.round(table.c[column] * scale), sa.BigInteger
+                    )
+                    for column, scale in scales
+                }
+            )
+        )
+        # SQLite keeps whole numbers in NUMERIC columns as INTEGER already,
+        # changing the declared type would only copy the table
+        if sqlite:
+            continue
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            for column, _ in scales:
+                batch_op.alter_column(
+                    column,
+                    existing_type=sa.Numeric(),
+                    type_=sa.BigInteger(),
+                    postgresql_using=f'{column}::bigint',
+                )
+
+    op.create_index('ix_payout_crypto_amount', 'payout', ['crypto', 'amount'])
+
+
+def downgrade():
+    op.drop_index('ix_payout_crypto_amount', table_name='payout')
+
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for name in crypto_columns:
+        table = _table(name)
+        scales = list(_scales(table))
+        if not sqlite:
+            with op.batch_alter_table(name, schema=None) as batch_op:
+                for column, _ in scales:
+                    batch_op.alter_column(
+                        column, existing_type=sa.BigInteger(), type_=sa.Numeric()
+                    )
+        op.execute(
+            table.update().values(
+                {
+                    # times 1.0, SQLite divides integers with no remainder
+                    column: table.c[column] / (scale * sa.literal(1.0, sa.Numeric))
+                    for column, scale in scales
+                }
+            )
+        )
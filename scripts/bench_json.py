@@ -0,0 +1,65 @@
+"""Compare the stdlib and orjson paths of shkeeper.services.json_codec.
+
+    PYTHONPATH=. python scripts/bench_json.py [rows]
+
+Encodes a /transactions-like payload of ``rows`` items (default 100000) with
+each backend, whole and streamed, and prints the best of five runs.
+"""
+import sys
+import time
+from decimal import Decimal
+
+from shkeeper.services import json_codec
+
+
+def payload(rows):
+    return [
+        {
+            "amount": Decimal("0.00012345") * i,
+            "crypto": "BTC",
+            "addr": f"bc1q{i:038d}",
+            "txid": f"{i:064x}",
+            "status": "CONFIRMED",
+        }
+        for i in range(rows)
+    ]
+
+
+def best_of(fn, runs=5):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    items = payload(rows)
+    backends = ["json"] + (["orjson"] if json_codec.orjson else [])
+    print(f"{rows} rows")
+    for backend in backends:
+        json_codec.configure(backend=backend)
+        whole = best_of(
+            lambda: json_codec.dumpb(
+                {"status": "success", "transactions": items}, sort_keys=True
+            )
+        )
+        streamed = best_of(
+            lambda: b"".join(
+                json_codec.iter_object(
+                    {"status": "success"}, "transactions", items, sort_keys=True
+                )
+            )
+        )
+        print(
+            f"{backend:>7}: dumps {whole * 1000:8.1f} ms,"
+            f" streamed {streamed * 1000:8.1f} ms"
+        )
+    if "orjson" not in backends:
+        print("orjson is not installed, only the stdlib path was measured")
+
+
+if __name__ == "__main__":
+    main()
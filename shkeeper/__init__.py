@@ -1,4 +1,3 @@
-import functools
 import os
 import logging
 import secrets
@@ -13,7 +12,6 @@ flog.default_handler.setFormatter(
 )
 
 from flask import Flask
-import requests
 
 from shkeeper.wallet_encryption import WalletEncryptionRuntimeStatus
 
@@ -78,6 +76,19 @@ def create_app(test_config=None):
         FORCE_WALLET_ENCRYPTION=bool(os.environ.get("FORCE_WALLET_ENCRYPTION")),
         UNCONFIRMED_TX_NOTIFICATION=bool(os.environ.get("UNCONFIRMED_TX_NOTIFICATION")),
         REQUESTS_TIMEOUT=int(os.environ.get("REQUESTS_TIMEOUT", 10)),
+        BACKEND_POOL_SIZE=int(os.environ.get("BACKEND_POOL_SIZE", 16)),
+        BACKEND_TIMEOUTS=os.environ.get("BACKEND_TIMEOUTS", ""),
+        BACKEND_FANOUT_DEADLINE=int(os.environ.get("BACKEND_FANOUT_DEADLINE", 15)),
+        BALANCE_CACHE_TTL=int(os.environ.get("BALANCE_CACHE_TTL", 30)),
+        CHAIN_STATUS_TTL=int(os.environ.get("CHAIN_STATUS_TTL", 10)),
+        BACKEND_BREAKER_WINDOW=int(os.environ.get("BACKEND_BREAKER_WINDOW", 20)),
+        BACKEND_BREAKER_MIN_CALLS=int(os.environ.get("BACKEND_BREAKER_MIN_CALLS", 5)),
+        BACKEND_BREAKER_FAILURE_RATE=float(
+            os.environ.get("BACKEND_BREAKER_FAILURE_RATE", 0.5)
+        ),
+        BACKEND_BREAKER_PROBE_INTERVAL=float(
+            os.environ.get("BACKEND_BREAKER_PROBE_INTERVAL", 5)
+        ),
         REQUESTS_NOTIFICATION_RETRIES=int(os.environ.get("MAX_RETRIES", 7)),
         REQUESTS_NOTIFICATION_TIMEOUT=int(
             os.environ.get("REQUESTS_NOTIFICATION_TIMEOUT", 30)
@@ -94,6 +105,30 @@ def create_app(test_config=None):
             os.environ.get("DISABLE_CRYPTO_WHEN_LAGS", False)
         ),
         EXTRA_CURRENCIES=os.environ.get("EXTRA_CURRENCIES", ""),
+        ADDRESS_POOL_SIZE=int(os.environ.get("ADDRESS_POOL_SIZE", 0)),
+        ADDRESS_POOL_LOW_WATER=int(os.environ.get("ADDRESS_POOL_LOW_WATER", 10)),
+        ADDRESS_POOL_REFILL_BATCH=int(os.environ.get("ADDRESS_POOL_REFILL_BATCH", 20)),
+        RATES_MAX_AGE=int(os.environ.get("RATES_MAX_AGE", 60)),
+        RATES_MAX_STALE=int(os.environ.get("RATES_MAX_STALE", 300)),
+        RATES_CROSS_FX=bool(os.environ.get("RATES_CROSS_FX")),
+        RATES_FX_SOURCE=os.environ.get("RATES_FX_SOURCE", "coinbase"),
+        RATES_AGGREGATE_SOURCES=os.environ.get(
+            "RATES_AGGREGATE_SOURCES", "binance,kraken,coinbase,kucoin"
+        ),
+        RATES_AGGREGATE_QUORUM=int(os.environ.get("RATES_AGGREGATE_QUORUM", 2)),
+        RATES_AGGREGATE_HEDGE_DELAY=float(
+            os.environ.get("RATES_AGGREGATE_HEDGE_DELAY", 0.3)
+        ),
+        RATES_AGGREGATE_TIMEOUT=float(os.environ.get("RATES_AGGREGATE_TIMEOUT", 5)),
+        RATES_AGGREGATE_MAX_DEVIATION=os.environ.get(
+            "RATES_AGGREGATE_MAX_DEVIATION", "0.02"
+        ),
+        RATES_AGGREGATE_WORKERS=int(os.environ.get("RATES_AGGREGATE_WORKERS", 8)),
+        RATE_HISTORY_MINUTE_DAYS=int(os.environ.get("RATE_HISTORY_MINUTE_DAYS", 2)),
+        RATE_HISTORY_HOUR_DAYS=int(os.environ.get("RATE_HISTORY_HOUR_DAYS", 365)),
+        RATE_HISTORY_DAY_DAYS=int(os.environ.get("RATE_HISTORY_DAY_DAYS", 0)),
+        QUOTE_TTL=int(os.environ.get("QUOTE_TTL", 600)),
+        JSON_BACKEND=os.environ.get("JSON_BACKEND", "orjson"),
     )
 
     if app.config.get("DEV_MODE"):
@@ -157,30 +192,69 @@ def create_app(test_config=None):
 
     app.logger.propagate = False
 
-    from flask.json import JSONDecoder, JSONEncoder
-    from decimal import Decimal
-
-    class ShkeeperJSONDecoder(JSONDecoder):
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, parse_float=Decimal, **kwargs)
-
-    class ShkeeperJSONEncoder(JSONEncoder):
-        def default(self, obj):
-            if isinstance(obj, Decimal):
-                return str(obj)
-            return super().default(self, obj)
-
-    app.json_decoder = ShkeeperJSONDecoder
-    app.json_encoder = ShkeeperJSONEncoder
-
-    for method in ("get", "options", "head", "post", "put", "patch", "delete"):
-        setattr(
-            requests,
-            method,
-            functools.partial(
-                getattr(requests, method), timeout=app.config.get("REQUESTS_TIMEOUT")
-            ),
-        )
+    from flask.json.provider import DefaultJSONProvider
+    from .services import json_codec
+
+    json_codec.configure(backend=app.config.get("JSON_BACKEND"))
+
+    class ShkeeperJSONProvider(DefaultJSONProvider):
+        # UTF-8 output, so responses can take the orjson path
+        ensure_ascii = False
+
+        def dumps(self, obj, **kwargs):
+            kwargs.setdefault("default", self.default)
+            kwargs.setdefault("sort_keys", self.sort_keys)
+            kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+            return json_codec.dumps(obj, **kwargs)
+
+        def loads(self, s, **kwargs):
+            return json_codec.loads(s, **kwargs)
+
+    app.json = ShkeeperJSONProvider(app)
+
+    from .services import (
+        address_pool,
+        async_backend,
+        backend_transport,
+        balance_cache,
+        chain_gateway,
+        circuit_breaker,
+        quotes,
+        rate_engine,
+        rate_history,
+    )
+
+    circuit_breaker.configure(
+        window=app.config.get("BACKEND_BREAKER_WINDOW"),
+        min_calls=app.config.get("BACKEND_BREAKER_MIN_CALLS"),
+        failure_rate=app.config.get("BACKEND_BREAKER_FAILURE_RATE"),
+        probe_interval=app.config.get("BACKEND_BREAKER_PROBE_INTERVAL"),
+    )
+    backend_transport.configure(
+        timeout=app.config.get("REQUESTS_TIMEOUT"),
+        pool_size=app.config.get("BACKEND_POOL_SIZE"),
+        timeouts=app.config.get("BACKEND_TIMEOUTS"),
+    )
+    async_backend.init_app(app)
+    chain_gateway.configure(ttl=app.config.get("CHAIN_STATUS_TTL"))
+    balance_cache.configure(ttl=app.config.get("BALANCE_CACHE_TTL"))
+    address_pool.configure(
+        size=app.config.get("ADDRESS_POOL_SIZE"),
+        low_water=app.config.get("ADDRESS_POOL_LOW_WATER"),
+        refill_batch=app.config.get("ADDRESS_POOL_REFILL_BATCH"),
+    )
+    rate_engine.configure(
+        max_age=app.config.get("RATES_MAX_AGE"),
+        max_stale=app.config.get("RATES_MAX_STALE"),
+        cross_fx=app.config.get("RATES_CROSS_FX"),
+        fx_source=app.config.get("RATES_FX_SOURCE"),
+    )
+    quotes.configure(ttl=app.config.get("QUOTE_TTL"))
+    rate_history.configure(
+        minute_days=app.config.get("RATE_HISTORY_MINUTE_DAYS"),
+        hour_days=app.config.get("RATE_HISTORY_HOUR_DAYS"),
+        day_days=app.config.get("RATE_HISTORY_DAY_DAYS"),
+    )
 
     db.init_app(app)
     migrate.init_app(app, db)
@@ -214,6 +288,16 @@ def create_app(test_config=None):
 
         # Register rate sources
         import shkeeper.modules.rates
+        from .modules.rates import aggregate
+
+        aggregate.configure(
+            sources=app.config.get("RATES_AGGREGATE_SOURCES"),
+            quorum=app.config.get("RATES_AGGREGATE_QUORUM"),
+            hedge_delay=app.config.get("RATES_AGGREGATE_HEDGE_DELAY"),
+            timeout=app.config.get("RATES_AGGREGATE_TIMEOUT"),
+            max_deviation=app.config.get("RATES_AGGREGATE_MAX_DEVIATION"),
+            workers=app.config.get("RATES_AGGREGATE_WORKERS"),
+        )
 
         # Register crypto
         from .modules import cryptos
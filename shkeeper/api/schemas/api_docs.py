@@ -12,6 +12,8 @@ from shkeeper.api.schemas.marshmallow_schemas import (
     ErrorPaymentResponseSchema,
     QuoteRequestSchema,
     QuoteResponseSchema,
+    QuotesRequestSchema,
+    QuotesResponseSchema,
     MetricsResponseSchema,
     ErrorSchema,
     PayoutCallbackSchema,
@@ -251,6 +253,42 @@ quote_doc = {
     ],
 }
 
+quotes_doc = {
+    "description": (
+        "Convert a fiat amount to all available cryptos, or to the ones "
+        "listed in 'cryptos', in one call. Quotes are not locked."
+    ),
+    "tags": ["Cryptos"],
+    "security": [{"API_Key": []}],
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": QuotesRequestSchema}},
+    },
+    "responses": {
+        200: {
+            "description": "Success",
+            "content": {"application/json": {"schema": QuotesResponseSchema}},
+        },
+        400: {
+            "description": "Error – no valid cryptos requested",
+            "content": {"application/json": {"schema": ErrorSchema}},
+        },
+    },
+    "x-codeSamples": [
+        {
+            "lang": "cURL",
+            "label": "CLI",
+            "source": (
+                "curl --location --request POST "
+                "'https://demo.shkeeper.io/api/v1/quotes' \\\n"
+                "--header 'X-Shkeeper-API-Key: YOUR_API_KEY' \\\n"
+                "--header 'Content-Type: application/json' \\\n"
+                '--data-raw \'{"fiat":"USD","amount":"100.00","cryptos":["BTC","ETH"]}\'\n'
+            ),
+        }
+    ],
+}
+
 
 balance_doc = {
     "description": (
@@ -131,6 +131,14 @@ class PaymentRequestSchema(Schema):
         example="https://example.com/payment/callback",
         description="URL that will receive payment status callbacks",
     )
+    quote_id = fields.String(
+        required=False,
+        example="5f0c6b1e9a7d4c3b8e2f1a0d9c8b7a6e",
+        description=(
+            "Unexpired quote to take the crypto amount and exchange rate from. "
+            "A quote prices one payment request and can't be reused"
+        ),
+    )
 
 
 class PaymentResponseSchema(Schema):
@@ -224,6 +232,37 @@ class QuoteResponseSchema(Schema):
     status = fields.String(example="success")
     crypto_amount = fields.String()
     exchange_rate = fields.String()
+    quote_id = fields.String(
+        description=(
+            "Pass to one payment_request before expires_at to lock this price, "
+            "the quote is used up by it"
+        )
+    )
+    expires_at = fields.String(example="2026-10-18T19:10:00.000000")
+
+
+class QuotesRequestSchema(Schema):
+    fiat = fields.String(required=True, example="USD")
+    amount = fields.String(required=True, example="10.00")
+    cryptos = fields.List(
+        fields.String(),
+        required=False,
+        example=["BTC", "ETH-USDT"],
+        description="Cryptos to quote, all available cryptos when omitted",
+    )
+
+
+class QuotesItemSchema(Schema):
+    crypto = fields.String(example="BTC")
+    amount_crypto = fields.String(example="0.00016420")
+    exchange_rate = fields.String(example="60901.83")
+
+
+class QuotesResponseSchema(Schema):
+    status = fields.String(example="success")
+    fiat = fields.String(example="USD")
+    amount_fiat = fields.String(example="10.00")
+    quotes = fields.List(fields.Nested(QuotesItemSchema))
 
 
 class BalanceResponseSchema(Schema):
@@ -15,11 +15,11 @@ from shkeeper.modules.cryptos.doge import Doge
 from flask import current_app as app
 from flask.json import JSONDecoder
 from flask_sqlalchemy import sqlalchemy
-from shkeeper import requests
+import requests
+from shkeeper.services import balance_cache, json_codec, quotes, tx_ingest
 from shkeeper.services.payout_service import PayoutService
 from flask_smorest import Blueprint as SmorestBlueprint
 
-from shkeeper import requests
 from shkeeper import db
 from shkeeper.auth import basic_auth_optional, login_required, api_key_required
 from shkeeper.modules.classes.crypto import Crypto
@@ -28,19 +28,20 @@ from shkeeper.modules.classes.ethereum import Ethereum
 from shkeeper.modules.cryptos.bitcoin_lightning import BitcoinLightning
 from shkeeper.modules.cryptos.monero import Monero
 from shkeeper.models import *
-from shkeeper.callback import send_notification, send_unconfirmed_notification
 from shkeeper.utils import format_decimal
 from shkeeper.wallet_encryption import (
     wallet_encryption,
     WalletEncryptionPersistentStatus,
     WalletEncryptionRuntimeStatus,
 )
-from shkeeper.exceptions import NotRelatedToAnyInvoice
+from shkeeper.exceptions import InvalidQuote, NotRelatedToAnyInvoice
+from shkeeper.api.schemas.marshmallow_schemas import QuotesRequestSchema
+from marshmallow import EXCLUDE
 from shkeeper.services.crypto_cache import get_available_cryptos
 from shkeeper.services.balance_service import get_balances
 from functools import wraps
 from shkeeper.api.schemas.api_docs import (
-    crypto_list_doc, crypto_balances_doc, payment_request_doc, quote_doc, 
+    crypto_list_doc, crypto_balances_doc, payment_request_doc, quote_doc, quotes_doc,
     balance_doc, payout_doc, task_status_doc, multipayout_doc, addresses_doc,
     transactions_doc, invoices_doc, tx_info_doc, decryption_key_doc, payout_status_doc,
     transaction_callback_doc, payout_callback_doc
@@ -137,6 +138,9 @@ def payment_request(crypto_name):
         }
         app.logger.info({"request": req, "response": response})
 
+    except InvalidQuote as e:
+        app.logger.info(f"Rejected payment request {req}: {e}")
+        response = {"status": "error", "message": str(e)}
     except Exception as e:
         app.logger.exception(f"Failed to create invoice for {req}")
         response = {
@@ -184,17 +188,18 @@ def get_crypto_quote(crypto_name):
                 "message": "'fiat' and 'amount' are required fields.",
             }
 
-        amount_fiat = Decimal(amount_str)
-        rate = ExchangeRate.get(fiat, crypto.crypto)
-        amount_crypto, exchange_rate = rate.convert(amount_fiat)
+        quote = quotes.create(crypto.crypto, fiat, Decimal(amount_str))
 
         return {
             "status": "success",
             "fiat": fiat,
-            "amount_fiat": str(amount_fiat),
+            # stored to FIAT_PRECISION places, drop the padding zeros
+            "amount_fiat": format_decimal(quote.amount_fiat),
             "crypto": crypto.crypto,
-            "amount_crypto": str(amount_crypto),
-            "exchange_rate": str(exchange_rate),
+            "amount_crypto": str(quote.amount_crypto),
+            "exchange_rate": format_decimal(quote.exchange_rate),
+            "quote_id": quote.id,
+            "expires_at": quote.expires_at.isoformat(),
         }
 
     except Exception as e:
@@ -205,6 +210,46 @@ def get_crypto_quote(crypto_name):
             "traceback": traceback.format_exc(),
         }
 
+@blp_v1.post("/quotes")
+@blp_v1.doc(**quotes_doc)
+@api_key_required
+def get_crypto_quotes():
+    """Return fiat->crypto quotes for all available cryptos or the requested ones."""
+    try:
+        req = request.get_json(force=True)
+        fiat = req.get("fiat")
+        amount_str = req.get("amount")
+
+        if not fiat or not amount_str:
+            return {
+                "status": "error",
+                "message": "'fiat' and 'amount' are required fields.",
+            }
+        # a string would be quoted character by character
+        schema = QuotesRequestSchema(only=("cryptos",), unknown=EXCLUDE)
+        if errors := schema.validate(req):
+            return {"status": "error", "message": f"Invalid request: {errors}"}, 400
+
+        amount_fiat = Decimal(amount_str)
+        results, error = quotes.quote_all(fiat, amount_fiat, req.get("cryptos"))
+        if error:
+            return {"status": "error", "message": error}, 400
+
+        return {
+            "status": "success",
+            "fiat": fiat,
+            "amount_fiat": str(amount_fiat),
+            "quotes": results,
+        }
+
+    except Exception as e:
+        app.logger.exception("Failed to get crypto quotes")
+        return {
+            "status": "error",
+            "message": str(e),
+            "traceback": traceback.format_exc(),
+        }
+
 @blp_v1.get("/<string:crypto_name>/payment-gateway")
 @login_required
 def payment_gateway_get_status(crypto_name):
@@ -383,9 +428,10 @@ def get_fee_deposit_address(crypto_name):
 def status(crypto_name):
     """Return wallet status and on-chain sync state."""
     crypto = Crypto.instances[crypto_name]
+    balance = crypto.cached_balance()
     return {
         "name": crypto.crypto,
-        "amount": format_decimal(crypto.balance()) if crypto.balance() else 0,
+        "amount": format_decimal(balance) if balance else 0,
         "server": crypto.getstatus(),
     }
 
@@ -400,7 +446,8 @@ def balance(crypto_name):
     fiat = "USD"
     rate = ExchangeRate.get(fiat, crypto_name)
     current_rate = rate.get_rate()
-    crypto_amount = format_decimal(crypto.balance()) if crypto.balance() else 0
+    balance = crypto.cached_balance()
+    crypto_amount = format_decimal(balance) if balance else 0
 
     return {
         "name": crypto.crypto,
@@ -465,6 +512,7 @@ def payoutnotify(crypto_name):
 
         data = request.get_json(force=True)
         app.logger.info(f"Payout notification: {data}")
+        balance_cache.invalidate(crypto_name)
         # for p in data:
         #     Payout.add(p, crypto_name)
 
@@ -497,49 +545,9 @@ def walletnotify(crypto_name, txid):
 
         tx_data_from_crypto = crypto.getaddrbytx(txid)
         app.logger.warning(tx_data_from_crypto)
+        balance_cache.invalidate(crypto_name)
 
-        for addr, amount, confirmations, category in tx_data_from_crypto:
-            try:
-                if category not in ("send", "receive"):
-                    app.logger.warning(
-                        f"[{crypto.crypto}/{txid}] ignoring unknown category: {category}"
-                    )
-                    continue
-
-                if category == "send":
-                    Transaction.add_outgoing(crypto, txid)
-                    continue
-
-                if confirmations == 0:
-                    app.logger.info(
-                        f"[{crypto.crypto}/{txid}] TX has no confirmations yet (entered mempool)"
-                    )
-
-                    if app.config.get("UNCONFIRMED_TX_NOTIFICATION"):
-                        utx = UnconfirmedTransaction.add(
-                            crypto_name, txid, addr, amount
-                        )
-                        send_unconfirmed_notification(utx)
-
-                    continue
-
-                tx = Transaction.add(
-                    crypto,
-                    {
-                        "txid": txid,
-                        "addr": addr,
-                        "amount": amount,
-                        "confirmations": confirmations,
-                    },
-                )
-                tx.invoice.update_with_tx(tx)
-                UnconfirmedTransaction.delete(crypto_name, txid)
-                app.logger.info(f"[{crypto.crypto}/{txid}] TX has been added to db")
-                if not tx.need_more_confirmations:
-                    send_notification(tx)
-            except sqlalchemy.exc.IntegrityError as e:
-                app.logger.warning(f"[{crypto.crypto}/{txid}] TX already exist in db")
-                db.session.rollback()
+        tx_ingest.ingest_tx(crypto, txid, tx_data_from_crypto)
         return {"status": "success"}
     except NotRelatedToAnyInvoice:
         app.logger.warning(f"Transaction {txid} is not related to any invoice")
@@ -632,7 +640,12 @@ def backup(crypto_name):
 
     url = crypto.dump_wallet()
     bkey = environ.get(f"SHKEEPER_BTC_BACKEND_KEY")
-    req = requests.get(url, stream=True, headers={"X-SHKEEPER-BACKEND-KEY": bkey})
+    req = requests.get(
+        url,
+        stream=True,
+        headers={"X-SHKEEPER-BACKEND-KEY": bkey},
+        timeout=app.config.get("REQUESTS_TIMEOUT"),
+    )
     headers = Headers()
     headers.add("Content-Type", req.headers["content-type"])
     # headers.add('Content-Disposition', req.headers['Content-Disposition'])
@@ -730,8 +743,11 @@ def list_transactions(crypto, addr):
                 *confirmed,
                 *UnconfirmedTransaction.query.filter_by(crypto=crypto, addr=addr),
             )
-        return jsonify(
-            status="success", transactions=[tx.to_json() for tx in transactions]
+        # serialized here, so a failing row is still answered as an error
+        return json_codec.stream_response(
+            {"status": "success"},
+            "transactions",
+            [tx.to_json() for tx in transactions],
         )
     except Exception as e:
         app.logger.exception(f"Failed to list transactions")
@@ -753,7 +769,9 @@ def list_invoices(external_id):
             invoices = Invoice.query.filter(Invoice.status != "OUTGOING").all()
         else:
             invoices = Invoice.query.filter_by(external_id=external_id)
-        return jsonify(status="success", invoices=[i.to_json() for i in invoices])
+        return json_codec.stream_response(
+            {"status": "success"}, "invoices", [i.to_json() for i in invoices]
+        )
     except Exception as e:
         app.logger.exception(f"Failed to list invoices")
         return {
@@ -773,7 +791,7 @@ def list_payouts(crypto_name):
         if not amount:
             raise Exception("No amount provided.")
 
-        if Payout.query.filter_by(amount=amount).all():
+        if Payout.find_by_amount(crypto_name, amount).first():
             return {"status": "success"}
         else:
             return {
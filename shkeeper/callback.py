@@ -1,7 +1,7 @@
 import click
 from apscheduler.schedulers import SchedulerNotRunningError
 
-from shkeeper import requests
+import requests
 
 from flask import Blueprint, json
 # from flask_smorest import Blueprint as SmorestBlueprint
@@ -9,6 +9,7 @@ from flask import current_app as app
 
 from shkeeper.modules.classes.crypto import Crypto
 from shkeeper.models import *
+from shkeeper.services import balance_cache, rate_history
 from shkeeper.services.webhook_hmac import compact_json_bytes, shkeeper_webhook_auth_headers
 from datetime import datetime, timedelta
 
@@ -208,24 +209,49 @@ def poll_unconfirmed_payouts():
         .all()
     )
     app.logger.info(f"poll_unconfirmed_payouts finished {payouts}")
+    min_confirmations = int(app.config.get("MIN_CONFIRMATION_BLOCK_FOR_PAYOUT"))
+    tips = {}
     for payout in payouts:
         app.logger.info(f"poll_unconfirmed_payouts payout {payout}")
         crypto = Crypto.instances.get(payout.crypto)
         if not crypto:
             continue
+        if payout.crypto not in tips:
+            tips[payout.crypto] = crypto.get_chain_height()
         all_confirmed = False
         tx_to_notify = None
+        to_check = []
         for tx in payout.transactions:
             if not tx or not getattr(tx, "txid", None):
                 app.logger.warning(f"Skipping invalid transaction {tx}")
                 continue
+            confirmations = crypto.confirmations_at_height(
+                tx.block_height, tips[payout.crypto]
+            )
+            if confirmations is not None and confirmations <= min_confirmations:
+                continue
+            to_check.append(tx)
+        try:
+            batch = crypto.get_confirmations_by_txids([tx.txid for tx in to_check])
+        except Exception:
+            batch = {}
+        tip = crypto.get_chain_height(fresh=True) if batch else None
+        for tx in to_check:
             try:
                 app.logger.info(f"poll_unconfirmed_payouts get_confirmations_by_txid {tx.txid}")
-                confirmations = crypto.get_confirmations_by_txid(tx.txid)
+                confirmations = batch.get(tx.txid)
+                tip_after = tip
+                if confirmations is None:
+                    confirmations = crypto.get_confirmations_by_txid(tx.txid)
+                    tip_after = None
                 app.logger.info(f"poll_unconfirmed_payouts confirmations {confirmations}")
             except Exception:
                 continue
-            if confirmations > int(app.config.get("MIN_CONFIRMATION_BLOCK_FOR_PAYOUT")):
+            if confirmations <= min_confirmations:
+                tx.block_height = crypto.block_height_from_confirmations(
+                    confirmations, fresh=True, tip=tip_after
+                )
+            if confirmations > min_confirmations:
                 all_confirmed = True
                 if not tx_to_notify:
                     tx_to_notify = tx
@@ -287,7 +313,9 @@ def send_payout_notification(notif: Notification):
     if not tx_hash:
         app.logger.info(f"[PAYOUT {payout.id}] No tx_hash yet — skipping callback")
         return False
-    rate = ExchangeRate.get(DEFAULT_CURRENCY, payout.crypto).get_rate()
+    rate = rate_history.rate_at(payout.crypto, DEFAULT_CURRENCY, payout.created_at)
+    if rate is None:
+        rate = ExchangeRate.get(DEFAULT_CURRENCY, payout.crypto).get_rate()
     amount_fiat = payout.amount * rate
     payload = {
         "payout_id": payout.id,
@@ -363,23 +391,67 @@ def poll_all_pending_payouts():
             app.logger.info(f"update_from_task {task_response}")
             app.logger.info(f"update_from_task {payout.task_id}")
             Payout.update_from_task(task_response, payout.task_id)
+            balance_cache.invalidate(payout.crypto)
     db.session.commit()
 
 def update_confirmations():
+    pending = {}
     for tx in Transaction.query.filter_by(
         callback_confirmed=False, need_more_confirmations=True
     ):
+        pending.setdefault(tx.crypto, []).append(tx)
+
+    for crypto_name, txs in pending.items():
+        crypto = Crypto.instances.get(crypto_name)
+        to_check = txs
+        if crypto:
+            # Confirmations follow from the chain tip and the recorded block
+            # height. Only txs without a height, possibly reorged or about to
+            # be confirmed are looked up on the backend.
+            tip = crypto.get_chain_height()
+            to_check = []
+            for tx in txs:
+                confirmations = crypto.confirmations_at_height(tx.block_height, tip)
+                if (
+                    confirmations is not None
+                    and confirmations < tx.invoice.wallet.confirmations
+                ):
+                    app.logger.info(
+                        f"[{tx.crypto}/{tx.txid}] Not enough confirmations yet ({confirmations} by block height)"
+                    )
+                    continue
+                to_check.append(tx)
+
+        # One batched lookup per crypto, txids it misses are fetched one by one
+        confirmations = {}
         try:
-            app.logger.info(f"[{tx.crypto}/{tx.txid}] Updating confirmations")
-            if not tx.is_more_confirmations_needed():
-                app.logger.info(f"[{tx.crypto}/{tx.txid}] Got enough confirmations")
-            else:
-                app.logger.info(f"[{tx.crypto}/{tx.txid}] Not enough confirmations yet")
+            if crypto and to_check:
+                confirmations = crypto.get_confirmations_by_txids(
+                    [tx.txid for tx in to_check]
+                )
         except Exception as e:
             app.logger.exception(
-                f"Exception while updating tx confirmations for {tx.crypto}/{tx.txid}"
+                f"[{crypto_name}] Exception while fetching confirmations in batch"
             )
 
+        # Tip taken after the batch, used to record heights of batched txs
+        tip = crypto.get_chain_height(fresh=True) if confirmations else None
+        for tx in to_check:
+            _update_tx_confirmations(tx, confirmations.get(tx.txid), tip)
+
+
+def _update_tx_confirmations(tx, confirmations=None, tip=None):
+    try:
+        app.logger.info(f"[{tx.crypto}/{tx.txid}] Updating confirmations")
+        if not tx.is_more_confirmations_needed(confirmations, tip):
+            app.logger.info(f"[{tx.crypto}/{tx.txid}] Got enough confirmations")
+        else:
+            app.logger.info(f"[{tx.crypto}/{tx.txid}] Not enough confirmations yet")
+    except Exception as e:
+        app.logger.exception(
+            f"Exception while updating tx confirmations for {tx.crypto}/{tx.txid}"
+        )
+
 
 @bp.cli.command()
 def list():
@@ -1,2 +1,13 @@
+import requests
+
+
 class NotRelatedToAnyInvoice(Exception):
     pass
+
+
+class InvalidQuote(Exception):
+    """The quote_id of a payment request can't be used, the message says why."""
+
+
+class BackendUnavailable(requests.exceptions.ConnectionError):
+    """Raised without touching the network while a backend's circuit breaker is open."""
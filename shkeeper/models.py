@@ -5,16 +5,81 @@ import enum
 import json
 import secrets
 from datetime import datetime, timedelta
-from decimal import Decimal
+from decimal import ROUND_DOWN, ROUND_HALF_EVEN, Decimal
 import bcrypt
 import pyotp
 from flask import current_app as app, has_app_context
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import validates
 
 from shkeeper import db
 from shkeeper.modules.classes.rate_source import RateSource
 from shkeeper.modules.classes.crypto import Crypto
+from shkeeper.services import address_pool, balance_cache, money, quotes, rate_engine
 from .utils import format_decimal, remove_exponent
-from .exceptions import NotRelatedToAnyInvoice
+from .exceptions import InvalidQuote, NotRelatedToAnyInvoice
+
+
+def _places(obj, fiat):
+    return money.FIAT_PRECISION if fiat else money.precision(obj.crypto)
+
+
+def amount_column(units, fiat=False, rounding=ROUND_HALF_EVEN):
+    """Decimal view of the atomic-unit column ``units``, see shkeeper.services.money.
+
+    Crypto amounts are scaled by the precision of the row's crypto, fiat
+    amounts by FIAT_PRECISION, digits past it are dropped with ``rounding``.
+    In queries it compares as a float, filter on ``units`` for exact matches.
+    """
+
+    def fget(self):
+        value = getattr(self, units)
+        return None if value is None else money.from_units(value, _places(self, fiat))
+
+    def fset(self, amount):
+        setattr(
+            self,
+            units,
+            (
+                None
+                if amount is None
+                else money.to_units(amount, _places(self, fiat), rounding)
+            ),
+        )
+
+    def expr(cls):
+        if fiat:
+            return getattr(cls, units) / 10.0**money.FIAT_PRECISION
+        return getattr(cls, units) / db.case(
+            *(
+                (cls.crypto == name, 10.0**places)
+                for name, places in money.PRECISION.items()
+            ),
+            else_=10.0**money.DEFAULT_PRECISION,
+        )
+
+    # the ORM labels query columns after the getter
+    fget.__name__ = fset.__name__ = expr.__name__ = units.removesuffix("_units")
+    return hybrid_property(fget, fset, expr=expr)
+
+
+class CryptoAmounts:
+    """Keeps the ``crypto_units`` columns scaled to the row's crypto."""
+
+    crypto_units = ()
+
+    def __init__(self, **kwargs):
+        # set crypto first, so amounts are scaled to it right away
+        if "crypto" in kwargs:
+            self.crypto = kwargs.pop("crypto")
+        super().__init__(**kwargs)
+
+    @validates("crypto")
+    def _rescale_crypto_units(self, key, crypto):
+        old, new = money.precision(self.crypto), money.precision(crypto)
+        for units in self.crypto_units:
+            setattr(self, units, money.rescale(getattr(self, units), old, new))
+        return crypto
 
 
 class User(db.Model):
@@ -187,7 +252,8 @@ class Wallet(db.Model):
         db.session.commit()
 
         crypto = Crypto.instances[self.crypto]
-        balance = crypto.balance()
+        # Always pay out from a fresh balance, this also refreshes the cache
+        balance = crypto.cached_balance(max_age=0)
         if crypto.wallet.prespolicy == PayoutReservePolicy.DISABLE:
             res = crypto.mkpayout(
                 self.pdest, balance, self.pfee, subtract_fee_from_amount=True
@@ -216,6 +282,7 @@ class Wallet(db.Model):
             res = crypto.mkpayout(
                 self.pdest, balance, self.pfee, subtract_fee_from_amount=True
             )
+        balance_cache.invalidate(self.crypto)
         task_id = res.get("task_id")
         app.logger.warning(f"payout do_payt create {res}")
         Payout.add(
@@ -258,12 +325,17 @@ class ExchangeRate(db.Model):
 
     __table_args__ = (db.UniqueConstraint("crypto", "fiat"),)
 
+    @property
+    def rate_source(self):
+        return RateSource.instances.get(
+            self.source, RateSource.instances.get("binance")
+        )
+
     def get_rate(self):
         if self.source == "manual":
             return self.rate
 
-        rs = RateSource.instances.get(self.source, RateSource.instances.get("binance"))
-        return rs.get_rate(self.fiat, self.crypto)
+        return rate_engine.get_rate(self.rate_source, self.fiat, self.crypto)
 
     def get_fee(self, amount: Decimal) -> Decimal:
         fcp = FeeCalculationPolicy
@@ -320,6 +392,39 @@ class ExchangeRate(db.Model):
                 db.session.commit()
 
 
+class RateHistory(db.Model):
+    """Exchange rate averaged over a time bucket, see shkeeper.services.rate_history."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    crypto = db.Column(db.String, nullable=False)
+    fiat = db.Column(db.String, nullable=False)
+    resolution = db.Column(db.Integer, nullable=False)  # bucket size, seconds
+    bucket = db.Column(db.DateTime, nullable=False)  # bucket start, UTC
+    rate = db.Column(db.Numeric, nullable=False)
+    __table_args__ = (
+        db.UniqueConstraint("crypto", "fiat", "resolution", "bucket"),
+        db.Index("ix_rate_history_resolution_bucket", "resolution", "bucket"),
+    )
+
+
+class Quote(CryptoAmounts, db.Model):
+    """Price locked by the quote endpoint, see shkeeper.services.quotes."""
+
+    id = db.Column(db.String, primary_key=True)
+    crypto = db.Column(db.String, nullable=False)
+    fiat = db.Column(db.String, nullable=False)
+    amount_fiat_units = db.Column("amount_fiat", db.BigInteger, nullable=False)
+    amount_crypto_units = db.Column("amount_crypto", db.BigInteger, nullable=False)
+    # fiat per crypto, kept to FIAT_PRECISION places like fiat amounts
+    exchange_rate_units = db.Column("exchange_rate", db.BigInteger, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    crypto_units = ("amount_crypto_units",)
+    amount_fiat = amount_column("amount_fiat_units", fiat=True)
+    amount_crypto = amount_column("amount_crypto_units")
+    exchange_rate = amount_column("exchange_rate_units", fiat=True)
+
+
 class InvoiceStatus(enum.Enum):
     UNPAID = enum.auto()
     PARTIAL = enum.auto()
@@ -330,7 +435,7 @@ class InvoiceStatus(enum.Enum):
     OUTGOING = enum.auto()
 
 
-class Invoice(db.Model):
+class Invoice(CryptoAmounts, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     transactions = db.relationship("Transaction", backref="invoice", lazy=True)
     unconfirmed_transactions = db.relationship(
@@ -342,10 +447,10 @@ class Invoice(db.Model):
     external_id = db.Column(db.String)
     fiat = db.Column(db.String)
     callback_url = db.Column(db.String)
-    balance_fiat = db.Column(db.Numeric, default=0)
-    balance_crypto = db.Column(db.Numeric, default=0)
-    amount_fiat = db.Column(db.Numeric)
-    amount_crypto = db.Column(db.Numeric)
+    balance_fiat_units = db.Column("balance_fiat", db.BigInteger, default=0)
+    balance_crypto_units = db.Column("balance_crypto", db.BigInteger, default=0)
+    amount_fiat_units = db.Column("amount_fiat", db.BigInteger)
+    amount_crypto_units = db.Column("amount_crypto", db.BigInteger)
     exchange_rate = db.Column(db.Numeric)
     status = db.Column(db.Enum(InvoiceStatus), default=InvoiceStatus.UNPAID)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
@@ -355,6 +460,12 @@ class Invoice(db.Model):
         onupdate=db.func.current_timestamp(),
     )
 
+    crypto_units = ("balance_crypto_units", "amount_crypto_units")
+    balance_fiat = amount_column("balance_fiat_units", fiat=True)
+    balance_crypto = amount_column("balance_crypto_units")
+    amount_fiat = amount_column("amount_fiat_units", fiat=True)
+    amount_crypto = amount_column("amount_crypto_units")
+
     def to_json(self):
         return {
             "txs": [
@@ -389,12 +500,12 @@ class Invoice(db.Model):
                 # recalculate tx fiat amount according to a new exchange rate
                 tx.amount_fiat = tx.amount_crypto * tx.invoice.exchange_rate
 
-        # add tx to invoice balance
-        tx.invoice.balance_fiat += tx.amount_fiat
+        # add tx to invoice balance, in units of the same scale on both sides
+        tx.invoice.balance_fiat_units += tx.amount_fiat_units
         if (
             tx.crypto == tx.invoice.crypto
         ):  # do not add different tokens e.g. TRX and TRC20 USDT
-            tx.invoice.balance_crypto += tx.amount_crypto
+            tx.invoice.balance_crypto_units += tx.amount_crypto_units
 
         # change invoice status according to its new balance
         if tx.invoice.balance_fiat < (
@@ -411,6 +522,29 @@ class Invoice(db.Model):
         db.session.commit()
         return self
 
+    @staticmethod
+    def price(invoice, quote_id=None):
+        """Crypto amount and exchange rate of ``invoice``, locked by a quote if given.
+
+        A quote is used up by the invoice it prices.
+        """
+        if not quote_id:
+            rate = ExchangeRate.get(invoice.fiat, invoice.crypto)
+            return rate.convert(invoice.amount_fiat)
+
+        quote = quotes.get(quote_id)
+        if quote is None:
+            raise InvalidQuote(f"Quote {quote_id} is unknown, used or expired")
+        if (quote.crypto, quote.fiat, quote.amount_fiat) != (
+            invoice.crypto,
+            invoice.fiat,
+            invoice.amount_fiat,
+        ):
+            raise InvalidQuote(f"Quote {quote_id} does not match the payment request")
+        if not quotes.use(quote_id):
+            raise InvalidQuote(f"Quote {quote_id} is unknown, used or expired")
+        return quote.amount_crypto, quote.exchange_rate
+
     @classmethod
     def add(cls, crypto, request):
         # {"external_id": "1234",  "fiat": "USD", "amount": 100.90, "callback_url": "https://blabla/callback.php"}
@@ -425,22 +559,16 @@ class Invoice(db.Model):
             invoice.fiat = request["fiat"]
             invoice.amount_fiat = Decimal(request["amount"])
 
-            # recalc crypto amount for the new fiat amount
-            rate = ExchangeRate.get(invoice.fiat, invoice.crypto)
-            invoice.amount_crypto, invoice.exchange_rate = rate.convert(
-                invoice.amount_fiat
-            )
-
             crypto_changed = invoice.crypto != crypto.crypto
             if crypto_changed or crypto_is_lightning:
                 invoice.crypto = crypto.crypto
 
-                # recalc crypto amount for the new crypto and fiat amount
-                rate = ExchangeRate.get(invoice.fiat, invoice.crypto)
-                invoice.amount_crypto, invoice.exchange_rate = rate.convert(
-                    invoice.amount_fiat
-                )
+            # recalc crypto amount for the new crypto and fiat amount
+            invoice.amount_crypto, invoice.exchange_rate = cls.price(
+                invoice, request.get("quote_id")
+            )
 
+            if crypto_changed or crypto_is_lightning:
                 # if address for new crypto already exist, use it instead of generating a new one
                 invoice_address = InvoiceAddress.query.filter_by(
                     invoice_id=invoice.id, crypto=crypto.crypto
@@ -448,8 +576,8 @@ class Invoice(db.Model):
                 if invoice_address and not crypto_is_lightning:
                     invoice.addr = invoice_address.addr
                 else:
-                    invoice.addr = crypto.mkaddr(
-                        details={"value": invoice.amount_crypto}
+                    invoice.addr = address_pool.get_address(
+                        crypto, details={"value": invoice.amount_crypto}
                     )
                     db.session.commit()
                     invoice_address = InvoiceAddress()
@@ -466,11 +594,12 @@ class Invoice(db.Model):
             invoice.callback_url = request["callback_url"]
             invoice.fiat = request["fiat"]
             invoice.amount_fiat = Decimal(request["amount"])
-            rate = ExchangeRate.get(invoice.fiat, invoice.crypto)
-            invoice.amount_crypto, invoice.exchange_rate = rate.convert(
-                invoice.amount_fiat
+            invoice.amount_crypto, invoice.exchange_rate = cls.price(
+                invoice, request.get("quote_id")
+            )
+            invoice.addr = address_pool.get_address(
+                crypto, details={"value": invoice.amount_crypto}
             )
-            invoice.addr = crypto.mkaddr(details={"value": invoice.amount_crypto})
             db.session.add(invoice)
             db.session.commit()
 
@@ -495,7 +624,7 @@ class Invoice(db.Model):
                     app.logger.debug("Generating a new on-chain BTC address")
                     btc_address = InvoiceAddress()
                     btc_address.crypto = "BTC"
-                    btc_address.addr = btc.mkaddr()
+                    btc_address.addr = address_pool.get_address(btc)
                     btc_address.invoice_id = invoice.id
                     db.session.add(btc_address)
             else:
@@ -533,18 +662,21 @@ class Invoice(db.Model):
         return res
 
 
-class UnconfirmedTransaction(db.Model):
+class UnconfirmedTransaction(CryptoAmounts, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     invoice_id = db.Column(db.Integer, db.ForeignKey("invoice.id"), nullable=False)
     addr = db.Column(db.String)
     txid = db.Column(db.String)
     crypto = db.Column(db.String)
-    amount_crypto = db.Column(db.Numeric)
+    amount_crypto_units = db.Column("amount_crypto", db.BigInteger)
     callback_confirmed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
     __table_args__ = (db.UniqueConstraint("crypto", "txid", "invoice_id"),)
 
+    crypto_units = ("amount_crypto_units",)
+    amount_crypto = amount_column("amount_crypto_units", rounding=ROUND_DOWN)
+
     def to_json(self):
         return {
             "amount": remove_exponent(self.amount_crypto),
@@ -593,15 +725,17 @@ class UnconfirmedTransaction(db.Model):
         db.session.commit()
 
 
-class Transaction(db.Model):
+class Transaction(CryptoAmounts, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     invoice_id = db.Column(db.Integer, db.ForeignKey("invoice.id"), nullable=False)
     txid = db.Column(db.String)
     crypto = db.Column(db.String)
-    amount_crypto = db.Column(db.Numeric)
-    amount_fiat = db.Column(db.Numeric)
+    amount_crypto_units = db.Column("amount_crypto", db.BigInteger)
+    amount_fiat_units = db.Column("amount_fiat", db.BigInteger)
     need_more_confirmations = db.Column(db.Boolean, default=True)
     callback_confirmed = db.Column(db.Boolean, default=False)
+    # tip - confirmations + 1 when the tx was first seen, see Crypto.get_chain_height()
+    block_height = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(
         db.DateTime,
@@ -610,6 +744,12 @@ class Transaction(db.Model):
     )
     __table_args__ = (db.UniqueConstraint("crypto", "txid", "invoice_id"),)
 
+    crypto_units = ("amount_crypto_units",)
+    # received amounts are rounded down, digits past the crypto's precision
+    # (tokens with 18 decimals) never make an underpayment PAID
+    amount_crypto = amount_column("amount_crypto_units", rounding=ROUND_DOWN)
+    amount_fiat = amount_column("amount_fiat_units", fiat=True, rounding=ROUND_DOWN)
+
     def __repr__(self):
         return f"txid={self.txid}"
 
@@ -692,17 +832,28 @@ class Transaction(db.Model):
 
         if tx["confirmations"] >= crypto.wallet.confirmations:
             t.need_more_confirmations = False
+        else:
+            # Fresh tip taken after the lookup can only make the height too
+            # high, i.e. confirmations are never overestimated later on
+            t.block_height = crypto.block_height_from_confirmations(
+                tx["confirmations"], fresh=True
+            )
 
         db.session.add(t)
         db.session.commit()
         return t
 
-    def is_more_confirmations_needed(self):
+    def is_more_confirmations_needed(self, confirmations=None, tip=None):
         crypto = Crypto.instances[self.crypto]
-        confirmations = crypto.get_confirmations_by_txid(self.txid)
+        if confirmations is None:
+            confirmations, tip = crypto.get_confirmations_by_txid(self.txid), None
         if confirmations >= self.invoice.wallet.confirmations:
             self.need_more_confirmations = False
-            db.session.commit()
+        else:
+            self.block_height = crypto.block_height_from_confirmations(
+                confirmations, fresh=True, tip=tip
+            )
+        db.session.commit()
         return self.need_more_confirmations
 
 
@@ -712,7 +863,7 @@ class PayoutStatus(enum.Enum):
     FAIL = enum.auto()
 
 
-class Payout(db.Model):
+class Payout(CryptoAmounts, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp(), index=True)
     updated_at = db.Column(
@@ -720,7 +871,7 @@ class Payout(db.Model):
         default=db.func.current_timestamp(),
         onupdate=db.func.current_timestamp(),
     )
-    amount = db.Column(db.Numeric)
+    amount_units = db.Column("amount", db.BigInteger)
     crypto = db.Column(db.String)
     dest_addr = db.Column(db.String)
     success = db.Column(db.String)
@@ -732,6 +883,16 @@ class Payout(db.Model):
         db.Enum(PayoutStatus), default=PayoutStatus.IN_PROGRESS, index=True
     )
     transactions = db.relationship("PayoutTx", backref="payout", lazy=True)
+    __table_args__ = (db.Index("ix_payout_crypto_amount", "crypto", "amount"),)
+
+    crypto_units = ("amount_units",)
+    amount = amount_column("amount_units")
+
+    @classmethod
+    def find_by_amount(cls, crypto, amount):
+        """Payouts of exactly ``amount`` ``crypto``."""
+        units = money.to_units(amount, money.precision(crypto))
+        return cls.query.filter_by(crypto=crypto, amount_units=units)
 
     @classmethod
     def update_from_task(cls, task_response, task_id):
@@ -787,11 +948,11 @@ class Payout(db.Model):
         return p
 
 
-class Notification(db.Model):
+class Notification(CryptoAmounts, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     txid = db.Column(db.String)
     crypto = db.Column(db.String)
-    amount_crypto = db.Column(db.Numeric)
+    amount_crypto_units = db.Column("amount_crypto", db.BigInteger)
     callback_confirmed = db.Column(db.Boolean, default=False)
     type = db.Column(db.String, nullable=False)
     retries = db.Column(db.Integer, default=0, index=True)
@@ -801,6 +962,9 @@ class Notification(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     __table_args__ = (db.UniqueConstraint("type", "object_id"),)
 
+    crypto_units = ("amount_crypto_units",)
+    amount_crypto = amount_column("amount_crypto_units")
+
     def to_json(self):
         return {
             "id": self.id,
@@ -865,6 +1029,7 @@ class PayoutTx(db.Model):
     )
     txid = db.Column(db.String)
     status = db.Column(db.Enum(PayoutTxStatus), default=PayoutTxStatus.IN_PROGRESS)
+    block_height = db.Column(db.Integer)
 
 
 class Setting(db.Model):
@@ -881,20 +1046,54 @@ class InvoiceAddress(db.Model):
     __table_args__ = (db.UniqueConstraint("invoice_id", "crypto", "addr"),)
 
 
+class PooledAddress(db.Model):
+    """Deposit address generated ahead of time, see shkeeper.services.address_pool."""
+
+    __tablename__ = "address_pool"
+    id = db.Column(db.Integer, primary_key=True)
+    crypto = db.Column(db.String, nullable=False)
+    addr = db.Column(db.String, nullable=False)
+    claimed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    __table_args__ = (
+        db.UniqueConstraint("crypto", "addr"),
+        db.Index("ix_address_pool_crypto_claimed_at", "crypto", "claimed_at"),
+    )
+
+
+class LightningInvoiceState(enum.Enum):
+    OPEN = "OPEN"
+    SETTLED = "SETTLED"
+    CANCELED = "CANCELED"
+    ACCEPTED = "ACCEPTED"
+
+
 class BitcoinLightningInvoice(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     r_hash = db.Column(db.String, unique=True, nullable=False)
     payment_request = db.Column(db.String(512))
     value = db.Column(db.Numeric)
-    expiry = db.Column(db.String)
-    state = db.Column(db.String)
-    creation_date = db.Column(db.String)
-    settle_date = db.Column(db.String)
+    # unix timestamps / seconds, LND reports them as strings
+    expiry = db.Column(db.BigInteger)
+    state = db.Column(db.Enum(LightningInvoiceState))
+    creation_date = db.Column(db.BigInteger)
+    settle_date = db.Column(db.BigInteger)
     sent_to_shkeeper = db.Column(db.Boolean, default=False)
+    __table_args__ = (
+        # invoice_notificator: settled invoices not yet recorded
+        db.Index("ix_bli_state_sent_to_shkeeper", "state", "sent_to_shkeeper"),
+        # invoice_refresher: open invoices past their expiry
+        db.Index("ix_bli_state_creation_date", "state", "creation_date"),
+    )
 
-    def update(self, **kwargs):
+    def update(self, commit=True, **kwargs):
         for key, value in kwargs.items():
+            if key == "state" and isinstance(value, str):
+                value = LightningInvoiceState.__members__.get(value)
+            elif key in ("expiry", "creation_date", "settle_date") and value:
+                value = int(value)
             if hasattr(self, key):
                 setattr(self, key, value)
         db.session.add(self)
-        db.session.commit()
+        if commit:
+            db.session.commit()
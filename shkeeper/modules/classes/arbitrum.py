@@ -1,7 +1,6 @@
 from abc import abstractmethod
 from os import environ
 import json
-from shkeeper import requests
 import datetime
 from collections import namedtuple
 from decimal import Decimal
@@ -30,27 +29,19 @@ class Arbitrum(Ethereum):
                 return f"Payout failed: not enought network currency to pay for transaction. Need {fee}, balance {amount}"
             else:
                 amount -= fee
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/payout/{destination}/{amount}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/payout/{destination}/{amount}",
+            op="mkpayout",
         ).json(parse_float=Decimal)
         return response
 
-    def getstatus(self):
-        try:
-            response = requests.post(
-                f"http://{self.gethost()}/{self.crypto}/status",
-                auth=self.get_auth_creds(),
-            ).json(parse_float=Decimal)
-            block_ts = response["last_block_timestamp"]
-            now_ts = int(datetime.datetime.now().timestamp())
+    def parse_status(self, response):
+        block_ts = response["last_block_timestamp"]
+        now_ts = int(datetime.datetime.now().timestamp())
 
-            delta = abs(now_ts - block_ts)
-            block_interval = 2
-            if delta < block_interval * 10:
-                return "Synced"
-            else:
-                return "Sync In Progress (%d blocks behind)" % (delta // block_interval)
-
-        except Exception as e:
-            return "Offline"
+        delta = abs(now_ts - block_ts)
+        block_interval = 2
+        if delta < block_interval * 10:
+            return "Synced"
+        else:
+            return "Sync In Progress (%d blocks behind)" % (delta // block_interval)
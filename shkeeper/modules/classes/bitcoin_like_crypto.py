@@ -2,18 +2,18 @@ from abc import abstractmethod
 from decimal import Decimal
 from os import environ
 import datetime
-import functools
+from functools import cached_property
 
-from shkeeper import requests
+import requests
 from shkeeper.modules.classes.crypto import Crypto
+from shkeeper.services.backend_transport import get_transport
+from shkeeper.services.chain_gateway import get_gateway
 
 
 class BitcoinLikeCrypto(Crypto):
     def balance(self):
         try:
-            response = requests.post(
-                "http://" + self.gethost(),
-                auth=self.get_rpc_credentials(),
+            response = self.transport.post(
                 json=self.build_rpc_request("getbalance", "*", 1),
             ).json(parse_float=Decimal)
             balance = response["result"]
@@ -24,37 +24,64 @@ class BitcoinLikeCrypto(Crypto):
 
     def getstatus(self):
         try:
-            response = requests.post(
-                "http://" + self.gethost(),
-                auth=self.get_rpc_credentials(),
-                json=self.build_rpc_request("getblockchaininfo"),
-                timeout=10,
-            ).json(parse_float=Decimal)
+            response = get_gateway(self.transport.host).status(self._fetch_status)
+            return self.parse_status(response)
+        except Exception as e:
+            return "Offline"
+
+    def _fetch_status(self):
+        return self.transport.post(
+            json=self.build_rpc_request("getblockchaininfo"),
+            op="getstatus",
+            timeout=10,
+        ).json(parse_float=Decimal)
 
-            if response["result"]["headers"] == response["result"]["blocks"]:
-                return "Synced"
-            else:
-                return "Sync In Progress (%.2f%%)" % (
-                    response["result"]["verificationprogress"] * 100
-                )
+    def get_chain_height(self, fresh=False):
+        gateway = get_gateway(self.transport.host)
+        if fresh:
+            gateway.invalidate()
+        try:
+            return int(gateway.status(self._fetch_status)["result"]["blocks"])
+        except Exception as e:
+            return None
 
+    async def agetstatus(self):
+        try:
+            response = await get_gateway(self.transport.host).astatus(
+                self._afetch_status
+            )
+            return self.parse_status(response)
         except Exception as e:
             return "Offline"
 
+    async def _afetch_status(self):
+        response = await self.transport.apost(
+            json=self.build_rpc_request("getblockchaininfo"),
+            op="getstatus",
+            timeout=10,
+        )
+        return response.json(parse_float=Decimal)
+
+    def parse_status(self, response):
+        if response["result"]["headers"] == response["result"]["blocks"]:
+            return "Synced"
+        else:
+            return "Sync In Progress (%.2f%%)" % (
+                response["result"]["verificationprogress"] * 100
+            )
+
     def mkpayout(self, destination, amount, fee, subtract_fee_from_amount=False):
         btc_per_kb = "%.8f" % (float(fee) / 100000)
 
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
+        # Not batched: the node runs every call of a batch, and sendtoaddress
+        # must not go out with the default fee when settxfee is rejected
+        response = self.transport.post(
             json=self.build_rpc_request("settxfee", btc_per_kb),
         ).json(parse_float=Decimal)
         if response["error"]:
             return response
 
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
+        response = self.transport.post(
             json=self.build_rpc_request(
                 "sendtoaddress",
                 destination,
@@ -68,18 +95,18 @@ class BitcoinLikeCrypto(Crypto):
         return response
 
     def mkaddr(self, **kwargs):
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
+        response = self.transport.post(
             json=self.build_rpc_request("getnewaddress"),
         ).json(parse_float=Decimal)
         addr = response["result"]
         return addr
 
+    def mkaddrs(self, count):
+        responses = self.rpc_batch([("getnewaddress",)] * count, op="mkaddr")
+        return [r["result"] for r in responses if not r["error"] and r["result"]]
+
     def getaddrbytx(self, txid):
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
+        response = self.transport.post(
             json=self.build_rpc_request("gettransaction", txid),
         ).json(parse_float=Decimal)
 
@@ -109,10 +136,80 @@ class BitcoinLikeCrypto(Crypto):
         _, _, confirmations, _ = self.getaddrbytx(txid)[0]
         return confirmations
 
+    @property
+    def pull_ingestion_enabled(self):
+        name = self.crypto.replace("-", "_")
+        return environ.get(f"{name}_PULL_INGESTION") == "enabled"
+
+    def pull_transactions(self):
+        """Ingest wallet transactions with listsinceblock instead of walletnotify.
+
+        Enabled with <CRYPTO>_PULL_INGESTION=enabled. The lastblock returned by
+        the node is kept in the <CRYPTO>_lastblock setting; it lags the tip by
+        the confirmations the wallet requires, so txs still waiting for them are
+        listed again and get their counts from the same response.
+        """
+        if not self.pull_ingestion_enabled:
+            return False
+        from shkeeper.services import tx_ingest
+
+        cursor_name = f"{self.crypto}_lastblock"
+        lastblock = tx_ingest.get_cursor(cursor_name) or ""
+        response = self.transport.post(
+            json=self.build_rpc_request(
+                "listsinceblock", lastblock, max(self.wallet.confirmations, 1)
+            ),
+            op="pull_transactions",
+        ).json(parse_float=Decimal)
+        if response["error"]:
+            raise Exception(f"listsinceblock failed: {response['error']=}")
+        result = response["result"]
+
+        txs = self.details_from_listsinceblock(result["transactions"])
+        confirmations = {
+            txid: details[0][2] for txid, details in txs.items() if details[0][2] > 0
+        }
+        failed = tx_ingest.ingest_many(self, txs)
+        if confirmations:
+            tip = self.get_chain_height(fresh=True)
+            tx_ingest.refresh_confirmations(self, confirmations, tip)
+
+        if not failed:
+            tx_ingest.set_cursor(cursor_name, result["lastblock"])
+        return True
+
+    def details_from_listsinceblock(self, transactions):
+        """Group listsinceblock entries by txid in the getaddrbytx() format."""
+        txs = {}
+        for entry in transactions:
+            # conflicted txs have negative confirmations
+            if entry["category"] not in ("send", "receive"):
+                continue
+            if entry["confirmations"] < 0:
+                continue
+            txs.setdefault(entry["txid"], []).append(
+                [
+                    entry.get("address"),
+                    entry["amount"],
+                    entry["confirmations"],
+                    entry["category"],
+                ]
+            )
+        return txs
+
+    def get_confirmations_by_txids(self, txids):
+        txids = list(txids)
+        responses = self.rpc_batch(
+            [("gettransaction", txid) for txid in txids], op="get_confirmations"
+        )
+        return {
+            txid: response["result"]["confirmations"]
+            for txid, response in zip(txids, responses)
+            if not response["error"] and response["result"]
+        }
+
     def create_wallet(self, name="shkeeper"):
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
+        response = self.transport.post(
             json=self.build_rpc_request("createwallet", name),
         ).json(parse_float=Decimal)
         return response
@@ -121,9 +218,7 @@ class BitcoinLikeCrypto(Crypto):
         now = datetime.datetime.now().strftime("%F_%T")
         fname = f"{now}_{self.crypto}_shkeeper_wallet.dat"
 
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
+        response = self.transport.post(
             json=self.build_rpc_request("backupwallet", f"/backup/{fname}"),
         ).json(parse_float=Decimal)
 
@@ -132,9 +227,7 @@ class BitcoinLikeCrypto(Crypto):
         return f"{nginx_url}/{fname}"
 
     def get_all_addresses(self):
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
+        response = self.transport.post(
             json=self.build_rpc_request("listreceivedbyaddress", 0, True),
         ).json(parse_float=Decimal)
         return (
@@ -147,6 +240,10 @@ class BitcoinLikeCrypto(Crypto):
     def wallet(self):
         return self._wallet.query.filter_by(crypto=self.crypto).first()
 
+    @cached_property
+    def transport(self):
+        return get_transport(self.gethost(), self.get_rpc_credentials())
+
     # For internal usage
 
     def get_rpc_credentials(self):
@@ -156,3 +253,30 @@ class BitcoinLikeCrypto(Crypto):
 
     def build_rpc_request(self, method, *params):
         return {"jsonrpc": "1.0", "id": "shkeeper", "method": method, "params": params}
+
+    def rpc_batch(self, calls, op=None):
+        """Send several RPC calls to the node in a single HTTP round trip.
+
+        ``calls`` is a list of ``(method, *params)`` tuples or prebuilt request
+        dicts. Returns one ``{"result": ..., "error": ...}`` per call, in order.
+        """
+        if not calls:
+            return []
+        batch = []
+        for i, call in enumerate(calls):
+            request = dict(call) if isinstance(call, dict) else self.build_rpc_request(*call)
+            request["id"] = f"shkeeper-{i}"
+            batch.append(request)
+
+        response = self.transport.post(json=batch, op=op).json(parse_float=Decimal)
+        if isinstance(response, dict):
+            # Batch rejected as a whole
+            return [response] * len(batch)
+        by_id = {item["id"]: item for item in response}
+        return [
+            by_id.get(
+                request["id"],
+                {"result": None, "error": {"message": "no response in batch"}},
+            )
+            for request in batch
+        ]
@@ -1,7 +1,12 @@
 import abc
 import inspect
 import os
-from typing import Dict
+from functools import cached_property
+from typing import Dict, Optional
+
+from shkeeper.services import balance_cache, hd_wallet
+from shkeeper.services.async_backend import run_sync
+from shkeeper.services.backend_transport import get_transport
 
 
 class Crypto(abc.ABC):
@@ -13,6 +18,8 @@ class Crypto(abc.ABC):
     fixed_fee_steps = []
     precision = 8
     fee_description = "sat/Byte"
+    # mkaddr() needs no invoice details, see shkeeper.services.address_pool
+    address_pool_supported = True
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
@@ -110,6 +117,19 @@ class Crypto(abc.ABC):
     def mkaddr(self, **kwargs):
         pass
 
+    def mkaddrs(self, count):
+        """Generate ``count`` new addresses, in one backend call where possible."""
+        return [self.mkaddr() for _ in range(count)]
+
+    @cached_property
+    def xpub_deriver(self):
+        """Derives mkaddr() addresses locally when <CRYPTO>_XPUB is set."""
+        return hd_wallet.get_deriver(self.crypto)
+
+    def import_addresses(self, addresses):
+        """Add watch-only ``addresses`` to the backend wallet, True once it did."""
+        return False
+
     @abc.abstractmethod
     def getaddrbytx(self, tx):
         pass
@@ -134,6 +154,70 @@ class Crypto(abc.ABC):
     def fee_deposit_account(self):
         pass
 
+    def get_chain_height(self, fresh=False) -> Optional[int]:
+        """Height of the best block known to the backend, None if unsupported."""
+        return None
+
+    def block_height_from_confirmations(self, confirmations, fresh=False, tip=None):
+        """Block height of a tx with ``confirmations``, None if it can't be told.
+
+        ``tip`` must be taken after ``confirmations`` were, otherwise the
+        height comes out low and later confirmations are overestimated.
+        """
+        if not confirmations or confirmations < 1:
+            return None
+        if tip is None:
+            tip = self.get_chain_height(fresh=fresh)
+        if tip is None:
+            return None
+        return tip - confirmations + 1
+
+    def confirmations_at_height(self, block_height, tip) -> Optional[int]:
+        """Confirmations of a tx mined at ``block_height``, None when it may be reorged."""
+        if block_height is None or tip is None or block_height > tip:
+            return None
+        return tip - block_height + 1
+
+    def get_confirmations_by_txids(self, txids) -> Dict[str, int]:
+        """Confirmations of several transactions in as few backend calls as possible.
+
+        Txids missing from the result should be looked up one by one with
+        get_confirmations_by_txid(). Cryptos without a batch API return {}.
+        """
+        return {}
+
+    def pull_transactions(self) -> bool:
+        """Ingest wallet transactions seen since the previous pull.
+
+        Returns False for cryptos that only learn about transactions from
+        walletnotify.
+        """
+        return False
+
+    def cached_balance(self, max_age=None):
+        """balance() served from shkeeper.services.balance_cache."""
+        return balance_cache.get(self, max_age)
+
+    def get_auth_creds(self):
+        return None
+
+    @cached_property
+    def transport(self):
+        return get_transport(self.gethost(), self.get_auth_creds())
+
+    # Async counterparts used by the fan-out in shkeeper.services.async_backend.
+    # Cryptos with an HTTP backend override these with native implementations.
+    async def agetstatus(self):
+        return await run_sync(self.getstatus)
+
+    async def abalance(self):
+        return await run_sync(self.balance)
+
+    async def ametrics(self):
+        if not callable(getattr(self, "metrics", None)):
+            return ""
+        return await run_sync(self.metrics)
+
     @property
     def wallet(self):
         return self._wallet.query.filter_by(crypto=self.crypto).first()
@@ -1,12 +1,12 @@
 from abc import abstractmethod
 from os import environ
 import json
-from shkeeper import requests
 import datetime
 from collections import namedtuple
 from decimal import Decimal
 from flask import current_app as app
 from shkeeper.modules.classes.crypto import Crypto
+from shkeeper.services.chain_gateway import get_gateway
 
 
 class Ethereum(Crypto):
@@ -24,17 +24,17 @@ class Ethereum(Crypto):
         return (username, password)
 
     def estimate_tx_fee(self, amount, **kwargs):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/calc-tx-fee/{amount}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/calc-tx-fee/{amount}",
+            op="estimate_tx_fee",
         ).json(parse_float=Decimal)
         return response
 
     @property
     def fee_deposit_account(self):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/fee-deposit-account",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/fee-deposit-account",
+            op="fee_deposit_account",
         ).json(parse_float=Decimal)
 
         FeeDepositAccount = namedtuple("FeeDepositAccount", "addr balance")
@@ -42,9 +42,9 @@ class Ethereum(Crypto):
 
     def balance(self):
         try:
-            response = requests.post(
-                f"http://{self.gethost()}/{self.crypto}/balance",
-                auth=self.get_auth_creds(),
+            response = self.transport.post(
+                f"/{self.crypto}/balance",
+                op="balance",
             ).json(parse_float=Decimal)
             balance = response["balance"]
         except Exception as e:
@@ -53,50 +53,83 @@ class Ethereum(Crypto):
 
         return Decimal(balance)
 
+    async def abalance(self):
+        try:
+            response = await self.transport.apost(
+                f"/{self.crypto}/balance",
+                op="balance",
+            )
+            balance = response.json(parse_float=Decimal)["balance"]
+        except Exception as e:
+            app.logger.warning(f"Error: {e}")
+            balance = False
+
+        return Decimal(balance)
+
     def get_confirmations_by_txid(self, txid):
         transactions = self.getaddrbytx(txid)
         _, _, confirmations, _ = transactions[0]
         return confirmations
 
     def get_task(self, id):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/task/{id}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/task/{id}",
+            op="get_task",
         ).json(parse_float=Decimal)
         return response
 
     def getstatus(self):
         try:
-            response = requests.post(
-                f"http://{self.gethost()}/{self.crypto}/status",
-                auth=self.get_auth_creds(),
-            ).json(parse_float=Decimal)
-
-            block_ts = response["last_block_timestamp"]
-            now_ts = int(datetime.datetime.now().timestamp())
-
-            delta = abs(now_ts - block_ts)
-            block_interval = 12
-            if delta < block_interval * 10:
-                return "Synced"
-            else:
-                return "Sync In Progress (%d blocks behind)" % (delta // block_interval)
+            # All tokens of the chain share one status fetch per refresh interval
+            response = get_gateway(self.transport.host).status(
+                lambda: self.transport.post(
+                    f"/{self.crypto}/status",
+                    op="getstatus",
+                ).json(parse_float=Decimal)
+            )
+            return self.parse_status(response)
+        except Exception as e:
+            return "Offline"
 
+    async def agetstatus(self):
+        try:
+            response = await get_gateway(self.transport.host).astatus(
+                self._afetch_status
+            )
+            return self.parse_status(response)
         except Exception as e:
             return "Offline"
 
+    async def _afetch_status(self):
+        response = await self.transport.apost(
+            f"/{self.crypto}/status",
+            op="getstatus",
+        )
+        return response.json(parse_float=Decimal)
+
+    def parse_status(self, response):
+        block_ts = response["last_block_timestamp"]
+        now_ts = int(datetime.datetime.now().timestamp())
+
+        delta = abs(now_ts - block_ts)
+        block_interval = 12
+        if delta < block_interval * 10:
+            return "Synced"
+        else:
+            return "Sync In Progress (%d blocks behind)" % (delta // block_interval)
+
     def mkaddr(self, **kwargs):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/generate-address",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/generate-address",
+            op="mkaddr",
         ).json(parse_float=Decimal)
         addr = response["address"]
         return addr
 
     def getaddrbytx(self, tx):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/transaction/{tx}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/transaction/{tx}",
+            op="getaddrbytx",
             timeout=60,
         ).json(parse_float=Decimal)
         result = []
@@ -105,9 +138,9 @@ class Ethereum(Crypto):
         return result
 
     def dump_wallet(self):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/dump",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/dump",
+            op="dump_wallet",
             timeout=60,
         ).json(parse_float=Decimal)
         now = datetime.datetime.now().strftime("%F_%T")
@@ -126,28 +159,44 @@ class Ethereum(Crypto):
                 return f"Payout failed: not enought ETH to pay for transaction. Need {fee}, balance {amount}"
             else:
                 amount -= fee
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/payout/{destination}/{amount}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/payout/{destination}/{amount}",
+            op="mkpayout",
         ).json(parse_float=Decimal)
         return response
 
     def multipayout(self, payout_list):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/multipayout",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/multipayout",
+            op="multipayout",
             json=payout_list,
         ).json(parse_float=Decimal)
         return response
 
     def metrics(self):
-        host = str(self.gethost())
+        host = self.transport.host
+        host = host.split(":")[0].replace("-", "_")
+        try:
+            success_text = f"# HELP {host}_status Connection status to {host}\n# TYPE {host}_status gauge\n{host}_status 1.0\n"
+            response = self.transport.get(
+                "/metrics",
+                op="metrics",
+                timeout=10,
+            )
+            response.raise_for_status()
+            return response.text + success_text
+        except Exception as e:
+            error_text = f"# HELP {host}_status Connection status to {host}\n# TYPE {host}_status gauge\n{host}_status 0.0\n"
+            return error_text
+
+    async def ametrics(self):
+        host = self.transport.host
         host = host.split(":")[0].replace("-", "_")
         try:
             success_text = f"# HELP {host}_status Connection status to {host}\n# TYPE {host}_status gauge\n{host}_status 1.0\n"
-            response = requests.get(
-                f"http://{self.gethost()}/metrics",
-                auth=self.get_auth_creds(),
+            response = await self.transport.aget(
+                "/metrics",
+                op="metrics",
                 timeout=10,
             )
             response.raise_for_status()
@@ -157,8 +206,8 @@ class Ethereum(Crypto):
             return error_text
 
     def get_all_addresses(self):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/get_all_addresses",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/get_all_addresses",
+            op="get_all_addresses",
         ).json(parse_float=Decimal)
         return response
@@ -1,6 +1,5 @@
 from os import environ
 import json
-from shkeeper import requests
 import datetime
 from collections import namedtuple
 from decimal import Decimal
@@ -23,17 +22,17 @@ class Ltc(Crypto):
         return (username, password)
 
     def estimate_tx_fee(self, amount, **kwargs):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/calc-tx-fee/{amount}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/calc-tx-fee/{amount}",
+            op="estimate_tx_fee",
         ).json(parse_float=Decimal)
         return response
 
     @property
     def fee_deposit_account(self):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/fee-deposit-account",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/fee-deposit-account",
+            op="fee_deposit_account",
         ).json(parse_float=Decimal)
 
         FeeDepositAccount = namedtuple("FeeDepositAccount", "addr balance")
@@ -41,9 +40,9 @@ class Ltc(Crypto):
 
     def balance(self):
         try:
-            response = requests.post(
-                f"http://{self.gethost()}/{self.crypto}/balance",
-                auth=self.get_auth_creds(),
+            response = self.transport.post(
+                f"/{self.crypto}/balance",
+                op="balance",
             ).json(parse_float=Decimal)
             balance = response["balance"]
         except Exception as e:
@@ -52,45 +51,73 @@ class Ltc(Crypto):
 
         return Decimal(balance)
 
+    async def abalance(self):
+        try:
+            response = await self.transport.apost(
+                f"/{self.crypto}/balance",
+                op="balance",
+            )
+            balance = response.json(parse_float=Decimal)["balance"]
+        except Exception as e:
+            app.logger.warning(f"Error: {e}")
+            balance = False
+
+        return Decimal(balance)
+
     def get_confirmations_by_txid(self, txid):
         transactions = self.getaddrbytx(txid)
         _, _, confirmations, _ = transactions[0]
         return confirmations
 
     def get_task(self, id):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/task/{id}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/task/{id}",
+            op="get_task",
         ).json(parse_float=Decimal)
         return response
 
     def getstatus(self):
         try:
-            response = requests.post(
-                f"http://{self.gethost()}/{self.crypto}/status",
-                auth=self.get_auth_creds(),
+            response = self.transport.post(
+                f"/{self.crypto}/status",
+                op="getstatus",
             ).json(parse_float=Decimal)
-            delta_blocks = response["delta_blocks"]
-            if delta_blocks <= 12:
-                return "Synced"
-            else:
-                return f"Sync In Progress ({delta_blocks} blocks behind)"
+            return self.parse_status(response)
+        except Exception as e:
+            return "Offline"
 
+    async def agetstatus(self):
+        try:
+            response = await self.transport.apost(
+                f"/{self.crypto}/status",
+                op="getstatus",
+            )
+            return self.parse_status(response.json(parse_float=Decimal))
         except Exception as e:
             return "Offline"
 
+    def parse_status(self, response):
+        delta_blocks = response["delta_blocks"]
+        if delta_blocks <= 12:
+            return "Synced"
+        else:
+            return f"Sync In Progress ({delta_blocks} blocks behind)"
+
     def mkaddr(self, **kwargs):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/generate-address",
-            auth=self.get_auth_creds(),
+        deriver = self.xpub_deriver
+        if deriver and (addr := deriver.next_address()):
+            return addr
+        response = self.transport.post(
+            f"/{self.crypto}/generate-address",
+            op="mkaddr",
         ).json(parse_float=Decimal)
         addr = response["address"]
         return addr
 
     def getaddrbytx(self, tx):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/transaction/{tx}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/transaction/{tx}",
+            op="getaddrbytx",
         ).json(parse_float=Decimal)
         result = []
         for address, amount, confirmations, category in response:
@@ -98,9 +125,9 @@ class Ltc(Crypto):
         return result
 
     def dump_wallet(self):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/dump",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/dump",
+            op="dump_wallet",
         ).json(parse_float=Decimal)
         now = datetime.datetime.now().strftime("%F_%T")
         filename = f"{now}_{self.crypto}_shkeeper_wallet.json"
@@ -123,28 +150,44 @@ class Ltc(Crypto):
             if fee not in (None, 0, 0.0, "0", "")
             else self.estimate_tx_fee(amount)["fee_satoshi"]
         )
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/payout/{destination}/{amount}/{current_fee}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/payout/{destination}/{amount}/{current_fee}",
+            op="mkpayout",
         ).json(parse_float=Decimal)
         return response
 
     def multipayout(self, payout_list):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/multipayout",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/multipayout",
+            op="multipayout",
             json=payout_list,
         ).json(parse_float=Decimal)
         return response
 
     def metrics(self):
-        host = str(self.gethost())
+        host = self.transport.host
         host = host.split(":")[0].replace("-", "_")
         try:
             success_text = f"# HELP {host}_status Connection status to {host}\n# TYPE {host}_status gauge\n{host}_status 1.0\n"
-            response = requests.get(
-                f"http://{self.gethost()}/metrics",
-                auth=self.get_auth_creds(),
+            response = self.transport.get(
+                "/metrics",
+                op="metrics",
+                timeout=10,
+            )
+            response.raise_for_status()
+            return response.text + success_text
+        except Exception as e:
+            error_text = f"# HELP {host}_status Connection status to {host}\n# TYPE {host}_status gauge\n{host}_status 0.0\n"
+            return error_text
+
+    async def ametrics(self):
+        host = self.transport.host
+        host = host.split(":")[0].replace("-", "_")
+        try:
+            success_text = f"# HELP {host}_status Connection status to {host}\n# TYPE {host}_status gauge\n{host}_status 1.0\n"
+            response = await self.transport.aget(
+                "/metrics",
+                op="metrics",
                 timeout=10,
             )
             response.raise_for_status()
@@ -154,8 +197,22 @@ class Ltc(Crypto):
             return error_text
 
     def get_all_addresses(self):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/get_all_addresses",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/get_all_addresses",
+            op="get_all_addresses",
         ).json(parse_float=Decimal)
         return response
+
+    def import_addresses(self, addresses):
+        response = self.transport.post(
+            f"/{self.crypto}/import-addresses",
+            op="import_addresses",
+            json=addresses,
+        )
+        if response.status_code != 200:
+            app.logger.warning(
+                f"[{self.crypto}] Backend did not import addresses: "
+                f"{response.status_code} {response.text}"
+            )
+            return False
+        return True
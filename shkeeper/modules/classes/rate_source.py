@@ -19,3 +19,16 @@ class RateSource(metaclass=ABCMeta):
     @abstractmethod
     def get_rate(self, fiat, crypto):
         pass
+
+    def get_rates(self, pairs):
+        """Rates of the (fiat, crypto) ``pairs``, pairs that failed are left out.
+
+        Sources with a bulk endpoint override this to fetch every pair at once.
+        """
+        rates = {}
+        for fiat, crypto in pairs:
+            try:
+                rates[(fiat, crypto)] = self.get_rate(fiat, crypto)
+            except Exception:
+                continue
+        return rates
@@ -6,10 +6,10 @@ import json
 from collections import namedtuple
 from typing import Annotated, Union
 
-from shkeeper import requests
 from flask import current_app as app
 
 from shkeeper.modules.classes.crypto import Crypto
+from shkeeper.services.chain_gateway import get_gateway
 from shkeeper.schemas import TronAccountResponse, TronError
 from pydantic import TypeAdapter
 
@@ -33,9 +33,9 @@ class TronToken(Crypto):
 
     def balance(self):
         try:
-            response = requests.post(
-                f"http://{self.gethost()}/{self.crypto}/balance",
-                auth=self.get_auth_creds(),
+            response = self.transport.post(
+                f"/{self.crypto}/balance",
+                op="balance",
             ).json(parse_float=Decimal)
             balance = response["balance"]
         except Exception as e:
@@ -44,38 +44,71 @@ class TronToken(Crypto):
 
         return Decimal(balance)
 
-    def getstatus(self):
+    async def abalance(self):
         try:
-            response = requests.post(
-                f"http://{self.gethost()}/{self.crypto}/status",
-                auth=self.get_auth_creds(),
-            ).json(parse_float=Decimal)
+            response = await self.transport.apost(
+                f"/{self.crypto}/balance",
+                op="balance",
+            )
+            balance = response.json(parse_float=Decimal)["balance"]
+        except Exception as e:
+            app.logger.exception("balance error")
+            balance = False
 
-            block_ts = response["last_block_timestamp"]
-            now_ts = int(datetime.datetime.now().timestamp())
+        return Decimal(balance)
 
-            delta = abs(now_ts - block_ts)
-            block_interval = 3
-            if delta < block_interval * 10:
-                return "Synced"
-            else:
-                return "Sync In Progress (%d blocks behind)" % (delta // block_interval)
+    def getstatus(self):
+        try:
+            # All tokens of the chain share one status fetch per refresh interval
+            response = get_gateway(self.transport.host).status(
+                lambda: self.transport.post(
+                    f"/{self.crypto}/status",
+                    op="getstatus",
+                ).json(parse_float=Decimal)
+            )
+            return self.parse_status(response)
+        except Exception as e:
+            return "Offline"
 
+    async def agetstatus(self):
+        try:
+            response = await get_gateway(self.transport.host).astatus(
+                self._afetch_status
+            )
+            return self.parse_status(response)
         except Exception as e:
             return "Offline"
 
+    async def _afetch_status(self):
+        response = await self.transport.apost(
+            f"/{self.crypto}/status",
+            op="getstatus",
+        )
+        return response.json(parse_float=Decimal)
+
+    def parse_status(self, response):
+        block_ts = response["last_block_timestamp"]
+        now_ts = int(datetime.datetime.now().timestamp())
+
+        delta = abs(now_ts - block_ts)
+        block_interval = 3
+        if delta < block_interval * 10:
+            return "Synced"
+        else:
+            return "Sync In Progress (%d blocks behind)" % (delta // block_interval)
+
     def mkaddr(self, **kwargs):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/generate-address",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/generate-address",
+            op="mkaddr",
         ).json(parse_float=Decimal)
         addr = response["base58check_address"]
         return addr
 
     def getaddrbytx(self, txid):
-        txs = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/transaction/{txid}",
-            auth=self.get_auth_creds(),
+        txs = self.transport.post(
+            f"/{self.crypto}/transaction/{txid}",
+            op="getaddrbytx",
         ).json(parse_float=Decimal)
         return [
             [
@@ -93,9 +126,9 @@ class TronToken(Crypto):
         return confirmations
 
     def dump_wallet(self):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/dump",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/dump",
+            op="dump_wallet",
         ).json(parse_float=Decimal)
 
         now = datetime.datetime.now().strftime("%F_%T")
@@ -108,18 +141,18 @@ class TronToken(Crypto):
 
     @property
     def fee_deposit_account(self):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/fee-deposit-account",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/fee-deposit-account",
+            op="fee_deposit_account",
         ).json(parse_float=Decimal)
 
         FeeDepositAccount = namedtuple("FeeDepositAccount", "addr balance")
         return FeeDepositAccount(response["account"], Decimal(response["balance"]))
 
     def estimate_tx_fee(self, amount, **kwargs):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/calc-tx-fee/{amount}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/calc-tx-fee/{amount}",
+            op="estimate_tx_fee",
         ).json(parse_float=Decimal)
         return response
 
@@ -130,49 +163,65 @@ class TronToken(Crypto):
                 return f"Payout failed: not enought TRX to pay for transaction. Need {fee}, balance {amount}"
             else:
                 amount -= fee
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/payout/{destination}/{amount}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/payout/{destination}/{amount}",
+            op="mkpayout",
         ).json(parse_float=Decimal)
         return response
 
     def get_task(self, id):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/task/{id}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/task/{id}",
+            op="get_task",
         ).json(parse_float=Decimal)
         return response
 
     def multipayout(self, payout_list):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/multipayout",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/multipayout",
+            op="multipayout",
             json=payout_list,
         ).json(parse_float=Decimal)
         return response
 
     def servers_status(self):
-        response = requests.get(
-            f"http://{self.gethost()}/{self.crypto}/multiserver/status",
-            auth=self.get_auth_creds(),
+        response = self.transport.get(
+            f"/{self.crypto}/multiserver/status",
+            op="servers_status",
         ).json(parse_float=Decimal)
         return response["statuses"]
 
     def multiserver_set_server(self, server_id):
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/multiserver/change/{server_id}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/multiserver/change/{server_id}",
+            op="multiserver_set_server",
         ).json(parse_float=Decimal)
         return response
 
     def metrics(self):
-        host = str(self.gethost())
+        host = self.transport.host
+        host = host.split(":")[0].replace("-", "_")
+        try:
+            success_text = f"# HELP {host}_status Connection status to {host}\n# TYPE {host}_status gauge\n{host}_status 1.0\n"
+            response = self.transport.get(
+                "/metrics",
+                op="metrics",
+                timeout=10,
+            )
+            response.raise_for_status()
+            return response.text + success_text
+        except Exception as e:
+            error_text = f"# HELP {host}_status Connection status to {host}\n# TYPE {host}_status gauge\n{host}_status 0.0\n"
+            return error_text
+
+    async def ametrics(self):
+        host = self.transport.host
         host = host.split(":")[0].replace("-", "_")
         try:
             success_text = f"# HELP {host}_status Connection status to {host}\n# TYPE {host}_status gauge\n{host}_status 1.0\n"
-            response = requests.get(
-                f"http://{self.gethost()}/metrics",
-                auth=self.get_auth_creds(),
+            response = await self.transport.aget(
+                "/metrics",
+                op="metrics",
                 timeout=10,
             )
             response.raise_for_status()
@@ -182,38 +231,38 @@ class TronToken(Crypto):
             return error_text
 
     def get_all_addresses(self):
-        response = requests.get(
-            f"http://{self.gethost()}/{self.crypto}/addresses",
-            auth=self.get_auth_creds(),
+        response = self.transport.get(
+            f"/{self.crypto}/addresses",
+            op="get_all_addresses",
         ).json(parse_float=Decimal)
         return response["accounts"]
 
     def get_account_info(self) -> TronAccountResponse | TronError:
-        response = requests.get(
-            f"http://{self.gethost()}/staking",
-            auth=self.get_auth_creds(),
+        response = self.transport.get(
+            "/staking",
+            op="get_account_info",
         )
         # adaptor = TypeAdapter(Annotated[Union[TronAccountResponse, TronError]])
         adaptor = TypeAdapter(Union[TronAccountResponse, TronError])
         return adaptor.validate_json(response.text)
 
     def get_staking_config(self):
-        response = requests.get(
-            f"http://{self.gethost()}/staking/info",
-            auth=self.get_auth_creds(),
+        response = self.transport.get(
+            "/staking/info",
+            op="get_staking_config",
         )
         return response.json(parse_float=Decimal)
 
     def stake_trx(self, amount, resource):
-        response = requests.post(
-            f"http://{self.gethost()}/staking/freeze/{amount}/{resource}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/staking/freeze/{amount}/{resource}",
+            op="stake_trx",
         )
         return response.json(parse_float=Decimal)
 
     def undelegate_trx(self, address, amount, resource):
-        response = requests.post(
-            f"http://{self.gethost()}/staking/undelegate/{address}/{amount}/{resource}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/staking/undelegate/{address}/{amount}/{resource}",
+            op="undelegate_trx",
         )
         return response.json(parse_float=Decimal)
@@ -1,7 +1,6 @@
 from abc import abstractmethod
 from os import environ
 import json
-from shkeeper import requests
 import datetime
 from collections import namedtuple
 from decimal import Decimal
@@ -32,30 +31,21 @@ class Xrp(Ethereum):
                 amount = (
                     amount - fee - 10
                 )  # 10XRP need to keep the fee-deposit account active
-        response = requests.post(
-            f"http://{self.gethost()}/{self.crypto}/payout/{destination}/{amount}",
-            auth=self.get_auth_creds(),
+        response = self.transport.post(
+            f"/{self.crypto}/payout/{destination}/{amount}",
+            op="mkpayout",
         ).json(parse_float=Decimal)
         return response
 
-    def getstatus(self):
-        try:
-            response = requests.post(
-                f"http://{self.gethost()}/{self.crypto}/status",
-                auth=self.get_auth_creds(),
-            ).json(parse_float=Decimal)
-
-            block_ts = (
-                int(response["last_block_timestamp"]) + 946684800
-            )  # close_time in ledger comes from 01.01.2000 00:00
-            now_ts = int(datetime.datetime.now().timestamp())
-
-            delta = abs(now_ts - block_ts)
-            block_interval = 4
-            if delta < block_interval * 10:
-                return "Synced"
-            else:
-                return "Sync In Progress (%d blocks behind)" % (delta // block_interval)
-
-        except Exception as e:
-            return "Offline"
+    def parse_status(self, response):
+        block_ts = (
+            int(response["last_block_timestamp"]) + 946684800
+        )  # close_time in ledger comes from 01.01.2000 00:00
+        now_ts = int(datetime.datetime.now().timestamp())
+
+        delta = abs(now_ts - block_ts)
+        block_interval = 4
+        if delta < block_interval * 10:
+            return "Synced"
+        else:
+            return "Sync In Progress (%d blocks behind)" % (delta // block_interval)
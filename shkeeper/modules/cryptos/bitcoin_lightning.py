@@ -1,8 +1,11 @@
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import datetime
 from functools import cached_property
 from os import environ, path, unlink
 import base64, codecs, json, requests
+import queue
+import re
 import threading
 from time import sleep, time
 from decimal import Decimal
@@ -11,15 +14,79 @@ from typing import List, Literal, Tuple
 from flask import current_app as app
 
 from shkeeper.events import shkeeper_initialized
-from shkeeper.models import BitcoinLightningInvoice as BLI, Setting
+from shkeeper.models import (
+    BitcoinLightningInvoice as BLI,
+    LightningInvoiceState,
+    Payout,
+    Setting,
+)
 from shkeeper.modules.classes.crypto import Crypto
 from shkeeper import db
+from shkeeper.exceptions import NotRelatedToAnyInvoice
+from shkeeper.services import balance_cache, tx_ingest
+from shkeeper.services.ttl_cache import TTLCache
 from shkeeper.utils import format_decimal, remove_exponent
 from shkeeper.wallet_encryption import wallet_encryption
 
+# lnbc (mainnet), lntb (testnet), lntbs (signet), lnbcrt (regtest)
+BOLT11_PREFIXES = ("lnbc", "lntb")
+BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+# BTC multipliers of a BOLT11 amount, in msat
+BOLT11_MSAT = {"": 10**11, "m": 10**8, "u": 10**5, "n": 10**2}
+
+
+def decode_bolt11(payment_request):
+    """Fields of an LND /v1/payreq answer that can be read without LND.
+
+    The signature is not checked and ``destination`` is only set when the
+    request carries it, LND verifies both once the request is paid.
+    """
+    hrp, _, data = payment_request.lower().rpartition("1")
+    words = [BECH32_CHARSET.index(c) for c in data][:-6]
+    amount = re.fullmatch(r"ln[a-z]+?(\d*)([munp]?)", hrp)
+    if amount[1]:
+        num_msat = (
+            int(amount[1]) // 10
+            if amount[2] == "p"
+            else int(amount[1]) * BOLT11_MSAT[amount[2]]
+        )
+    else:
+        num_msat = 0
+
+    def to_int(field):
+        value = 0
+        for word in field:
+            value = value << 5 | word
+        return value
+
+    def to_bytes(field, size):
+        # drop the padding bits of the last word
+        return (to_int(field) >> len(field) * 5 - size * 8).to_bytes(size, "big")
+
+    decoded = {
+        "timestamp": str(to_int(words[:7])),
+        "expiry": "3600",
+        "num_satoshis": str(num_msat // 1000),
+        "num_msat": str(num_msat),
+    }
+    tagged, i = words[7:-104], 0
+    while i + 3 <= len(tagged):
+        tag, length = tagged[i], tagged[i + 1] << 5 | tagged[i + 2]
+        field = tagged[i + 3 : i + 3 + length]
+        i += 3 + length
+        if tag == 1 and length == 52:  # p
+            decoded["payment_hash"] = to_bytes(field, 32).hex()
+        elif tag == 6:  # x
+            decoded["expiry"] = str(to_int(field))
+        elif tag == 19 and length == 53:  # n
+            decoded["destination"] = to_bytes(field, 33).hex()
+    return decoded
+
 
 class BitcoinLightning(Crypto):
     _display_name = "BTC Lightning"
+    # every invoice is a new payment request for its own amount
+    address_pool_supported = False
 
     def __init__(self) -> None:
         self.crypto = "BTC-LIGHTNING"
@@ -51,19 +118,36 @@ class BitcoinLightning(Crypto):
             environ.get("LIGHTNING_INVOICE_TTL", 60 * 60 * 24 * 7)
         )
         self.LIGHTNING_INVOICE_REFRESH_PERIOD = int(
-            environ.get("LIGHTNING_INVOICE_REFRESH_PERIOD", 3)
+            environ.get("LIGHTNING_INVOICE_REFRESH_PERIOD", 60)
         )
         self.LIGHTNING_INVOICE_ERROR_WAIT_PERIOD = int(
             environ.get("LIGHTNING_INVOICE_ERROR_WAIT_PERIOD", 60)
         )
         self.LIGHTNING_SEND_TO_SHKEEPER_PERIOD = int(
-            environ.get("LIGHTNING_SEND_TO_SHKEEPER_PERIOD", 1)
+            environ.get("LIGHTNING_SEND_TO_SHKEEPER_PERIOD", 60)
         )
 
         self.LIGHTNING_REQUESTS_TIMEOUT = int(
             environ.get("LIGHTNING_REQUESTS_TIMEOUT", 60)
         )
 
+        # LND only tries routes whose fees stay below this share of the amount
+        self.LIGHTNING_PAYOUT_FEE_LIMIT_PERCENT = Decimal(
+            environ.get("LIGHTNING_PAYOUT_FEE_LIMIT_PERCENT", 100)
+        )
+        self.LIGHTNING_PAYOUT_WORKERS = int(
+            environ.get("LIGHTNING_PAYOUT_WORKERS", 4)
+        )
+        self.LIGHTNING_PAYOUT_TASKS_KEPT = 1000
+        # payouts LND can't report on for this long are given up as failed
+        self.LIGHTNING_PAYOUT_TRACK_MAX_AGE = int(
+            environ.get("LIGHTNING_PAYOUT_TRACK_MAX_AGE", 60 * 60)
+        )
+
+        self.LIGHTNING_DECODE_CACHE_TTL = int(
+            environ.get("LIGHTNING_DECODE_CACHE_TTL", 300)
+        )
+
         self.LIGHTNING_WALLET_UNLOCK_PERIOD = int(
             environ.get("LIGHTNING_WALLET_UNLOCK_PERIOD", 5)
         )
@@ -78,6 +162,18 @@ class BitcoinLightning(Crypto):
 
         self._lnurl = None
         self._threads_started = False
+        # r_hash of settled invoices, consumed by invoice_notificator
+        self._settled = queue.Queue()
+        # payment hash -> get_task() response of payouts started here
+        self._payout_tasks = OrderedDict()
+        self._payout_tasks_lock = threading.Lock()
+        self._payout_executor = ThreadPoolExecutor(
+            max_workers=self.LIGHTNING_PAYOUT_WORKERS,
+            thread_name_prefix="lightning-payout",
+        )
+        # fee estimation and the payout that follows decode the same data
+        self._lnurl_cache = TTLCache(ttl=self.LIGHTNING_DECODE_CACHE_TTL)
+        self._payreq_cache = TTLCache(ttl=self.LIGHTNING_DECODE_CACHE_TTL)
 
     def start_threads(self, flask_app):
         if self._threads_started:
@@ -226,6 +322,10 @@ class BitcoinLightning(Crypto):
     def to_base64_string(hex_string):
         return base64.b64encode(codecs.decode(hex_string, "hex")).decode()
 
+    @staticmethod
+    def to_base64url_string(hex_string):
+        return base64.urlsafe_b64encode(codecs.decode(hex_string, "hex")).decode()
+
     def mkaddr(self, **kwargs) -> str:
         data = {
             "value": 0,
@@ -242,7 +342,17 @@ class BitcoinLightning(Crypto):
         r = invoices_response.json()
         r["r_hash"] = self.to_hex_string(r["r_hash"])
         bli = BLI()
-        bli.update(**r)
+        # the subscription's "add" event may land before this commit and be
+        # skipped, so the row must be complete without it
+        bli.update(
+            **{
+                "state": LightningInvoiceState.OPEN,
+                "creation_date": int(time()),
+                "expiry": data["expiry"],
+                "value": data["value"],
+                **r,
+            }
+        )
         return r["payment_request"]
 
     def invoice_listener(self, app):
@@ -251,8 +361,15 @@ class BitcoinLightning(Crypto):
         while True:
             with app.app_context():
                 try:
+                    self.reconcile_invoices()
+                    # LND replays adds and settles after the given indexes
+                    params = {
+                        "add_index": self.get_index("add_index"),
+                        "settle_index": self.get_index("settle_index"),
+                    }
                     r = self.session.get(
                         f"{self.LND_REST_URL}/v1/invoices/subscribe",
+                        params=params,
                         stream=True,
                         timeout=None,
                     )
@@ -261,74 +378,147 @@ class BitcoinLightning(Crypto):
                     for raw_response in r.iter_lines():
                         json_response = json.loads(raw_response)
                         app.logger.debug(f"invoice update: {json_response}")
-                        r = json_response["result"]
-                        r["r_hash"] = self.to_hex_string(r["r_hash"])
-                        if inv := BLI.query.filter(BLI.r_hash == r["r_hash"]).first():
-                            inv.update(**r)
-                        else:
-                            app.logger.debug(
-                                f"invoice not (yet) found in db. Update body: {json_response}"
-                            )
+                        self.apply_invoice_update(json_response["result"])
                 except Exception as e:
                     app.logger.exception(f"error: {e}")
                     sleep(self.LIGHTNING_INVOICE_ERROR_WAIT_PERIOD)
 
+    def get_index(self, name) -> int:
+        return int(tx_ingest.get_cursor(f"btc_lightning_{name}") or 0)
+
+    def set_index(self, name, value):
+        if int(value or 0) > self.get_index(name):
+            tx_ingest.set_cursor(f"btc_lightning_{name}", int(value))
+
+    def set_indexes(self, updates):
+        for name in ("add_index", "settle_index"):
+            self.set_index(name, max(int(r.get(name) or 0) for r in updates))
+
+    def store_invoice_update(self, r):
+        """Stage an LND invoice update, returns its r_hash if it is to be recorded."""
+        r["r_hash"] = self.to_hex_string(r["r_hash"])
+        if inv := BLI.query.filter(BLI.r_hash == r["r_hash"]).first():
+            inv.update(commit=False, **r)
+            if inv.state == LightningInvoiceState.SETTLED and not inv.sent_to_shkeeper:
+                return inv.r_hash
+        else:
+            app.logger.debug(f"invoice not (yet) found in db: {r['r_hash']}")
+        return None
+
+    def apply_invoice_updates(self, updates):
+        settled = [self.store_invoice_update(r) for r in updates]
+        db.session.commit()
+        self.set_indexes(updates)
+        for r_hash in settled:
+            if r_hash:
+                self._settled.put(r_hash)
+
+    def apply_invoice_update(self, r):
+        self.apply_invoice_updates([r])
+
+    def reconcile_invoices(self, page_size=1000):
+        """Catch up on invoices added since the stored add_index with listinvoices."""
+        # settle_index=0 makes the subscription replay nothing, so until a
+        # settlement was seen missed ones can only be found by a full scan
+        index_offset = self.get_index("add_index") if self.get_index("settle_index") else 0
+        while True:
+            r = self.session.get(
+                f"{self.LND_REST_URL}/v1/invoices",
+                params={"index_offset": index_offset, "num_max_invoices": page_size},
+                timeout=self.LIGHTNING_REQUESTS_TIMEOUT,
+            ).json()
+            invoices = r.get("invoices", [])
+            if invoices:
+                # one commit per page, the first replay may cover every invoice
+                self.apply_invoice_updates(invoices)
+            if len(invoices) < page_size:
+                break
+            index_offset = int(r["last_index_offset"])
+
     def invoice_refresher(self, app):
+        """Mark expired invoices as canceled.
+
+        LND cancels expired invoices without telling invoice subscribers, so
+        this is done locally with one UPDATE instead of polling every invoice.
+        """
         app.logger.debug("Thread started.")
 
-        inactive_statuses = ("SETTLED", "CANCELED")
         while True:
             sleep(self.LIGHTNING_INVOICE_REFRESH_PERIOD)
             with app.app_context():
                 try:
-                    unpaid_invoices = BLI.query.filter(
-                        (BLI.state.not_in(inactive_statuses)) | BLI.state.is_(None)
-                    ).all()
-                    if len(unpaid_invoices):
-                        app.logger.debug(
-                            f"db has {len(unpaid_invoices)} unpaid invoces"
-                        )
-                    for inv in unpaid_invoices:
-                        r = self.session.get(
-                            f"{self.LND_REST_URL}/v1/invoice/{inv.r_hash}",
-                            timeout=self.LIGHTNING_REQUESTS_TIMEOUT,
-                        ).json()
-                        r["r_hash"] = self.to_hex_string(r["r_hash"])
-                        inv.update(**r)
+                    expired = BLI.query.filter(
+                        BLI.state == LightningInvoiceState.OPEN,
+                        BLI.creation_date + BLI.expiry < int(time()),
+                    ).update(
+                        {"state": LightningInvoiceState.CANCELED},
+                        synchronize_session=False,
+                    )
+                    db.session.commit()
+                    if expired:
+                        app.logger.debug(f"{expired} invoices expired")
+                    self.refresh_stateless_invoices()
                 except Exception as e:
                     app.logger.exception(f"error: {e}")
 
+    def refresh_stateless_invoices(self):
+        """Fetch invoices stored without a state, e.g. by older versions, from LND."""
+        for inv in BLI.query.filter(BLI.state.is_(None)).all():
+            r = self.session.get(
+                f"{self.LND_REST_URL}/v1/invoice/{inv.r_hash}",
+                timeout=self.LIGHTNING_REQUESTS_TIMEOUT,
+            ).json()
+            r["r_hash"] = self.to_hex_string(r["r_hash"])
+            inv.update(commit=False, **r)
+        db.session.commit()
+
     def invoice_notificator(self, app):
+        """Record settled invoices handed over by invoice_listener.
+
+        Invoices that failed or settled before the process started are picked
+        up from the db every LIGHTNING_SEND_TO_SHKEEPER_PERIOD seconds.
+        """
         app.logger.debug("Thread started.")
 
-        s = requests.Session()
-        s.headers = {
-            "X-Shkeeper-Backend-Key": environ.get(
-                "SHKEEPER_BTC_BACKEND_KEY", "shkeeper"
-            )
-        }
+        last_sweep = 0
         while True:
-            sleep(self.LIGHTNING_SEND_TO_SHKEEPER_PERIOD)
+            try:
+                r_hashes = [
+                    self._settled.get(timeout=self.LIGHTNING_SEND_TO_SHKEEPER_PERIOD)
+                ]
+            except queue.Empty:
+                r_hashes = []
             with app.app_context():
                 try:
-                    paid_invoices = BLI.query.filter(
-                        (BLI.state == "SETTLED") & (BLI.sent_to_shkeeper == False)
-                    ).all()
-                    if len(paid_invoices):
-                        app.logger.debug(f"{len(paid_invoices)} notifications pending")
-                    for inv in paid_invoices:
-                        app.logger.debug(f"sending notification for {inv.r_hash}")
-                        r = s.post(
-                            f"http://localhost:5000/api/v1/walletnotify/{self.crypto}/{inv.r_hash}",
-                            timeout=300,
-                        )
-                        app.logger.debug(f"{inv.r_hash} response: {r.text}")
-                        r = r.json()
-                        if "success" == r["status"]:
-                            inv.update(sent_to_shkeeper=True)
-
+                    if time() - last_sweep >= self.LIGHTNING_SEND_TO_SHKEEPER_PERIOD:
+                        last_sweep = time()
+                        pending = BLI.query.filter(
+                            (BLI.state == LightningInvoiceState.SETTLED)
+                            & (BLI.sent_to_shkeeper == False)
+                        ).all()
+                        if len(pending):
+                            app.logger.debug(f"{len(pending)} notifications pending")
+                        r_hashes += [inv.r_hash for inv in pending]
                 except Exception as e:
                     app.logger.exception(f"error: {e}")
+                for r_hash in r_hashes:
+                    try:
+                        self.ingest_settled_invoice(r_hash)
+                    except Exception as e:
+                        app.logger.exception(f"error: {e}")
+                        db.session.rollback()
+
+    def ingest_settled_invoice(self, r_hash):
+        inv = BLI.query.filter(BLI.r_hash == r_hash).first()
+        if not inv or inv.sent_to_shkeeper:
+            return
+        app.logger.debug(f"recording settled invoice {r_hash}")
+        try:
+            tx_ingest.ingest_tx(self, r_hash, self.getaddrbytx(r_hash))
+        except NotRelatedToAnyInvoice:
+            app.logger.warning(f"Transaction {r_hash} is not related to any invoice")
+        balance_cache.invalidate(self.crypto)
+        inv.update(sent_to_shkeeper=True)
 
     def wallet_unlocker(self, app):
         app.logger.debug("Thread started.")
@@ -413,6 +603,7 @@ class BitcoinLightning(Crypto):
                     # Fetch existing LNURL-pay links
                     response = self.lnbits_session.get(
                         f"{self.LNBITS_URL}/lnurlp/api/v1/links",
+                        timeout=self.LIGHTNING_REQUESTS_TIMEOUT,
                     )
 
                     if response.status_code == 200:
@@ -444,6 +635,7 @@ class BitcoinLightning(Crypto):
                         response = self.lnbits_session.post(
                             f"{self.LNBITS_URL}/lnurlp/api/v1/links",
                             json=lnurl_data,
+                            timeout=self.LIGHTNING_REQUESTS_TIMEOUT,
                         )
 
                         if response.status_code != 201:
@@ -480,12 +672,9 @@ class BitcoinLightning(Crypto):
     def estimate_tx_fee(self, amount, **kwargs):
         pay_req, lnurl_info = self.lnurl_to_pr(kwargs["address"])
         app.logger.debug(f"Estimated TX fee for {pay_req}:")
-        decoded_pay_req = self.session.get(
-            f"{self.LND_REST_URL}/v1/payreq/{pay_req}",
-            timeout=self.LIGHTNING_REQUESTS_TIMEOUT,
-        ).json()
+        decoded_pay_req = self.decode_payreq(pay_req)
         app.logger.debug(f"{decoded_pay_req!r}")
-        if "destination" not in decoded_pay_req:
+        if "payment_hash" not in decoded_pay_req:
             return {
                 "status": "error",
                 "error": (
@@ -522,54 +711,154 @@ class BitcoinLightning(Crypto):
         fee: int,
         subtract_fee_from_amount: bool = False,
     ):
+        """Start a payment in the background, the task id is its payment hash."""
         try:
-            destination, lnurl_info = self.lnurl_to_pr(
+            payment_request, lnurl_info = self.lnurl_to_pr(
                 destination, remove_exponent(self.btc_to_msat(amount))
             )
 
-            decoded_pay_req = self.session.get(
-                f"{self.LND_REST_URL}/v1/payreq/{destination}",
-                timeout=self.LIGHTNING_REQUESTS_TIMEOUT,
-            ).json()
+            decoded_pay_req = self.decode_payreq(payment_request)
             app.logger.debug(f"Decoded payment request: {decoded_pay_req!r}")
+            if "payment_hash" not in decoded_pay_req:
+                return {
+                    "result": None,
+                    "error": {
+                        "message": decoded_pay_req.get(
+                            "message", f"Unknown result: {decoded_pay_req!r}"
+                        )
+                    },
+                }
 
             body = {
-                "payment_request": destination,
+                "payment_request": payment_request,
+                "timeout_seconds": self.LIGHTNING_REQUESTS_TIMEOUT,
+                "no_inflight_updates": True,
             }
-            if int(decoded_pay_req["num_satoshis"]) == 0:
+            amount_sat = int(decoded_pay_req["num_satoshis"])
+            if amount_sat == 0:
                 # add user provided amount to zero amount payment request
                 body["amt"] = remove_exponent(self.btc_to_sat(amount))
+                amount_sat = int(self.btc_to_sat(amount))
+            body["fee_limit_sat"] = max(
+                int(amount_sat * self.LIGHTNING_PAYOUT_FEE_LIMIT_PERCENT / 100), 1
+            )
 
-            result = self.session.post(
-                f"{self.LND_REST_URL}/v1/channels/transactions",
-                data=json.dumps(body),
-                timeout=self.LIGHTNING_REQUESTS_TIMEOUT,
-            ).json()
+            task_id = decoded_pay_req["payment_hash"]
+            with self._payout_tasks_lock:
+                self._payout_tasks[task_id] = {"status": "PENDING", "result": None}
+                while len(self._payout_tasks) > self.LIGHTNING_PAYOUT_TASKS_KEPT:
+                    self._payout_tasks.popitem(last=False)
+            self._payout_executor.submit(
+                self._send_payment, app._get_current_object(), task_id, destination, body
+            )
+            return {"task_id": task_id, "result": [], "error": None}
 
-            app.logger.info(f"Payout result: {result!r}")
+        except Exception as e:
+            app.logger.exception("")
+            return {"result": None, "error": {"message": str(e)}}
 
-            if result.get("payment_error"):
-                return {
-                    "result": None,
-                    "error": {
-                        "message": "Payment error: " + repr(result["payment_error"])
-                    },
-                }
+    def _send_payment(self, flask_app, task_id, destination, body):
+        with flask_app.app_context():
+            try:
+                r = self.session.post(
+                    f"{self.LND_REST_URL}/v2/router/send",
+                    data=json.dumps(body),
+                    stream=True,
+                    # the stream ends by itself once timeout_seconds pass
+                    timeout=(
+                        self.LIGHTNING_REQUESTS_TIMEOUT,
+                        self.LIGHTNING_REQUESTS_TIMEOUT * 2,
+                    ),
+                )
+                task = {"status": "FAILURE", "result": f"Unknown result: {r.text!r}"}
+                if r.status_code == 200:
+                    for raw_response in r.iter_lines():
+                        task = self._payment_to_task(
+                            json.loads(raw_response), destination
+                        )
+                        if task["status"] != "PENDING":
+                            break
+            except Exception as e:
+                flask_app.logger.exception(f"Payout {task_id} failed")
+                task = {"status": "FAILURE", "result": str(e)}
+            flask_app.logger.info(f"Payout {task_id} result: {task!r}")
+            with self._payout_tasks_lock:
+                self._payout_tasks[task_id] = task
+            balance_cache.invalidate(self.crypto)
 
-            if result.get("payment_hash"):
-                return {
-                    "result": self.to_hex_string(result["payment_hash"]),
-                    "error": None,
-                }
-            else:
-                return {
-                    "result": None,
-                    "error": {"message": f"Unknown result: {result!r}"},
-                }
+    @staticmethod
+    def _payment_to_task(response, destination):
+        if "result" not in response:
+            message = response.get("error", response)
+            return {"status": "FAILURE", "result": f"Payment error: {message!r}"}
+        payment = response["result"]
+        if payment["status"] == "SUCCEEDED":
+            return {
+                "status": "SUCCESS",
+                "result": [{"dest": destination, "txids": [payment["payment_hash"]]}],
+            }
+        if payment["status"] == "FAILED":
+            return {
+                "status": "FAILURE",
+                "result": f"Payment error: {payment.get('failure_reason')!r}",
+            }
+        return {"status": "PENDING", "result": None}
 
+    def decode_payreq(self, payment_request):
+        if decoded := self._payreq_cache.get(payment_request):
+            return decoded
+        decoded = self.session.get(
+            f"{self.LND_REST_URL}/v1/payreq/{payment_request}",
+            timeout=self.LIGHTNING_REQUESTS_TIMEOUT,
+        ).json()
+        if "payment_hash" in decoded:
+            self._payreq_cache.set(payment_request, decoded)
+        return decoded
+
+    def get_task(self, id):
+        with self._payout_tasks_lock:
+            if task := self._payout_tasks.get(id):
+                return dict(task)
+
+        # Started by another worker or before a restart, ask LND
+        payout = Payout.query.filter_by(crypto=self.crypto, task_id=id).first()
+        destination = payout.dest_addr if payout else None
+        try:
+            r = self.session.get(
+                f"{self.LND_REST_URL}/v2/router/track/{self.to_base64url_string(id)}",
+                params={"no_inflight_updates": True},
+                stream=True,
+                timeout=self.LIGHTNING_REQUESTS_TIMEOUT,
+            )
+            with r:
+                if r.status_code == 404:
+                    # "payment isn't initiated", LND never got this payment
+                    return {
+                        "status": "FAILURE",
+                        "result": f"Payment {id} is unknown to LND",
+                    }
+                if r.status_code == 200:
+                    for raw_response in r.iter_lines():
+                        return self._payment_to_task(
+                            json.loads(raw_response), destination
+                        )
+                else:
+                    app.logger.warning(
+                        f"Can't track payment {id}: {r.status_code} {r.text}"
+                    )
+        except requests.exceptions.ReadTimeout:
+            # LND knows the payment and holds the stream until it settles
+            return {"status": "PENDING", "result": None}
         except Exception as e:
-            app.logger.exception("")
-            return {"result": None, "error": {"message": str(e)}}
+            app.logger.warning(f"Can't track payment {id}: {e}")
+
+        max_age = datetime.timedelta(seconds=self.LIGHTNING_PAYOUT_TRACK_MAX_AGE)
+        if payout and payout.created_at < datetime.datetime.utcnow() - max_age:
+            return {
+                "status": "FAILURE",
+                "result": f"Payment {id} was not tracked by LND in {max_age}",
+            }
+        return {"status": "PENDING", "result": None}
 
     def create_wallet(self):
         # moved to lndinit
@@ -587,7 +876,27 @@ class BitcoinLightning(Crypto):
         return self._wallet.query.filter_by(crypto=self.crypto).first()
 
     def get_all_addresses(self) -> List[str]:
-        return [invoice.payment_request for invoice in BLI.query.all()]
+        return list(self.iter_all_addresses())
+
+    def get_addresses_page(self, after_id=0, limit=1000) -> Tuple[List[str], int]:
+        """Payment requests of invoices with id > ``after_id`` and the last id seen."""
+        rows = (
+            BLI.query.with_entities(BLI.id, BLI.payment_request)
+            .filter(BLI.id > after_id)
+            .order_by(BLI.id)
+            .limit(limit)
+            .all()
+        )
+        return [row.payment_request for row in rows], rows[-1].id if rows else after_id
+
+    def iter_all_addresses(self, page_size=1000):
+        after_id = 0
+        while True:
+            addresses, last_id = self.get_addresses_page(after_id, page_size)
+            yield from addresses
+            if len(addresses) < page_size:
+                return
+            after_id = last_id
 
     #
     # LNURL
@@ -611,17 +920,26 @@ class BitcoinLightning(Crypto):
 
     def lnbits_decode_lnurl(self, lnurl):
         app.logger.debug(f"lnbits_decode_lnurl called with lnurl={lnurl}")
+        if result := self._lnurl_cache.get(lnurl):
+            return result
         app.logger.debug(f"Posting to {self.LNBITS_URL}/api/v1/lnurlscan")
         result = self.lnbits_session.post(
-            f"{self.LNBITS_URL}/api/v1/lnurlscan", json={"lnurl": lnurl}
+            f"{self.LNBITS_URL}/api/v1/lnurlscan",
+            json={"lnurl": lnurl},
+            timeout=self.LIGHTNING_REQUESTS_TIMEOUT,
         ).json()
         app.logger.debug(f"lnbits_decode_lnurl result: {result}")
+        if "callback" in result:
+            self._lnurl_cache.set(lnurl, result)
         return result
 
     def lnurl_to_pr(self, destination, amount=None):
         app.logger.debug(
             f"lnurl_to_pr called with destination={destination}, amount={amount}"
         )
+        if destination.lower().startswith(BOLT11_PREFIXES):
+            # already a payment request, nothing to resolve
+            return destination, None
         try:
             app.logger.debug(f"Decoding LNURL: {destination}")
             lnurl_info = self.lnbits_decode_lnurl(destination)
@@ -632,10 +950,19 @@ class BitcoinLightning(Crypto):
 
             callback_url = f"{lnurl_info['callback']}?amount={amount}"
             app.logger.debug(f"Requesting payment request from: {callback_url}")
-            lnurl_pr_info = requests.get(callback_url).json()
+            lnurl_pr_info = requests.get(
+                callback_url, timeout=self.LIGHTNING_REQUESTS_TIMEOUT
+            ).json()
             app.logger.debug(f"Payment request response: {lnurl_pr_info}")
 
             new_destination = lnurl_pr_info["pr"]
+            # a fresh request every time, decode it here instead of in LND
+            try:
+                decoded = decode_bolt11(new_destination)
+            except (ValueError, TypeError):
+                decoded = {}  # left to LND
+            if "payment_hash" in decoded:
+                self._payreq_cache.set(new_destination, decoded)
             app.logger.debug(
                 f"Successfully converted LNURL to payment request: {new_destination}"
             )
@@ -652,4 +979,4 @@ class BitcoinLightning(Crypto):
     @property
     def fee_deposit_account(self):
         FeeDepositAccount = namedtuple("FeeDepositAccount", "addr balance")
-        return FeeDepositAccount(self.get_lnurl(), self.balance())
+        return FeeDepositAccount(self.get_lnurl(), self.cached_balance())
@@ -1,8 +1,9 @@
-from decimal import Decimal
+from decimal import ROUND_DOWN, Decimal
 from os import environ
-from shkeeper import requests
+import requests
 
 from shkeeper.modules.classes.bitcoin_like_crypto import BitcoinLikeCrypto
+from shkeeper.services import money
 
 
 class firo_spark(BitcoinLikeCrypto):
@@ -18,10 +19,10 @@ class firo_spark(BitcoinLikeCrypto):
         return "firod:8332"
     
     def tofiro(self, ufiro_amount):
-        return Decimal(ufiro_amount / 100_000_000)
+        return money.from_units(ufiro_amount, self.precision)
     
     def tosat(self, firo_amount):
-        return int(Decimal(firo_amount) * 100_000_000)
+        return money.to_units(firo_amount, self.precision, rounding=ROUND_DOWN)
 
     def get_rpc_credentials(self):
         username = environ.get("FIRO_USERNAME", "shkeeper")
@@ -42,9 +43,7 @@ class firo_spark(BitcoinLikeCrypto):
     
     def balance(self):
         try:
-            response = requests.post(
-                "http://" + self.gethost(),
-                auth=self.get_rpc_credentials(),
+            response = self.transport.post(
                 json=self.build_rpc_request("getsparkbalance", ),
             ).json(parse_float=Decimal)
             balance = self.tofiro(response["result"]["availableBalance"])
@@ -56,17 +55,13 @@ class firo_spark(BitcoinLikeCrypto):
     def mkpayout(self, destination, amount, fee, subtract_fee_from_amount=False):
         btc_per_kb = "%.8f" % (float(fee) / 100000)
 
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
+        response = self.transport.post(
             json=self.build_rpc_request("settxfee", btc_per_kb),
         ).json(parse_float=Decimal)
         if response["error"]:
             return response
 
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
+        response = self.transport.post(
             json=self.build_spendspark_request(
                 "spendspark",
                 [
@@ -80,27 +75,23 @@ class firo_spark(BitcoinLikeCrypto):
         return response
 
     def mkaddr(self, **kwargs):
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
+        response = self.transport.post(
             json=self.build_rpc_request("getnewsparkaddress"),
         ).json(parse_float=Decimal)
         addr = response["result"][0]
         return addr
 
-    def getaddrbytx(self, txid):
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
-            json=self.build_rpc_request("getsparkcoinaddr", txid),
-        ).json(parse_float=Decimal)
-
-        firo_response = requests.post( # only to get confirmations
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
-            json=self.build_rpc_request("gettransaction", txid),
-        ).json(parse_float=Decimal)
+    def mkaddrs(self, count):
+        return [self.mkaddr() for _ in range(count)]
 
+    def getaddrbytx(self, txid):
+        response, firo_response = self.rpc_batch(
+            [
+                ("getsparkcoinaddr", txid),
+                ("gettransaction", txid), # only to get confirmations
+            ],
+            op="getaddrbytx",
+        )
 
         if response["error"]:
             raise Exception(
@@ -144,14 +135,33 @@ class firo_spark(BitcoinLikeCrypto):
                 f"failed to find details in txid {txid}: {response['result']}"
             )
 
+    @property
+    def pull_ingestion_enabled(self):
+        # listsinceblock does not report spark addresses
+        return False
+
     def get_confirmations_by_txid(self, txid):
         _, _, confirmations, _ = self.getaddrbytx(txid)[0]
         return confirmations
 
+    def get_confirmations_by_txids(self, txids):
+        txids = list(txids)
+        calls = []
+        for txid in txids:
+            calls.append(("getsparkcoinaddr", txid))
+            calls.append(("gettransaction", txid))
+        responses = self.rpc_batch(calls, op="get_confirmations")
+        confirmations = {}
+        for i, txid in enumerate(txids):
+            spark, firo = responses[2 * i], responses[2 * i + 1]
+            # plain FIRO transactions have no spark coins, skip them like getaddrbytx does
+            if spark["error"] or not spark["result"] or firo["error"]:
+                continue
+            confirmations[txid] = firo["result"]["confirmations"]
+        return confirmations
+
     def get_all_addresses(self):
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
+        response = self.transport.post(
             json=self.build_rpc_request("getallsparkaddresses"),
         ).json(parse_float=Decimal)
         return (
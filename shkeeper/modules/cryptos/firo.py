@@ -1,8 +1,11 @@
 from decimal import Decimal
-from shkeeper import requests
+import requests
 
 from shkeeper.modules.classes.bitcoin_like_crypto import BitcoinLikeCrypto
 
+# Transparent FIRO addresses are 34 characters, spark addresses well over a
+# hundred; anything this long or longer is a spark transfer of the same wallet
+SPARK_ADDRESS_MIN_LENGTH = 140
 
 class firo(BitcoinLikeCrypto):
     wallet_created = True
@@ -18,9 +21,7 @@ class firo(BitcoinLikeCrypto):
     
     def balance(self):
         try:
-            response = requests.post(
-                "http://" + self.gethost(),
-                auth=self.get_rpc_credentials(),
+            response = self.transport.post(
                 json=self.build_rpc_request("getbalance"),
             ).json(parse_float=Decimal)
             balance = response["result"]
@@ -30,9 +31,7 @@ class firo(BitcoinLikeCrypto):
         return balance
     
     def getaddrbytx(self, txid):
-        response = requests.post(
-            "http://" + self.gethost(),
-            auth=self.get_rpc_credentials(),
+        response = self.transport.post(
             json=self.build_rpc_request("gettransaction", txid),
         ).json(parse_float=Decimal)
 
@@ -46,7 +45,7 @@ class firo(BitcoinLikeCrypto):
         print(response["result"]["details"])
         for transfer in response["result"]["details"]:
             if ("address" in transfer.keys() and # FIRO-SPARK results [{'account': '', 'category': 'receive', 'amo.....
-                len(transfer["address"]) < 140): # It is not a firo-spark payout with address
+                len(transfer["address"]) < SPARK_ADDRESS_MIN_LENGTH): # It is not a firo-spark payout with address
                 regular_transfers.append(transfer)
         
         if len(regular_transfers) == 0: 
@@ -69,4 +68,13 @@ class firo(BitcoinLikeCrypto):
             raise Exception(
                 f"failed to find details in txid {txid}: {response['result']}"
             )
-    
+
+    def details_from_listsinceblock(self, transactions):
+        # spark transfers of the same wallet are ingested by FIRO-SPARK
+        regular = [
+            entry
+            for entry in transactions
+            if "address" in entry
+            and len(entry["address"]) < SPARK_ADDRESS_MIN_LENGTH
+        ]
+        return super().details_from_listsinceblock(regular)
@@ -1,4 +1,6 @@
 import os
+import threading
+from collections import defaultdict
 from decimal import Decimal
 from typing import List, Literal, Tuple
 
@@ -13,6 +15,7 @@ from monero.numbers import from_atomic
 from monero.wallet import Wallet
 
 from shkeeper.modules.classes.crypto import Crypto
+from shkeeper.services.circuit_breaker import guard
 
 
 class Monero(Crypto):
@@ -25,6 +28,8 @@ class Monero(Crypto):
         const.PRIO_PRIORITY: "Priority",
     }
     precision = 12
+    # blocks re-scanned on each pull in case the wallet reorganized them
+    ingest_reorg_depth = 10
 
     def __init__(self) -> None:
         self.crypto = "XMR"
@@ -48,37 +53,82 @@ class Monero(Crypto):
             "MONERO_WALLET_RPC_PASS", "shkeeper"
         )
 
+        # blocks scanned back on the first pull, about a day of Monero blocks
+        self.MONERO_INGEST_LOOKBACK = int(
+            os.environ.get("MONERO_INGEST_LOOKBACK", "720")
+        )
+
+        # Clients are created once and reused, each keeps its own HTTP session
+        self._clients_lock = threading.Lock()
+        # wallet-rpc handles one transfer at a time
+        self._transfer_lock = threading.Lock()
+        self._daemon = None
+        self._rpc_wallet = None
+        self._monero_wallet = None
+        self._primary_address = None
+
     def getname(self):
         return "Monero"
 
     def gethost(self):
         return f"{self.MONERO_WALLET_RPC_HOST}:{self.MONERO_WALLET_RPC_PORT}"
 
+    def getdaemonhost(self):
+        return f"{self.MONERO_DAEMON_HOST}:{self.MONERO_DAEMON_PORT}"
+
     @property
     def monero_daemon(self):
-        return Daemon(
-            host=self.MONERO_DAEMON_HOST,
-            port=self.MONERO_DAEMON_PORT,
-            user=self.MONERO_DAEMON_USER,
-            password=self.MONERO_DAEMON_PASS,
-        )
+        if self._daemon is None:
+            with self._clients_lock:
+                if self._daemon is None:
+                    self._daemon = Daemon(
+                        host=self.MONERO_DAEMON_HOST,
+                        port=self.MONERO_DAEMON_PORT,
+                        user=self.MONERO_DAEMON_USER,
+                        password=self.MONERO_DAEMON_PASS,
+                    )
+        return self._daemon
 
     @property
     def monero_rpc_wallet(self):
-        return JSONRPCWallet(
-            host=self.MONERO_WALLET_RPC_HOST,
-            port=self.MONERO_WALLET_RPC_PORT,
-            user=self.MONERO_WALLET_RPC_USER,
-            password=self.MONERO_WALLET_RPC_PASS,
-        )
+        if self._rpc_wallet is None:
+            with self._clients_lock:
+                if self._rpc_wallet is None:
+                    self._rpc_wallet = JSONRPCWallet(
+                        host=self.MONERO_WALLET_RPC_HOST,
+                        port=self.MONERO_WALLET_RPC_PORT,
+                        user=self.MONERO_WALLET_RPC_USER,
+                        password=self.MONERO_WALLET_RPC_PASS,
+                    )
+        return self._rpc_wallet
 
     @property
     def monero_wallet(self):
-        return Wallet(self.monero_rpc_wallet)
+        # Wallet() loads the account list from wallet-rpc, a failed attempt
+        # leaves it unset so the next access retries
+        if self._monero_wallet is None:
+            rpc_wallet = self.monero_rpc_wallet
+            with self._clients_lock:
+                if self._monero_wallet is None:
+                    self._monero_wallet = Wallet(rpc_wallet)
+        return self._monero_wallet
+
+    @property
+    def primary_address(self) -> str:
+        if self._primary_address is None:
+            self._primary_address = str(self.monero_wallet.address())
+        return self._primary_address
+
+    def reset_wallet_cache(self):
+        """Forget the account list and addresses of the currently open wallet."""
+        with self._clients_lock:
+            self._monero_wallet = None
+            self._primary_address = None
 
     def balance(self) -> Decimal:
         try:
-            return self.monero_wallet.balance(unlocked=True)
+            with guard(self.gethost()):
+                return self.monero_wallet.balance(unlocked=True)
         except Exception as e:
             app.logger.exception(f"Can't get balance")
             return Decimal(0)
@@ -100,11 +150,13 @@ class Monero(Crypto):
             "open_wallet",
             {"filename": self.MONERO_WALLET_NAME, "password": self.MONERO_WALLET_PASS},
         )
+        self.reset_wallet_cache()
         return {"error": None}
 
     def getstatus(self) -> str:
         try:
-            info = self.monero_daemon.info()
+            with guard(self.getdaemonhost()):
+                info = self.monero_daemon.info()
             if info["status"] == "OK":
                 if info["synchronized"]:
                     status = "Synced"
@@ -117,10 +169,28 @@ class Monero(Crypto):
         except Exception as e:
             return "Offline"
 
+    def get_chain_height(self, fresh=False):
+        try:
+            with guard(self.getdaemonhost()):
+                # daemon height is the block count, top block is one below it
+                return self.monero_daemon.height() - 1
+        except Exception as e:
+            return None
+
     def mkaddr(self, **kwargs) -> str:
-        address = self.monero_wallet.new_address()[0]
+        with guard(self.gethost()):
+            address = self.monero_wallet.new_address()[0]
         return str(address)
 
+    def mkaddrs(self, count):
+        with guard(self.gethost()):
+            res = self.monero_rpc_wallet.raw_request(
+                "create_address", {"account_index": 0, "count": count}
+            )
+        # the wallet's cached address list is now stale
+        self.reset_wallet_cache()
+        return res["addresses"]
+
     def getaddrbytx(
         self, txid
     ) -> List[Tuple[str, Decimal, int, Literal["send", "receive"]]]:
@@ -141,6 +211,56 @@ class Monero(Crypto):
             details.append((address, amount, confirmations, operation))
         return details
 
+    def pull_transactions(self) -> bool:
+        from shkeeper.services import tx_ingest
+
+        cursor_name = f"{self.crypto}_transfers_height"
+        cursor = tx_ingest.get_cursor(cursor_name)
+        with guard(self.gethost()):
+            height = self.monero_rpc_wallet.raw_request("get_height")["height"]
+            if cursor is None:
+                cursor = max(height - self.MONERO_INGEST_LOOKBACK, 0)
+            else:
+                cursor = int(cursor)
+            # min_height is exclusive, pool transfers come regardless of height
+            res = self.monero_rpc_wallet.raw_request(
+                "get_transfers",
+                {
+                    "in": True,
+                    "pool": True,
+                    "filter_by_height": True,
+                    "min_height": cursor,
+                },
+            )
+
+        txs = defaultdict(list)
+        heights = {}
+        for transfer in res.get("in", []) + res.get("pool", []):
+            txid = transfer["txid"]
+            txs[txid].append(
+                (
+                    transfer["address"],
+                    from_atomic(transfer["amount"]),
+                    transfer.get("confirmations", 0),
+                    "receive",
+                )
+            )
+            heights[txid] = transfer.get("height", 0)
+        app.logger.debug(f"[{self.crypto}] pulled {len(txs)} txs above {cursor}")
+
+        failed = tx_ingest.ingest_many(self, txs)
+
+        # wallet height is the block count, top block is one below it
+        new_cursor = height - 1 - self.ingest_reorg_depth
+        failed_heights = [heights[txid] for txid in failed if heights[txid]]
+        if failed_heights:
+            new_cursor = min(new_cursor, min(failed_heights) - 1)
+        if new_cursor > cursor:
+            tx_ingest.set_cursor(cursor_name, new_cursor)
+        elif tx_ingest.get_cursor(cursor_name) is None:
+            tx_ingest.set_cursor(cursor_name, cursor)
+        return True
+
     def get_confirmations_by_txid(self, txid) -> int:
         _, _, confirmations, _ = self.getaddrbytx(txid)[0]
         return confirmations
@@ -155,16 +275,19 @@ class Monero(Crypto):
         try:
             priority_class = fee if fee in self.fixed_fee_steps else self.default_fee
             result = error = None
-            if amount == self.balance():
-                res_list = self.monero_wallet.sweep_all(
-                    destination, priority=priority_class
-                )
-                result = [res[0].hash for res in res_list]
-            else:
-                txs = self.monero_wallet.transfer(
-                    destination, amount, priority=priority_class
-                )
-                result = [tx.hash for tx in txs]
+            with self._transfer_lock:
+                # fresh balance, a cached one may predate new deposits and
+                # sweep them out along with the requested amount
+                if amount == self.balance():
+                    res_list = self.monero_wallet.sweep_all(
+                        destination, priority=priority_class
+                    )
+                    result = [res[0].hash for res in res_list]
+                else:
+                    txs = self.monero_wallet.transfer(
+                        destination, amount, priority=priority_class
+                    )
+                    result = [tx.hash for tx in txs]
         except Exception as e:
             error = {"message": str(e)}
         return {"result": result, "error": error}
@@ -173,12 +296,13 @@ class Monero(Crypto):
         if priority_class := kwargs.get("priority_class") is None:
             priority_class = self.default_fee
 
-        fee = self.monero_wallet.transfer(
-            self.monero_wallet.addresses()[0],
-            amount,
-            priority=priority_class,
-            relay=False,
-        )[0].fee
+        with self._transfer_lock:
+            fee = self.monero_wallet.transfer(
+                self.primary_address,
+                amount,
+                priority=priority_class,
+                relay=False,
+            )[0].fee
         app.logger.debug(
             f"Estimated fee for transfer of {amount} XMR with priority {priority_class} is {fee}"
         )
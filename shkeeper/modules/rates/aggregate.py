@@ -0,0 +1,180 @@
+import statistics
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from decimal import Decimal
+from functools import cached_property
+
+import prometheus_client
+
+from shkeeper.modules.classes.rate_source import RateSource
+
+_settings = {
+    "sources": "binance,kraken,coinbase,kucoin",
+    "quorum": 2,
+    "hedge_delay": 0.3,
+    "timeout": 5.0,
+    # drop answers further than this from the median, as a fraction of it
+    "max_deviation": Decimal("0.02"),
+    "workers": 8,
+}
+
+source_latency = prometheus_client.Histogram(
+    "shkeeper_rate_source_latency_seconds",
+    "Rate source response time, as seen by the aggregate source",
+    ["source"],
+)
+source_errors = prometheus_client.Counter(
+    "shkeeper_rate_source_errors",
+    "Failed rate source requests, as seen by the aggregate source",
+    ["source"],
+)
+
+
+def configure(
+    sources=None,
+    quorum=None,
+    hedge_delay=None,
+    timeout=None,
+    max_deviation=None,
+    workers=None,
+):
+    if sources is not None:
+        _settings["sources"] = sources
+    if quorum is not None:
+        _settings["quorum"] = int(quorum)
+    if hedge_delay is not None:
+        _settings["hedge_delay"] = float(hedge_delay)
+    if timeout is not None:
+        _settings["timeout"] = float(timeout)
+    if max_deviation is not None:
+        _settings["max_deviation"] = Decimal(str(max_deviation))
+    if workers is not None:
+        _settings["workers"] = int(workers)
+
+
+def _agreeing(values):
+    median = statistics.median(values)
+    return [
+        v for v in values if abs(v - median) <= median * _settings["max_deviation"]
+    ]
+
+
+def agree(values) -> bool:
+    """At least two of ``values`` are close to their median.
+
+    Two answers that disagree can't tell which one is wrong, that takes a
+    third.
+    """
+    return len(_agreeing(values)) >= min(2, len(values))
+
+
+def median_without_outliers(values):
+    if not agree(values):
+        raise Exception(f"Rate sources disagree: {values}")
+    return statistics.median(_agreeing(values))
+
+
+class Aggregate(RateSource):
+    """Median of several sources, asked in parallel.
+
+    ``quorum`` sources are asked first. Another one is added whenever one
+    fails, none answers within ``hedge_delay`` or the answers disagree, and
+    the answer is ready as soon as ``quorum`` sources agree, so a slow or
+    wrong source doesn't hold the rate up.
+    """
+
+    name = "aggregate"
+
+    @cached_property
+    def executor(self):
+        return ThreadPoolExecutor(
+            max_workers=_settings["workers"], thread_name_prefix="rates"
+        )
+
+    @property
+    def sources(self):
+        names = [name.strip() for name in _settings["sources"].split(",")]
+        return [
+            self.instances[name]
+            for name in names
+            if name in self.instances and name not in ("manual", self.name)
+        ]
+
+    def _timed(self, source, call):
+        started = time.monotonic()
+        try:
+            return call(source)
+        except Exception:
+            source_errors.labels(source=source.name).inc()
+            raise
+        finally:
+            source_latency.labels(source=source.name).observe(
+                time.monotonic() - started
+            )
+
+    def collect(self, call, agreed=agree):
+        """Results of ``call(source)`` from at least quorum sources if possible.
+
+        More sources are asked while ``agreed(results)`` is false.
+        """
+        quorum = _settings["quorum"]
+        queue = self.sources
+        pending = set()
+        results = []
+        deadline = time.monotonic() + _settings["timeout"]
+
+        def launch():
+            source = queue.pop(0)
+            pending.add(self.executor.submit(self._timed, source, call))
+
+        def settled():
+            return len(results) >= quorum and agreed(results)
+
+        for _ in range(min(quorum, len(queue))):
+            launch()
+        while pending or (queue and not settled()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(
+                pending,
+                timeout=min(_settings["hedge_delay"], remaining),
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                if future.exception() is None:
+                    results.append(future.result())
+            if settled():
+                break
+            wanted = max(quorum, len(results) + 1)
+            if queue and (not done or len(results) + len(pending) < wanted):
+                launch()
+        return results
+
+    def get_rate(self, fiat, crypto):
+        rates = self.collect(lambda source: source.get_rate(fiat, crypto))
+        if not rates:
+            raise Exception(f"Can't get rate for {crypto} / {fiat}")
+        return median_without_outliers(rates)
+
+    def get_rates(self, pairs):
+        pairs = list(pairs)
+
+        def answers_for(answers):
+            for pair in pairs:
+                if values := [answer[pair] for answer in answers if pair in answer]:
+                    yield pair, values
+
+        answers = self.collect(
+            lambda source: source.get_rates(pairs),
+            agreed=lambda answers: all(
+                agree(values) for _, values in answers_for(answers)
+            ),
+        )
+        rates = {}
+        for pair, values in answers_for(answers):
+            try:
+                rates[pair] = median_without_outliers(values)
+            except Exception:
+                continue
+        return rates
@@ -1,7 +1,9 @@
 import json
 from decimal import Decimal
 
-from shkeeper import requests
+import requests
+
+from shkeeper.services.backend_transport import get_transport
 
 from shkeeper.modules.classes.rate_source import RateSource
 
@@ -10,9 +12,43 @@ class Binance(RateSource):
     name = "binance"
 
     def get_rate(self, fiat, crypto):
-        if fiat == "USD" and crypto in self.USDT_CRYPTOS:
+        symbol = self.symbol(fiat, crypto)
+        if symbol is None:
             return Decimal(1.0)
 
+        path = f"/api/v3/ticker/price?symbol={symbol}"
+        answer = get_transport("api.binance.com", scheme="https").get(
+            path, op="get_rate"
+        )
+        if answer.status_code == requests.codes.ok:
+            data = json.loads(answer.text)
+            return Decimal(data["price"])
+
+        raise Exception(f"Can't get rate for {symbol}")
+
+    def get_rates(self, pairs):
+        # Without a symbol the ticker returns the prices of every pair
+        answer = get_transport("api.binance.com", scheme="https").get(
+            "/api/v3/ticker/price", op="get_rates"
+        )
+        if answer.status_code != requests.codes.ok:
+            raise Exception(f"Can't get rates: HTTP {answer.status_code}")
+        prices = {t["symbol"]: t["price"] for t in json.loads(answer.text)}
+
+        rates = {}
+        for fiat, crypto in pairs:
+            symbol = self.symbol(fiat, crypto)
+            if symbol is None:
+                rates[(fiat, crypto)] = Decimal(1.0)
+            elif symbol in prices:
+                rates[(fiat, crypto)] = Decimal(prices[symbol])
+        return rates
+
+    def symbol(self, fiat, crypto):
+        """Binance symbol of the pair, None when the rate is 1 by definition."""
+        if fiat == "USD" and crypto in self.USDT_CRYPTOS:
+            return None
+
         if crypto in self.USDC_CRYPTOS:
             crypto = "USDC"
         
@@ -45,10 +81,4 @@ class Binance(RateSource):
         if fiat == "USD":
             fiat = "USDT"
 
-        url = f"https://api.binance.com/api/v3/ticker/price?symbol={crypto}{fiat}"
-        answer = requests.get(url)
-        if answer.status_code == requests.codes.ok:
-            data = json.loads(answer.text)
-            return Decimal(data["price"])
-
-        raise Exception(f"Can't get rate for {crypto}{fiat}")
+        return f"{crypto}{fiat}"
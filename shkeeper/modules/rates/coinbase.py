@@ -1,7 +1,9 @@
 import json
 from decimal import Decimal
 
-from shkeeper import requests
+import requests
+
+from shkeeper.services.backend_transport import get_transport
 from shkeeper.modules.classes.rate_source import RateSource
 
 
@@ -9,9 +11,54 @@ class Coinbase(RateSource):
     name = "coinbase"
 
     def get_rate(self, fiat, crypto):
-        if fiat == "USD" and crypto in self.USDT_CRYPTOS:
+        pair = self.pair(fiat, crypto)
+        if pair is None:
             return Decimal(1.0)
 
+        currency, quote = pair
+        rates = self.get_exchange_rates(currency)
+        if quote in rates:
+            return Decimal(rates[quote])
+
+        raise Exception(f"Can't get rate for {currency} / {quote}")
+
+    def get_rates(self, pairs):
+        # One request returns the rates of a currency in every other currency
+        by_currency = {}
+        rates = {}
+        for fiat, crypto in pairs:
+            pair = self.pair(fiat, crypto)
+            if pair is None:
+                rates[(fiat, crypto)] = Decimal(1.0)
+            else:
+                by_currency.setdefault(pair[0], []).append((fiat, crypto, pair[1]))
+
+        for currency, wanted in by_currency.items():
+            try:
+                exchange_rates = self.get_exchange_rates(currency)
+            except Exception:
+                continue
+            for fiat, crypto, quote in wanted:
+                if quote in exchange_rates:
+                    rates[(fiat, crypto)] = Decimal(exchange_rates[quote])
+        return rates
+
+    def get_exchange_rates(self, currency):
+        path = f"/v2/exchange-rates?currency={currency}"
+        answer = get_transport("api.coinbase.com", scheme="https").get(
+            path, op="get_rate"
+        )
+        if answer.status_code == requests.codes.ok:
+            data = json.loads(answer.text)
+            return data["data"]["rates"]
+
+        raise Exception(f"Can't get rates for {currency}")
+
+    def pair(self, fiat, crypto):
+        """(currency, quote) to look up, None when the rate is 1 by definition."""
+        if fiat == "USD" and crypto in self.USDT_CRYPTOS:
+            return None
+
         if crypto in self.USDC_CRYPTOS:
             crypto = "USDC"
         
@@ -43,11 +90,5 @@ class Coinbase(RateSource):
 
         if fiat == "USD":
             fiat = "USDT"
-            
-        url = f"https://api.coinbase.com/v2/exchange-rates?currency={crypto}"
-        answer = requests.get(url)
-        if answer.status_code == requests.codes.ok:
-            data = json.loads(answer.text)
-            return Decimal(data["data"]["rates"][fiat])
 
-        raise Exception(f"Can't get rate for {crypto} / {fiat}")
+        return crypto, fiat
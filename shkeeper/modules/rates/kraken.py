@@ -1,7 +1,9 @@
 import json
 from decimal import Decimal
 
-from shkeeper import requests
+import requests
+
+from shkeeper.services.backend_transport import get_transport
 from shkeeper.modules.classes.rate_source import RateSource
 
 
@@ -44,8 +46,10 @@ class Kraken(RateSource):
         if fiat == "USD":
             fiat = "USDT"
             
-        url = f"https://api.kraken.com/0/public/Ticker?pair={crypto}{fiat}"
-        answer = requests.get(url)
+        path = f"/0/public/Ticker?pair={crypto}{fiat}"
+        answer = get_transport("api.kraken.com", scheme="https").get(
+            path, op="get_rate"
+        )
         if answer.status_code == requests.codes.ok:
             data = json.loads(answer.text)
             if len(data["error"]) == 0:
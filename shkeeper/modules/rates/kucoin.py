@@ -1,7 +1,9 @@
 import json
 from decimal import Decimal
 
-from shkeeper import requests
+import requests
+
+from shkeeper.services.backend_transport import get_transport
 
 from shkeeper.modules.classes.rate_source import RateSource
 
@@ -10,6 +12,49 @@ class KuCoin(RateSource):
     name = "kucoin"
 
     def get_rate(self, fiat, crypto):
+        currency = self.currency(crypto)
+        prices = self.get_prices(fiat, [currency])
+        if currency in prices:
+            return prices[currency]
+
+        raise Exception(f"Can't get rate for {currency} in {fiat}")
+
+    def get_rates(self, pairs):
+        by_fiat = {}
+        for fiat, crypto in pairs:
+            by_fiat.setdefault(fiat, []).append(crypto)
+
+        rates = {}
+        for fiat, cryptos in by_fiat.items():
+            currencies = {crypto: self.currency(crypto) for crypto in cryptos}
+            try:
+                prices = self.get_prices(fiat, sorted(set(currencies.values())))
+            except Exception:
+                continue
+            for crypto, currency in currencies.items():
+                if currency in prices:
+                    rates[(fiat, crypto)] = prices[currency]
+        return rates
+
+    def get_prices(self, fiat, currencies):
+        # https://www.kucoin.com/docs/beginners/introduction
+        path = f"/api/v1/prices?base={fiat}&currencies={','.join(currencies)}"
+        answer = get_transport("api.kucoin.com", scheme="https").get(
+            path, op="get_rate"
+        )
+        if answer.status_code == requests.codes.ok:
+            data = json.loads(answer.text)
+            if data.get("code") == "200000":
+                # data will be empty dict if symbol doesnt exist even though code is 200000
+                return {
+                    currency: Decimal(price)
+                    for currency, price in data.get("data", {}).items()
+                    if price is not None
+                }
+
+        raise Exception(f"Can't get rates for {currencies} in {fiat}")
+
+    def currency(self, crypto):
         if crypto in self.USDT_CRYPTOS:
             crypto = "USDT"
 
@@ -42,15 +87,4 @@ class KuCoin(RateSource):
         if crypto == "TON":
             crypto = "GRAM"
 
-        # https://www.kucoin.com/docs/beginners/introduction
-        url = f"https://api.kucoin.com/api/v1/prices?base={fiat}&currencies={crypto}"
-        answer = requests.get(url)
-        if answer.status_code == requests.codes.ok:
-            data = json.loads(answer.text)
-            if data.get("code") == "200000":
-                # data will be empty dict if symbol doesnt exist even though code is 200000
-                price = data.get("data", {}).get(crypto)
-                if price is not None:
-                    return Decimal(price)
-
-        raise Exception(f"Can't get rate for {crypto} in {fiat}")
+        return crypto
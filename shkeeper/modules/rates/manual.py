@@ -1,8 +1,6 @@
 import json
 from decimal import Decimal
 
-from shkeeper import requests
-
 from shkeeper.modules.classes.rate_source import RateSource
 
 
@@ -0,0 +1,124 @@
+"""Deposit addresses generated ahead of time.
+
+Invoice creation claims a pooled address with one indexed UPDATE instead of
+asking the backend for a new one. The address_pool task tops each pool up in
+batches through ``Crypto.mkaddrs()`` once it drops to the low water mark.
+Pooling is off unless ADDRESS_POOL_SIZE is set.
+"""
+from datetime import datetime
+
+import prometheus_client
+from flask import has_app_context
+from prometheus_client.core import GaugeMetricFamily
+
+from shkeeper import db
+
+# attempts to claim an address another worker didn't take first
+CLAIM_ATTEMPTS = 3
+
+_settings = {"size": 0, "low_water": 0, "refill_batch": 20}
+
+pool_misses = prometheus_client.Counter(
+    "shkeeper_address_pool_misses",
+    "Invoice addresses generated synchronously because the pool was empty",
+    ["crypto"],
+)
+
+
+def configure(size=None, low_water=None, refill_batch=None):
+    if size is not None:
+        _settings["size"] = int(size)
+    if low_water is not None:
+        _settings["low_water"] = int(low_water)
+    if refill_batch is not None:
+        _settings["refill_batch"] = int(refill_batch)
+
+
+def enabled(crypto) -> bool:
+    return _settings["size"] > 0 and crypto.address_pool_supported
+
+
+def depth(crypto_name) -> int:
+    from shkeeper.models import PooledAddress
+
+    return PooledAddress.query.filter(
+        PooledAddress.crypto == crypto_name, PooledAddress.claimed_at.is_(None)
+    ).count()
+
+
+def claim(crypto_name):
+    """Take the oldest unclaimed address, None if the pool is empty.
+
+    The claim is part of the caller's transaction and is undone by a rollback.
+    """
+    from shkeeper.models import PooledAddress
+
+    for _ in range(CLAIM_ATTEMPTS):
+        row = (
+            db.session.query(PooledAddress.id, PooledAddress.addr)
+            .filter(
+                PooledAddress.crypto == crypto_name,
+                PooledAddress.claimed_at.is_(None),
+            )
+            .order_by(PooledAddress.id)
+            .first()
+        )
+        if row is None:
+            return None
+        claimed = PooledAddress.query.filter(
+            PooledAddress.id == row.id, PooledAddress.claimed_at.is_(None)
+        ).update({"claimed_at": datetime.utcnow()}, synchronize_session=False)
+        if claimed:
+            return row.addr
+    return None
+
+
+def get_address(crypto, **kwargs):
+    """A pooled address of ``crypto`` or a new one from ``crypto.mkaddr()``."""
+    if enabled(crypto):
+        if addr := claim(crypto.crypto):
+            return addr
+        pool_misses.labels(crypto=crypto.crypto).inc()
+    return crypto.mkaddr(**kwargs)
+
+
+def refill(crypto) -> int:
+    """Top up the pool of ``crypto`` by at most one batch, returns the number added."""
+    from shkeeper.models import PooledAddress
+
+    available = depth(crypto.crypto)
+    if available > _settings["low_water"]:
+        return 0
+    count = min(_settings["size"] - available, _settings["refill_batch"])
+    if count <= 0:
+        return 0
+    addresses = crypto.mkaddrs(count)
+    db.session.add_all(
+        PooledAddress(crypto=crypto.crypto, addr=addr) for addr in addresses
+    )
+    db.session.commit()
+    return len(addresses)
+
+
+class _PoolDepthCollector:
+    def collect(self):
+        if not _settings["size"] or not has_app_context():
+            return
+        from shkeeper.models import PooledAddress
+
+        gauge = GaugeMetricFamily(
+            "shkeeper_address_pool_depth",
+            "Unclaimed pooled deposit addresses",
+            labels=["crypto"],
+        )
+        rows = (
+            db.session.query(PooledAddress.crypto, db.func.count(PooledAddress.id))
+            .filter(PooledAddress.claimed_at.is_(None))
+            .group_by(PooledAddress.crypto)
+        )
+        for crypto_name, count in rows:
+            gauge.add_metric([crypto_name], count)
+        yield gauge
+
+
+prometheus_client.REGISTRY.register(_PoolDepthCollector())
@@ -0,0 +1,135 @@
+"""Concurrent status / balance / metrics collection across crypto backends.
+
+All coroutines run on one background event loop owned by this module. Flask
+views stay synchronous and reach the loop through :func:`run` / :func:`gather`,
+so a fan-out over N chains costs N sockets on one thread instead of N threads.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+import httpx
+
+from shkeeper.services import backend_transport, circuit_breaker
+
+DEFAULT_DEADLINE = 10
+
+_state = {
+    "pid": None,
+    "loop": None,
+    "executor": None,
+    "app": None,
+    "deadline": DEFAULT_DEADLINE,
+}
+_clients: Dict[str, httpx.AsyncClient] = {}
+_lock = threading.Lock()
+
+
+def init_app(app):
+    _state["app"] = app
+    _state["deadline"] = app.config.get(
+        "BACKEND_FANOUT_DEADLINE", app.config.get("REQUESTS_TIMEOUT")
+    )
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    # The loop thread does not survive fork(), start a new one in each worker
+    with _lock:
+        if _state["pid"] != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="async-backend", daemon=True
+            ).start()
+            _clients.clear()
+            _state["loop"] = loop
+            _state["executor"] = ThreadPoolExecutor(
+                max_workers=backend_transport.pool_size(),
+                thread_name_prefix="async-backend-sync",
+            )
+            _state["pid"] = os.getpid()
+        return _state["loop"]
+
+
+def get_client(base_url: str) -> httpx.AsyncClient:
+    """Return the keep-alive client for ``base_url``. Call only from the loop."""
+    client = _clients.get(base_url)
+    if client is None:
+        size = backend_transport.pool_size()
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=size, max_keepalive_connections=size
+            ),
+        )
+        _clients[base_url] = client
+    return client
+
+
+async def run_sync(func, *args):
+    """Await a blocking call for cryptos without a native async client."""
+    app = _state["app"]
+
+    def call():
+        if app is None:
+            return func(*args)
+        with app.app_context():
+            return func(*args)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_state["executor"], call)
+
+
+def run(coro, timeout=None):
+    """Run ``coro`` on the background loop and block until it completes."""
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    return future.result(timeout)
+
+
+async def _call(coro, deadline, default):
+    cancelled = []
+    token = circuit_breaker.cancelled_calls.set(cancelled)
+    try:
+        return await asyncio.wait_for(coro, deadline)
+    except Exception as e:
+        if isinstance(e, asyncio.TimeoutError):
+            # The guard sees our cancellation, not a timeout, so record the
+            # hung host here or its breaker never opens from the fan-out paths
+            for breaker in cancelled:
+                breaker.record_failure()
+        if _state["app"] is not None:
+            _state["app"].logger.warning(f"Backend call failed: {e!r}")
+        return default
+    finally:
+        circuit_breaker.cancelled_calls.reset(token)
+
+
+def gather(coros, deadline=None, default=None):
+    """Run ``coros`` concurrently, each bounded by ``deadline`` seconds.
+
+    Results keep the input order; a call that fails or misses its deadline
+    yields ``default``.
+    """
+    deadline = deadline or _state["deadline"] or DEFAULT_DEADLINE
+    app = _state["app"]
+
+    async def _gather():
+        # Tasks copy the current context, so they all see this app context
+        if app is None:
+            return await asyncio.gather(*(_call(c, deadline, default) for c in coros))
+        with app.app_context():
+            return await asyncio.gather(*(_call(c, deadline, default) for c in coros))
+
+    return run(_gather(), timeout=deadline + 1)
+
+
+def gather_statuses(cryptos, deadline=None):
+    return gather([c.agetstatus() for c in cryptos], deadline, default="Offline")
+
+
+def gather_balances(cryptos, deadline=None):
+    return gather([c.abalance() for c in cryptos], deadline)
+
+
+def gather_metrics(cryptos, deadline=None):
+    return gather([c.ametrics() for c in cryptos], deadline, default="")
@@ -0,0 +1,144 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from shkeeper.services import json_codec
+from shkeeper.services.circuit_breaker import get_breaker
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_POOL_SIZE = 16
+
+_settings = {
+    "timeout": DEFAULT_TIMEOUT,
+    "pool_size": DEFAULT_POOL_SIZE,
+    "timeouts": {},
+}
+_sessions: Dict[str, requests.Session] = {}
+_transports: Dict[Tuple, "BackendTransport"] = {}
+_lock = threading.Lock()
+
+
+def parse_timeouts(value) -> Dict[str, float]:
+    """Parse ``"getstatus=3,metrics=5"`` into ``{"getstatus": 3.0, "metrics": 5.0}``."""
+    if isinstance(value, dict):
+        return {str(k): float(v) for k, v in value.items()}
+    timeouts = {}
+    for item in str(value or "").split(","):
+        if "=" not in item:
+            continue
+        op, seconds = (part.strip() for part in item.split("=", 1))
+        if op and seconds:
+            timeouts[op] = float(seconds)
+    return timeouts
+
+
+def configure(timeout=None, pool_size=None, timeouts=None):
+    if timeout is not None:
+        _settings["timeout"] = timeout
+    if pool_size is not None:
+        _settings["pool_size"] = int(pool_size)
+    if timeouts is not None:
+        _settings["timeouts"] = parse_timeouts(timeouts)
+
+
+def default_timeout():
+    return _settings["timeout"]
+
+
+def pool_size():
+    return _settings["pool_size"]
+
+
+def encode_json(kwargs, body="data"):
+    """Replace a ``json=`` payload in ``kwargs`` with its json_codec encoding."""
+    payload = kwargs.pop("json", None)
+    if payload is not None:
+        kwargs[body] = json_codec.dumpb(payload)
+        kwargs["headers"] = {
+            "Content-Type": "application/json",
+            **(kwargs.get("headers") or {}),
+        }
+    return kwargs
+
+
+def get_session(base_url: str) -> requests.Session:
+    """Return the keep-alive session shared by all callers of ``base_url``."""
+    with _lock:
+        if base_url not in _sessions:
+            pool_size = _settings["pool_size"]
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=pool_size, pool_block=False
+            )
+            session = requests.Session()
+            session.mount(base_url, adapter)
+            _sessions[base_url] = session
+        return _sessions[base_url]
+
+
+class BackendTransport:
+    """Pooled HTTP transport to a single backend host.
+
+    All transports of the same host share one connection pool and one circuit
+    breaker, credentials are resolved once at construction instead of on every
+    call.
+    """
+
+    def __init__(self, host: str, auth=None, scheme: str = "http"):
+        self.host = host
+        self.auth = auth
+        self.base_url = f"{scheme}://{host}"
+        self.session = get_session(self.base_url)
+        self.breaker = get_breaker(host, 443 if scheme == "https" else 80)
+
+    def timeout_for(self, op: Optional[str] = None, default=None):
+        return _settings["timeouts"].get(op) or default or _settings["timeout"]
+
+    def request(self, method, path="", op=None, timeout=None, **kwargs):
+        kwargs.setdefault("auth", self.auth)
+        encode_json(kwargs)
+        with self.breaker.guard():
+            return self.session.request(
+                method,
+                self.base_url + path,
+                timeout=self.timeout_for(op, timeout),
+                **kwargs,
+            )
+
+    def get(self, path="", **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path="", **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    async def arequest(self, method, path="", op=None, timeout=None, **kwargs):
+        """Async counterpart of :meth:`request`, runs on the fan-out event loop."""
+        from shkeeper.services.async_backend import get_client
+
+        kwargs.setdefault("auth", self.auth)
+        encode_json(kwargs, body="content")
+        with self.breaker.guard():
+            return await get_client(self.base_url).request(
+                method,
+                self.base_url + path,
+                timeout=self.timeout_for(op, timeout),
+                **kwargs,
+            )
+
+    async def aget(self, path="", **kwargs):
+        return await self.arequest("GET", path, **kwargs)
+
+    async def apost(self, path="", **kwargs):
+        return await self.arequest("POST", path, **kwargs)
+
+
+def get_transport(host: str, auth=None, scheme: str = "http") -> BackendTransport:
+    key = (scheme, host, tuple(auth) if isinstance(auth, list) else auth)
+    with _lock:
+        transport = _transports.get(key)
+    if transport is None:
+        transport = BackendTransport(host, auth, scheme)
+        with _lock:
+            transport = _transports.setdefault(key, transport)
+    return transport
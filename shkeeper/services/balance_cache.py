@@ -0,0 +1,104 @@
+"""Short lived cache of wallet balances.
+
+A balance only changes when a transaction lands or a payout leaves, so reads
+are served from memory for up to ``ttl`` seconds and walletnotify / payouts
+drop the entry explicitly. Concurrent misses for the same crypto share one
+backend call.
+"""
+import asyncio
+import threading
+import time
+from typing import Dict
+
+import prometheus_client
+from prometheus_client.core import GaugeMetricFamily
+
+DEFAULT_TTL = 30
+
+_settings = {"ttl": DEFAULT_TTL}
+_entries: Dict[str, dict] = {}
+_locks: Dict[str, threading.Lock] = {}
+_tasks: Dict[str, asyncio.Future] = {}
+_lock = threading.Lock()
+
+cache_hits = prometheus_client.Counter(
+    "shkeeper_balance_cache_hits",
+    "Wallet balance reads served from cache",
+    ["crypto"],
+)
+cache_misses = prometheus_client.Counter(
+    "shkeeper_balance_cache_misses",
+    "Wallet balance reads that went to the backend",
+    ["crypto"],
+)
+
+
+def configure(ttl=None):
+    if ttl is not None:
+        _settings["ttl"] = float(ttl)
+
+
+def _lock_for(name) -> threading.Lock:
+    with _lock:
+        return _locks.setdefault(name, threading.Lock())
+
+
+def _cached(name, max_age):
+    entry = _entries.get(name)
+    if entry and time.monotonic() - entry["fetched_at"] < max_age:
+        cache_hits.labels(crypto=name).inc()
+        return entry
+    return None
+
+
+def _store(name, value):
+    # Some backends report a failed lookup as False, don't keep it around
+    if value is not False and value is not None:
+        _entries[name] = {"value": value, "fetched_at": time.monotonic()}
+    return value
+
+
+def get(crypto, max_age=None):
+    """Return the balance of ``crypto``, fetching it when older than ``max_age``."""
+    name = crypto.crypto
+    max_age = _settings["ttl"] if max_age is None else max_age
+    if entry := _cached(name, max_age):
+        return entry["value"]
+    with _lock_for(name):
+        if entry := _cached(name, max_age):
+            return entry["value"]
+        cache_misses.labels(crypto=name).inc()
+        return _store(name, crypto.balance())
+
+
+async def aget(crypto, max_age=None):
+    """Async :func:`get` built on ``crypto.abalance()``."""
+    name = crypto.crypto
+    max_age = _settings["ttl"] if max_age is None else max_age
+    if entry := _cached(name, max_age):
+        return entry["value"]
+    task = _tasks.get(name)
+    if task is None or task.done():
+        cache_misses.labels(crypto=name).inc()
+        task = _tasks[name] = asyncio.ensure_future(crypto.abalance())
+    return _store(name, await asyncio.shield(task))
+
+
+def invalidate(crypto_name):
+    _entries.pop(crypto_name, None)
+
+
+class _BalanceAgeCollector:
+    def collect(self):
+        age = GaugeMetricFamily(
+            "shkeeper_balance_cache_age_seconds",
+            "Age of the cached wallet balance",
+            labels=["crypto"],
+        )
+        now = time.monotonic()
+        for name, entry in list(_entries.items()):
+            age.add_metric([name], now - entry["fetched_at"])
+        yield age
+
+
+prometheus_client.REGISTRY.register(_BalanceAgeCollector())
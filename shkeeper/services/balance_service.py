@@ -1,38 +1,42 @@
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
 from decimal import Decimal
+from shkeeper.services import async_backend, balance_cache
 from shkeeper.services.crypto_cache import get_available_cryptos
 from shkeeper.modules.classes.crypto import Crypto
 from shkeeper.utils import format_decimal
 from shkeeper.models import ExchangeRate
 from flask import current_app
 
-def _build_balance(crypto_name: str, logger, app):
-    with app.app_context():
-        crypto = Crypto.instances.get(crypto_name)
-        if not crypto:
-            return None
-        fiat = "USD"
-        try:
-            rate = ExchangeRate.get(fiat, crypto_name).get_rate()
-            crypto_amount = Decimal(crypto.balance() or 0)
-            amount_fiat = crypto_amount * Decimal(rate)
-            server_status = crypto.getstatus()
-        except Exception as e:
-            logger.exception(f"_build_balance exception for {crypto_name}")
-            return None
-        return {
-            "name": crypto.crypto,
-            "display_name": crypto.display_name,
-            "amount_crypto": format_decimal(crypto_amount),
-            "rate": format_decimal(rate),
-            "fiat": fiat,
-            "amount_fiat": format_decimal(amount_fiat),
-            "server_status": server_status,
-        }
+async def _build_balance(crypto_name: str, logger):
+    crypto = Crypto.instances.get(crypto_name)
+    if not crypto:
+        return None
+    fiat = "USD"
+    try:
+        rate, balance, server_status = await asyncio.gather(
+            async_backend.run_sync(
+                lambda: ExchangeRate.get(fiat, crypto_name).get_rate()
+            ),
+            balance_cache.aget(crypto),
+            crypto.agetstatus(),
+        )
+        crypto_amount = Decimal(balance or 0)
+        amount_fiat = crypto_amount * Decimal(rate)
+    except Exception as e:
+        logger.exception(f"_build_balance exception for {crypto_name}")
+        return None
+    return {
+        "name": crypto.crypto,
+        "display_name": crypto.display_name,
+        "amount_crypto": format_decimal(crypto_amount),
+        "rate": format_decimal(rate),
+        "fiat": fiat,
+        "amount_fiat": format_decimal(amount_fiat),
+        "server_status": server_status,
+    }
 
 def get_balances(includes: list[str] | None):
-    app = current_app._get_current_object()
-    logger = app.logger
+    logger = current_app.logger
     data = get_available_cryptos()
     available_coins = data["filtered"]
     if includes:
@@ -42,9 +46,6 @@ def get_balances(includes: list[str] | None):
             return None, "No valid cryptos requested"
     else:
         target = sorted(available_coins)
-    with ThreadPoolExecutor() as executor:
-        results = list(
-            executor.map(lambda c: _build_balance(c, logger, app), target)
-        )
+    results = async_backend.gather([_build_balance(c, logger) for c in target])
     balances = [x for x in results if x]
     return balances, None
@@ -0,0 +1,73 @@
+"""Chain tip / status shared by all cryptos served by the same backend host.
+
+Token modules of one chain (ETH-USDT, ETH-USDC, ... on ethereum-shkeeper, the
+TRC-20 tokens on the Tron host, etc.) all report the same node status. The
+gateway of a host fetches it at most once per ``ttl`` seconds and hands the
+raw response to every token, concurrent callers wait for the fetch already
+in flight instead of starting their own.
+"""
+import asyncio
+import threading
+import time
+from typing import Dict
+
+DEFAULT_TTL = 10
+
+_settings = {"ttl": DEFAULT_TTL}
+_gateways: Dict[str, "ChainGateway"] = {}
+_lock = threading.Lock()
+
+
+def configure(ttl=None):
+    if ttl is not None:
+        _settings["ttl"] = float(ttl)
+
+
+class ChainGateway:
+    def __init__(self, host: str):
+        self.host = host
+        self._status = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._task = None
+
+    def _fresh(self):
+        return (
+            self._status is not None
+            and time.monotonic() - self._fetched_at < _settings["ttl"]
+        )
+
+    def _store(self, status):
+        self._status = status
+        self._fetched_at = time.monotonic()
+        return status
+
+    def status(self, fetch):
+        """Return the cached status or get a new one with ``fetch()``."""
+        if self._fresh():
+            return self._status
+        with self._lock:
+            if self._fresh():
+                return self._status
+            return self._store(fetch())
+
+    async def astatus(self, fetch):
+        """Async :meth:`status`, ``fetch()`` must return an awaitable."""
+        if self._fresh():
+            return self._status
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(fetch())
+        status = await asyncio.shield(self._task)
+        if not self._fresh():
+            self._store(status)
+        return status
+
+    def invalidate(self):
+        self._fetched_at = 0.0
+
+
+def get_gateway(host: str) -> ChainGateway:
+    with _lock:
+        if host not in _gateways:
+            _gateways[host] = ChainGateway(host)
+        return _gateways[host]
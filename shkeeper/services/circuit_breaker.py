@@ -0,0 +1,207 @@
+"""Per-host circuit breakers for backend calls.
+
+A breaker is closed while its host answers. Once the failure rate over the last
+``window`` calls reaches ``failure_rate`` it opens and every call fails at once
+with :class:`BackendUnavailable`. A background thread probes open hosts with a
+TCP connect; on success the breaker goes half-open and lets one real call
+through, which closes it again or sends it back to open.
+"""
+import asyncio
+import os
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import httpx
+import prometheus_client
+import requests
+
+from shkeeper.exceptions import BackendUnavailable
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUE = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+# Only transport level errors trip the breaker, an HTTP error response
+# still proves the backend is alive.
+FAILURE_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    httpx.TransportError,
+    ConnectionError,
+    socket.timeout,
+)
+
+circuit_state = prometheus_client.Gauge(
+    "shkeeper_backend_circuit_state",
+    "Backend circuit breaker state (0 closed, 1 open, 2 half-open)",
+    ["host"],
+)
+circuit_rejected = prometheus_client.Counter(
+    "shkeeper_backend_circuit_rejected",
+    "Backend calls rejected by an open circuit breaker",
+    ["host"],
+)
+
+_settings = {
+    "window": 20,
+    "min_calls": 5,
+    "failure_rate": 0.5,
+    "probe_interval": 5,
+    "probe_timeout": 2,
+}
+_breakers: Dict[str, "CircuitBreaker"] = {}
+_lock = threading.Lock()
+_prober = {"pid": None}
+# Collects the breakers whose call got cancelled, so a caller that cancelled on
+# its own deadline (async_backend) can still count it against the host
+cancelled_calls: ContextVar[Optional[List["CircuitBreaker"]]] = ContextVar(
+    "cancelled_calls", default=None
+)
+
+
+def configure(
+    window=None, min_calls=None, failure_rate=None, probe_interval=None
+):
+    if window is not None:
+        _settings["window"] = int(window)
+    if min_calls is not None:
+        _settings["min_calls"] = int(min_calls)
+    if failure_rate is not None:
+        _settings["failure_rate"] = float(failure_rate)
+    if probe_interval is not None:
+        _settings["probe_interval"] = float(probe_interval)
+
+
+class CircuitBreaker:
+    def __init__(self, host: str, default_port: int = 80):
+        self.host = host
+        name, _, port = host.partition(":")
+        self.address = (name, int(port) if port else default_port)
+        self.state = CLOSED
+        self.opened_at = None
+        self._trial_running = False
+        self._outcomes = deque(maxlen=_settings["window"])
+        self._lock = threading.Lock()
+        circuit_state.labels(host=host).set(_STATE_VALUE[CLOSED])
+
+    def _set_state(self, state):
+        self.state = state
+        circuit_state.labels(host=self.host).set(_STATE_VALUE[state])
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._outcomes.append(True)
+            if self.state == HALF_OPEN:
+                self._trial_running = False
+                self._outcomes.clear()
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._outcomes.append(False)
+            if self.state == HALF_OPEN:
+                self._trial_running = False
+                self._open()
+            elif self.state == CLOSED and len(self._outcomes) >= _settings[
+                "min_calls"
+            ]:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= _settings["failure_rate"]:
+                    self._open()
+
+    def release_trial(self):
+        """Let another call try a half-open host, recording no outcome."""
+        with self._lock:
+            self._trial_running = False
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self._set_state(OPEN)
+        _ensure_prober()
+
+    def probe(self):
+        """Check an open host with a plain TCP connect, half-open it on success."""
+        try:
+            with socket.create_connection(
+                self.address, timeout=_settings["probe_timeout"]
+            ):
+                pass
+        except OSError:
+            return False
+        with self._lock:
+            if self.state == OPEN:
+                self._set_state(HALF_OPEN)
+        return True
+
+    def reject(self):
+        circuit_rejected.labels(host=self.host).inc()
+        raise BackendUnavailable(f"Circuit breaker for {self.host} is {self.state}")
+
+    @contextmanager
+    def guard(self):
+        if not self.allow():
+            self.reject()
+        try:
+            yield
+        except FAILURE_EXCEPTIONS:
+            self.record_failure()
+            raise
+        except asyncio.CancelledError:
+            # a hedged or losing request was dropped, says nothing about the host
+            self.release_trial()
+            cancelled = cancelled_calls.get()
+            if cancelled is not None:
+                cancelled.append(self)
+            raise
+        except BaseException:
+            # Not a connectivity problem, don't leave a half-open trial hanging
+            self.record_success()
+            raise
+        else:
+            self.record_success()
+
+
+def get_breaker(host: str, default_port: int = 80) -> CircuitBreaker:
+    with _lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host, default_port)
+        return _breakers[host]
+
+
+def guard(host: str, default_port: int = 80):
+    return get_breaker(host, default_port).guard()
+
+
+def _probe_loop():
+    while True:
+        time.sleep(_settings["probe_interval"])
+        with _lock:
+            breakers = [b for b in _breakers.values() if b.state == OPEN]
+        for breaker in breakers:
+            breaker.probe()
+
+
+def _ensure_prober():
+    with _lock:
+        if _prober["pid"] == os.getpid():
+            return
+        _prober["pid"] = os.getpid()
+    threading.Thread(
+        target=_probe_loop, name="backend-circuit-probe", daemon=True
+    ).start()
@@ -1,7 +1,7 @@
-from concurrent.futures import ThreadPoolExecutor
 from operator import itemgetter
 from flask import current_app as app
 from shkeeper.modules.classes.crypto import Crypto
+from shkeeper.services import async_backend
 from shkeeper.services.cache_service import cache
 
 CACHE_TTL = 60  # seconds
@@ -9,11 +9,7 @@ CACHE_TTL = 60  # seconds
 def _fetch_available_cryptos():
     disable_on_lags = app.config.get("DISABLE_CRYPTO_WHEN_LAGS")
     cryptos = [c for c in Crypto.instances.values() if c.wallet.enabled]
-    def check_status(crypto):
-        return crypto, crypto.getstatus()
-
-    with ThreadPoolExecutor() as executor:
-        results = list(executor.map(check_status, cryptos))
+    results = zip(cryptos, async_backend.gather_statuses(cryptos))
 
     filtered = []
     crypto_list = []
@@ -0,0 +1,360 @@
+"""Receive addresses derived in-process from an account xpub.
+
+With <CRYPTO>_XPUB set, BTC/LTC/DOGE mkaddr() derives the next address of
+the external chain (<xpub>/0/i) locally, reserving the index with one UPDATE of
+the <CRYPTO>_xpub_index setting. The import_derived_addresses task imports
+watch-only addresses in bulk ahead of the reserved index, and only addresses
+the backend confirmed importing (up to <CRYPTO>_xpub_imported) are handed
+out. Invoice creation doesn't wait for the node, and when the imported
+addresses run out mkaddr() asks the backend for one as before.
+"""
+import hashlib
+import hmac
+from functools import cached_property
+from os import environ
+
+from cryptography.hazmat.primitives.asymmetric import ec
+from sqlalchemy.exc import IntegrityError
+
+from shkeeper import db
+
+# secp256k1
+_P = 2**256 - 2**32 - 977
+_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+
+_B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+
+# crypto -> ("p2wpkh", bech32 hrp) or ("p2pkh", version byte)
+NETWORKS = {
+    "BTC": ("p2wpkh", "bc"),
+    "LTC": ("p2wpkh", "ltc"),
+    "DOGE": ("p2pkh", 0x1E),
+}
+
+IMPORT_BATCH = 500
+# addresses kept imported past the last reserved index
+IMPORT_AHEAD = 500
+
+
+def _point_add(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a[0] == b[0] and (a[1] + b[1]) % _P == 0:
+        return None
+    if a == b:
+        slope = 3 * a[0] * a[0] * pow(2 * a[1], -1, _P)
+    else:
+        slope = (b[1] - a[1]) * pow(b[0] - a[0], -1, _P)
+    x = (slope * slope - a[0] - b[0]) % _P
+    return x, (slope * (a[0] - x) - a[1]) % _P
+
+
+def _base_mul(k):
+    # k*G through OpenSSL, the one expensive step of a derivation
+    numbers = ec.derive_private_key(k, ec.SECP256K1()).public_key().public_numbers()
+    return numbers.x, numbers.y
+
+
+def _decompress(pubkey: bytes):
+    x = int.from_bytes(pubkey[1:], "big")
+    y = pow((pow(x, 3, _P) + 7) % _P, (_P + 1) // 4, _P)
+    if y % 2 != pubkey[0] % 2:
+        y = _P - y
+    return x, y
+
+
+def _compress(point) -> bytes:
+    return bytes([2 + (point[1] & 1)]) + point[0].to_bytes(32, "big")
+
+
+# RIPEMD-160 message word order, rotations and constants, left and right lines
+_RMD_R = (
+    list(range(16))
+    + [7, 4, 13, 1, 10, 6, 15, 3, 12, 0, 9, 5, 2, 14, 11, 8]
+    + [3, 10, 14, 4, 9, 15, 8, 1, 2, 7, 0, 6, 13, 11, 5, 12]
+    + [1, 9, 11, 10, 0, 8, 12, 4, 13, 3, 7, 15, 14, 5, 6, 2]
+    + [4, 0, 5, 9, 7, 12, 2, 10, 14, 1, 3, 8, 11, 6, 15, 13]
+)
+_RMD_RR = (
+    [5, 14, 7, 0, 9, 2, 11, 4, 13, 6, 15, 8, 1, 10, 3, 12]
+    + [6, 11, 3, 7, 0, 13, 5, 10, 14, 15, 8, 12, 4, 9, 1, 2]
+    + [15, 5, 1, 3, 7, 14, 6, 9, 11, 8, 12, 2, 10, 0, 4, 13]
+    + [8, 6, 4, 1, 3, 11, 15, 0, 5, 12, 2, 13, 9, 7, 10, 14]
+    + [12, 15, 10, 4, 1, 5, 8, 7, 6, 2, 13, 14, 0, 3, 9, 11]
+)
+_RMD_S = (
+    [11, 14, 15, 12, 5, 8, 7, 9, 11, 13, 14, 15, 6, 7, 9, 8]
+    + [7, 6, 8, 13, 11, 9, 7, 15, 7, 12, 15, 9, 11, 7, 13, 12]
+    + [11, 13, 6, 7, 14, 9, 13, 15, 14, 8, 13, 6, 5, 12, 7, 5]
+    + [11, 12, 14, 15, 14, 15, 9, 8, 9, 14, 5, 6, 8, 6, 5, 12]
+    + [9, 15, 5, 11, 6, 8, 13, 12, 5, 12, 13, 14, 11, 8, 5, 6]
+)
+_RMD_SS = (
+    [8, 9, 9, 11, 13, 15, 15, 5, 7, 7, 8, 11, 14, 14, 12, 6]
+    + [9, 13, 15, 7, 12, 8, 9, 11, 7, 7, 12, 7, 6, 15, 13, 11]
+    + [9, 7, 15, 11, 8, 6, 6, 14, 12, 13, 5, 14, 13, 13, 7, 5]
+    + [15, 5, 8, 11, 14, 14, 6, 14, 6, 9, 12, 9, 12, 5, 15, 8]
+    + [8, 5, 12, 9, 12, 5, 14, 6, 8, 13, 6, 5, 15, 13, 11, 11]
+)
+_RMD_K = (0x00000000, 0x5A827999, 0x6ED9EBA1, 0x8F1BBCDC, 0xA953FD4E)
+_RMD_KK = (0x50A28BE6, 0x5C4DD124, 0x6D703EF3, 0x7A6D76E9, 0x00000000)
+_MASK32 = 0xFFFFFFFF
+
+
+def _rmd_f(j, x, y, z):
+    if j < 16:
+        return x ^ y ^ z
+    if j < 32:
+        return (x & y) | (~x & z)
+    if j < 48:
+        return (x | ~y & _MASK32) ^ z
+    if j < 64:
+        return (x & z) | (y & ~z)
+    return x ^ (y | ~z & _MASK32)
+
+
+def _rol(x, n):
+    return ((x << n) | (x >> (32 - n))) & _MASK32
+
+
+def _ripemd160_python(data: bytes) -> bytes:
+    h = [0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0]
+    padded = data + b"\x80" + b"\0" * ((55 - len(data)) % 64)
+    padded += (len(data) * 8).to_bytes(8, "little")
+    for block in range(0, len(padded), 64):
+        x = [
+            int.from_bytes(padded[block + i : block + i + 4], "little")
+            for i in range(0, 64, 4)
+        ]
+        al, bl, cl, dl, el = h
+        ar, br, cr, dr, er = h
+        for j in range(80):
+            t = al + _rmd_f(j, bl, cl, dl) + x[_RMD_R[j]] + _RMD_K[j // 16]
+            t = (_rol(t & _MASK32, _RMD_S[j]) + el) & _MASK32
+            al, el, dl, cl, bl = el, dl, _rol(cl, 10), bl, t
+            t = ar + _rmd_f(79 - j, br, cr, dr) + x[_RMD_RR[j]] + _RMD_KK[j // 16]
+            t = (_rol(t & _MASK32, _RMD_SS[j]) + er) & _MASK32
+            ar, er, dr, cr, br = er, dr, _rol(cr, 10), br, t
+        h = [
+            (h[1] + cl + dr) & _MASK32,
+            (h[2] + dl + er) & _MASK32,
+            (h[3] + el + ar) & _MASK32,
+            (h[4] + al + br) & _MASK32,
+            (h[0] + bl + cr) & _MASK32,
+        ]
+    return b"".join(v.to_bytes(4, "little") for v in h)
+
+
+def _ripemd160(data: bytes) -> bytes:
+    try:
+        return hashlib.new("ripemd160", data).digest()
+    except ValueError:
+        # OpenSSL 3 builds may ship without the legacy provider
+        return _ripemd160_python(data)
+
+
+def hash160(data: bytes) -> bytes:
+    return _ripemd160(hashlib.sha256(data).digest())
+
+
+def b58decode_check(value: str) -> bytes:
+    num = 0
+    for char in value:
+        num = num * 58 + _B58_ALPHABET.index(char)
+    raw = num.to_bytes((num.bit_length() + 7) // 8, "big")
+    raw = b"\0" * (len(value) - len(value.lstrip("1"))) + raw
+    payload, checksum = raw[:-4], raw[-4:]
+    if hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4] != checksum:
+        raise ValueError("bad base58 checksum")
+    return payload
+
+
+def b58encode_check(payload: bytes) -> str:
+    raw = payload + hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4]
+    num = int.from_bytes(raw, "big")
+    encoded = ""
+    while num:
+        num, rem = divmod(num, 58)
+        encoded = _B58_ALPHABET[rem] + encoded
+    return "1" * (len(raw) - len(raw.lstrip(b"\0"))) + encoded
+
+
+def _bech32_polymod(values):
+    generator = [0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3]
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1FFFFFF) << 5 ^ value
+        for i in range(5):
+            chk ^= generator[i] if ((top >> i) & 1) else 0
+    return chk
+
+
+def _convertbits(data, frombits, tobits):
+    acc = bits = 0
+    ret = []
+    maxv = (1 << tobits) - 1
+    for value in data:
+        acc = (acc << frombits) | value
+        bits += frombits
+        while bits >= tobits:
+            bits -= tobits
+            ret.append((acc >> bits) & maxv)
+    if bits:
+        ret.append((acc << (tobits - bits)) & maxv)
+    return ret
+
+
+def segwit_v0_address(hrp: str, program: bytes) -> str:
+    data = [0] + _convertbits(program, 8, 5)
+    expanded = [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+    polymod = _bech32_polymod(expanded + data + [0] * 6) ^ 1
+    checksum = [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + "1" + "".join(_BECH32_CHARSET[d] for d in data + checksum)
+
+
+class ExtendedPublicKey:
+    def __init__(self, xpub: str):
+        payload = b58decode_check(xpub)
+        if len(payload) != 78:
+            raise ValueError("not an extended public key")
+        self.chain_code = payload[13:45]
+        self.pubkey = payload[45:78]
+        if self.pubkey[0] not in (2, 3):
+            raise ValueError("extended key does not hold a public key")
+
+    @cached_property
+    def point(self):
+        return _decompress(self.pubkey)
+
+    def child(self, index) -> "ExtendedPublicKey":
+        digest = hmac.new(
+            self.chain_code, self.pubkey + index.to_bytes(4, "big"), hashlib.sha512
+        ).digest()
+        tweak = int.from_bytes(digest[:32], "big")
+        if not 0 < tweak < _N:
+            raise ValueError(f"invalid child {index}")
+        key = object.__new__(ExtendedPublicKey)
+        key.chain_code = digest[32:]
+        key.pubkey = _compress(_point_add(_base_mul(tweak), self.point))
+        return key
+
+    def derive(self, *path) -> bytes:
+        """Compressed public key at the non-hardened ``path``."""
+        key = self
+        for index in path:
+            key = key.child(index)
+        return key.pubkey
+
+
+def address_from_pubkey(crypto_name, pubkey: bytes) -> str:
+    kind, param = NETWORKS[crypto_name]
+    if kind == "p2wpkh":
+        return segwit_v0_address(param, hash160(pubkey))
+    return b58encode_check(bytes([param]) + hash160(pubkey))
+
+
+class XpubDeriver:
+    def __init__(self, crypto_name, xpub):
+        self.crypto_name = crypto_name
+        self.external_chain = ExtendedPublicKey(xpub).child(0)
+        self.index_setting = f"{crypto_name}_xpub_index"
+        self.imported_setting = f"{crypto_name}_xpub_imported"
+
+    def address(self, index) -> str:
+        return address_from_pubkey(self.crypto_name, self.external_chain.derive(index))
+
+    def _imported_index(self) -> int:
+        from shkeeper.models import Setting
+
+        imported = (
+            db.session.query(Setting.value)
+            .filter_by(name=self.imported_setting)
+            .scalar()
+        )
+        return int(imported) if imported is not None else -1
+
+    def reserve_index(self):
+        """Take the next unused imported index within the caller's transaction.
+
+        None when every address the backend imported is taken.
+        """
+        from shkeeper.models import Setting
+
+        imported = self._imported_index()
+        if imported < 0:
+            return None
+        while True:
+            updated = (
+                Setting.query.filter(
+                    Setting.name == self.index_setting,
+                    db.cast(Setting.value, db.Integer) < imported,
+                )
+                .update(
+                    {
+                        "value": db.cast(
+                            db.cast(Setting.value, db.Integer) + 1, db.String
+                        )
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if updated:
+                return int(
+                    db.session.query(Setting.value)
+                    .filter_by(name=self.index_setting)
+                    .scalar()
+                )
+            if (
+                db.session.query(Setting.name)
+                .filter_by(name=self.index_setting)
+                .scalar()
+            ):
+                return None
+            try:
+                with db.session.begin_nested():
+                    db.session.add(Setting(name=self.index_setting, value="0"))
+                return 0
+            except IntegrityError:
+                # another request created the setting first, take the next index
+                continue
+
+    def next_address(self):
+        if (index := self.reserve_index()) is None:
+            return None
+        return self.address(index)
+
+    def import_pending(self, crypto) -> int:
+        """Import the next derived addresses with ``crypto.import_addresses()``.
+
+        Keeps IMPORT_AHEAD addresses imported past the reserved index and
+        moves <CRYPTO>_xpub_imported only once the backend confirmed.
+        """
+        from shkeeper.models import Setting
+
+        reserved = Setting.query.get(self.index_setting)
+        reserved = int(reserved.value) if reserved else -1
+        start = self._imported_index() + 1
+        end = min(reserved + IMPORT_AHEAD, start + IMPORT_BATCH - 1)
+        if end < start:
+            return 0
+        addresses = [self.address(i) for i in range(start, end + 1)]
+        if not crypto.import_addresses(addresses):
+            return 0
+        if imported := Setting.query.get(self.imported_setting):
+            imported.value = str(end)
+        else:
+            db.session.add(Setting(name=self.imported_setting, value=str(end)))
+        db.session.commit()
+        return end - start + 1
+
+
+def get_deriver(crypto_name):
+    """The deriver of ``crypto_name`` when <CRYPTO>_XPUB is set, otherwise None."""
+    xpub = environ.get(f"{crypto_name}_XPUB")
+    if not xpub or crypto_name not in NETWORKS:
+        return None
+    return XpubDeriver(crypto_name, xpub)
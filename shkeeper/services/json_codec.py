@@ -0,0 +1,133 @@
+"""JSON codec shared by API responses and backend payloads.
+
+Decimals are written as strings, so amounts go out with every digit they
+have. With orjson installed encoding runs in C and only calls back into
+Python for the types orjson doesn't know (Decimal, and datetimes so Flask
+keeps formatting them as HTTP dates). Without it, or for options orjson has
+no equivalent of, the stdlib encoder is used. Non-ASCII characters are
+written as UTF-8 by both unless ``ensure_ascii=True`` is asked for, which
+only the stdlib encoder does.
+
+Decoding always goes through the stdlib with ``parse_float=Decimal``: orjson
+can only parse numbers to float, which is exactly what amounts must avoid.
+"""
+import json
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_settings = {"backend": "orjson" if orjson else "json"}
+
+# dumps() arguments the orjson path can honour
+_ORJSON_KWARGS = {"default", "sort_keys", "indent", "separators", "ensure_ascii"}
+_COMPACT = (",", ":")
+
+STREAM_CHUNK = 500
+
+
+def configure(backend=None):
+    if backend is not None:
+        _settings["backend"] = backend if backend == "json" or orjson else "json"
+
+
+def backend() -> str:
+    return _settings["backend"]
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _orjson_option(kwargs):
+    if _settings["backend"] != "orjson" or not kwargs.keys() <= _ORJSON_KWARGS:
+        return None
+    if kwargs.get("ensure_ascii"):
+        # orjson always writes UTF-8
+        return None
+    indent = kwargs.get("indent")
+    if indent not in (None, 2):
+        return None
+    if indent is None and kwargs.get("separators", _COMPACT) != _COMPACT:
+        return None
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if kwargs.get("sort_keys"):
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return option
+
+
+def dumpb(obj, **kwargs) -> bytes:
+    """``obj`` as UTF-8 JSON, takes the keyword arguments of ``json.dumps``."""
+    kwargs.setdefault("default", _default)
+    kwargs.setdefault("ensure_ascii", False)
+    option = _orjson_option(kwargs)
+    if option is not None:
+        try:
+            return orjson.dumps(obj, default=kwargs["default"], option=option)
+        except orjson.JSONEncodeError:
+            # integers past 64 bits and the like, the stdlib encoder copes
+            pass
+    kwargs.setdefault("separators", _COMPACT)
+    return json.dumps(obj, **kwargs).encode()
+
+
+def dumps(obj, **kwargs) -> str:
+    return dumpb(obj, **kwargs).decode()
+
+
+def loads(data, **kwargs):
+    kwargs.setdefault("parse_float", Decimal)
+    return json.loads(data, **kwargs)
+
+
+def iter_object(
+    fields, key, items, default=None, sort_keys=False, chunk_size=STREAM_CHUNK
+):
+    """Encode ``{**fields, key: list(items)}`` piece by piece.
+
+    Items are encoded ``chunk_size`` at a time, so a long array is never held
+    as one string and the first bytes are sent before the last item is read.
+    """
+    encode = dict(default=default or _default, sort_keys=sort_keys)
+    head = dumpb(fields, **encode)[:-1]
+    yield head + (b"," if fields else b"") + dumpb(key) + b":["
+    separator = b""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield separator + dumpb(chunk, **encode)[1:-1]
+            separator = b","
+            chunk = []
+    if chunk:
+        yield separator + dumpb(chunk, **encode)[1:-1]
+    yield b"]}\n"
+
+
+def stream_response(fields, key, items):
+    """Streamed JSON response of :func:`iter_object` for the current request.
+
+    The status line goes out before ``items`` is consumed, so an error while
+    reading them truncates the body instead of turning into an error reply.
+    Pass a list when errors have to be answered with one.
+    """
+    from flask import current_app, stream_with_context
+
+    return current_app.response_class(
+        stream_with_context(
+            iter_object(
+                fields,
+                key,
+                items,
+                default=current_app.json.default,
+                sort_keys=current_app.json.sort_keys,
+            )
+        ),
+        mimetype="application/json",
+    )
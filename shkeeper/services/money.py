@@ -0,0 +1,46 @@
+"""Amounts stored as integer atomic units.
+
+Crypto amounts are kept as integers scaled by the precision of their crypto
+(10**8 for most, 10**12 for XMR) and fiat amounts by FIAT_PRECISION, so sums
+and equality lookups are exact and no float goes through the database.
+
+Chains and tokens with more decimals than that (ETH, ERC20 and SOL tokens
+and so on) are kept to 8 places as well. Received amounts are rounded down to
+it, so the dropped digits can't make an underpaid invoice PAID, see
+models.Transaction.
+
+The precision of a stored crypto must not change without a migration that
+rescales its rows. PRECISION keeps the non-default ones so rows of a crypto
+whose module is disabled are still read with the right scale.
+"""
+from decimal import ROUND_HALF_EVEN, Decimal
+
+DEFAULT_PRECISION = 8
+FIAT_PRECISION = 8
+# cryptos whose Crypto.precision is not DEFAULT_PRECISION
+PRECISION = {"XMR": 12}
+
+
+def precision(crypto_name) -> int:
+    from shkeeper.modules.classes.crypto import Crypto
+
+    if crypto := Crypto.instances.get(crypto_name):
+        return crypto.precision
+    return PRECISION.get(crypto_name, DEFAULT_PRECISION)
+
+
+def to_units(amount, places, rounding=ROUND_HALF_EVEN) -> int:
+    """``amount`` in units of 10**-``places``, rounded to a whole unit."""
+    if isinstance(amount, float):
+        amount = str(amount)
+    return int(Decimal(amount).scaleb(places).to_integral_value(rounding))
+
+
+def from_units(units, places) -> Decimal:
+    return Decimal(units).scaleb(-places)
+
+
+def rescale(units, old_places, new_places) -> int:
+    if units is None or old_places == new_places:
+        return units
+    return to_units(from_units(units, old_places), new_places)
@@ -5,6 +5,7 @@ from flask import current_app as app
 from shkeeper import db
 from shkeeper.models import Payout
 from shkeeper.modules.classes.crypto import Crypto
+from shkeeper.services import balance_cache
 
 class PayoutService:
     @staticmethod
@@ -85,6 +86,8 @@ class PayoutService:
         except Exception as e:
             app.logger.error(f"[single_payout] mkpayout failed: {e}")
             raise
+        finally:
+            balance_cache.invalidate(crypto_name)
 
         task_id = res.get("task_id")
         txids = res.get("result", [])
@@ -115,7 +118,10 @@ class PayoutService:
             raise ValueError("Expected an array of payouts")
 
         crypto = cls.get_crypto(crypto_name)
-        res = crypto.multipayout(payout_list)
+        try:
+            res = crypto.multipayout(payout_list)
+        finally:
+            balance_cache.invalidate(crypto_name)
         task_id = res.get("task_id")
 
         created_ids = []
@@ -0,0 +1,138 @@
+"""Prices locked by the quote endpoint.
+
+A quote keeps its crypto amount and exchange rate for ``ttl`` seconds.
+payment_request called with its ``quote_id`` takes both from the quote instead
+of converting again, and uses the quote up. Quotes are cached in process and
+stored in the quote table for the other workers, using one deletes its row.
+"""
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app as app
+
+from shkeeper import db
+from shkeeper.services.ttl_cache import TTLCache
+
+LockedQuote = namedtuple(
+    "LockedQuote",
+    "id crypto fiat amount_fiat amount_crypto exchange_rate expires_at",
+)
+
+_settings = {"ttl": 600}
+_cache = TTLCache(maxsize=4096, ttl=_settings["ttl"])
+
+
+def configure(ttl=None):
+    if ttl is not None:
+        _settings["ttl"] = _cache.ttl = int(ttl)
+
+
+def _locked(quote) -> LockedQuote:
+    return LockedQuote(*(getattr(quote, field) for field in LockedQuote._fields))
+
+
+def create(crypto_name, fiat, amount_fiat) -> LockedQuote:
+    from shkeeper.models import ExchangeRate, Quote
+
+    amount_crypto, exchange_rate = ExchangeRate.get(fiat, crypto_name).convert(
+        amount_fiat
+    )
+    quote = Quote(
+        id=uuid.uuid4().hex,
+        crypto=crypto_name,
+        fiat=fiat,
+        amount_fiat=amount_fiat,
+        amount_crypto=amount_crypto,
+        exchange_rate=exchange_rate,
+        expires_at=datetime.utcnow() + timedelta(seconds=_settings["ttl"]),
+    )
+    # the stored amounts, as the other workers will read them
+    locked = _locked(quote)
+    db.session.add(quote)
+    db.session.commit()
+    _cache.set(locked.id, locked)
+    return locked
+
+
+def get(quote_id):
+    """The quote ``quote_id`` unless it is unknown, used or expired."""
+    from shkeeper.models import Quote
+
+    locked = _cache.get(quote_id)
+    if locked is None:
+        quote = Quote.query.get(quote_id)
+        if quote is None:
+            return None
+        locked = _locked(quote)
+        _cache.set(quote_id, locked)
+    if locked.expires_at <= datetime.utcnow():
+        return None
+    return locked
+
+
+def use(quote_id) -> bool:
+    """Spend the quote ``quote_id``, False if it is already used or expired.
+
+    Runs in the caller's transaction, the quote stays usable if it rolls back.
+    """
+    from shkeeper.models import Quote
+
+    _cache.pop(quote_id)
+    deleted = Quote.query.filter(
+        Quote.id == quote_id, Quote.expires_at > datetime.utcnow()
+    ).delete(synchronize_session=False)
+    return deleted == 1
+
+
+def delete_expired() -> int:
+    from shkeeper.models import Quote
+
+    deleted = Quote.query.filter(Quote.expires_at <= datetime.utcnow()).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+    return deleted
+
+
+def quote_all(fiat, amount_fiat, includes=None):
+    """Unlocked quotes of ``amount_fiat`` in every available crypto.
+
+    Reads the cached list of available cryptos and loads their exchange rate
+    settings in one query, the rates themselves come from the rate engine.
+    """
+    from shkeeper.models import ExchangeRate
+    from shkeeper.services.crypto_cache import get_available_cryptos
+
+    available = get_available_cryptos()["filtered"]
+    if includes:
+        includes = [c.strip().upper() for c in includes if c.strip()]
+        target = [c for c in includes if c in available]
+        if not target:
+            return None, "No valid cryptos requested"
+    else:
+        target = available
+
+    rates = {
+        rate.crypto: rate
+        for rate in ExchangeRate.query.filter(
+            ExchangeRate.fiat == fiat, ExchangeRate.crypto.in_(target)
+        )
+    }
+    results = []
+    for crypto_name in target:
+        if crypto_name not in rates:
+            continue
+        try:
+            amount_crypto, exchange_rate = rates[crypto_name].convert(amount_fiat)
+        except Exception as e:
+            app.logger.warning(f"Can't quote {amount_fiat} {fiat} in {crypto_name}: {e}")
+            continue
+        results.append(
+            {
+                "crypto": crypto_name,
+                "amount_crypto": str(amount_crypto),
+                "exchange_rate": str(exchange_rate),
+            }
+        )
+    return results, None
@@ -0,0 +1,183 @@
+"""Exchange rates refreshed in the background.
+
+The rates task refreshes every configured pair with one bulk request per rate
+source, so ``ExchangeRate.get_rate()`` is normally a dict lookup. A rate older
+than ``max_age`` is fetched inline, with concurrent readers of the same pair
+sharing that one call. While the source is failing, rates up to ``max_stale``
+seconds old are served instead of an error.
+
+In cross-rate mode only crypto/USD prices are asked from the configured
+sources. Other fiat prices are derived from them with the USD/fiat table of
+``fx_source``, so upstream requests grow with cryptos plus fiats rather than
+cryptos times fiats.
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Dict
+
+import prometheus_client
+from flask import current_app as app
+from prometheus_client.core import GaugeMetricFamily
+
+from shkeeper.modules.classes.rate_source import RateSource
+
+_settings = {
+    "max_age": 60,
+    "max_stale": 300,
+    "cross_fx": False,
+    "fx_source": "coinbase",
+}
+_entries: Dict[tuple, dict] = {}
+_locks: Dict[tuple, threading.Lock] = {}
+_lock = threading.Lock()
+
+rate_hits = prometheus_client.Counter(
+    "shkeeper_rate_cache_hits",
+    "Exchange rate reads served from the rate engine",
+    ["source"],
+)
+rate_misses = prometheus_client.Counter(
+    "shkeeper_rate_cache_misses",
+    "Exchange rate reads fetched inline from the rate source",
+    ["source"],
+)
+stale_reads = prometheus_client.Counter(
+    "shkeeper_rate_stale_reads",
+    "Exchange rate reads served past max_age because the source failed",
+    ["source"],
+)
+refresh_errors = prometheus_client.Counter(
+    "shkeeper_rate_refresh_errors",
+    "Failed bulk rate refreshes",
+    ["source"],
+)
+
+
+def configure(max_age=None, max_stale=None, cross_fx=None, fx_source=None):
+    if max_age is not None:
+        _settings["max_age"] = float(max_age)
+    if max_stale is not None:
+        _settings["max_stale"] = float(max_stale)
+    if cross_fx is not None:
+        _settings["cross_fx"] = bool(cross_fx)
+    if fx_source is not None:
+        _settings["fx_source"] = fx_source
+
+
+def _cross(fiat) -> bool:
+    return _settings["cross_fx"] and fiat != "USD"
+
+
+def _fx_source():
+    """Source of USD/fiat rates, asked as the fiat price of "USD"."""
+    return RateSource.instances[_settings["fx_source"]]
+
+
+def _fetch(source, fiat, crypto):
+    if _cross(fiat):
+        return get_rate(source, "USD", crypto) * get_rate(_fx_source(), fiat, "USD")
+    return source.get_rate(fiat, crypto)
+
+
+def _lock_for(key) -> threading.Lock:
+    with _lock:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def _fresh(entry, max_age):
+    return entry is not None and time.monotonic() - entry["fetched_at"] < max_age
+
+
+def _store(key, rate):
+    _entries[key] = {"rate": rate, "fetched_at": time.monotonic()}
+    return rate
+
+
+def get_rate(source, fiat, crypto):
+    """The ``fiat`` price of ``crypto`` from ``source``, a RateSource instance."""
+    key = (source.name, fiat, crypto)
+    if _fresh(entry := _entries.get(key), _settings["max_age"]):
+        rate_hits.labels(source=source.name).inc()
+        return entry["rate"]
+    with _lock_for(key):
+        if _fresh(entry := _entries.get(key), _settings["max_age"]):
+            rate_hits.labels(source=source.name).inc()
+            return entry["rate"]
+        rate_misses.labels(source=source.name).inc()
+        try:
+            return _store(key, _fetch(source, fiat, crypto))
+        except Exception:
+            if not _fresh(entry, _settings["max_stale"]):
+                raise
+            stale_reads.labels(source=source.name).inc()
+            app.logger.warning(
+                f"[Rates] {source.name} failed, serving stale {crypto}/{fiat} rate"
+            )
+            return entry["rate"]
+
+
+def cached_rate(source, fiat, crypto):
+    """The rate get_rate() would serve without fetching, None if there is none."""
+    entry = _entries.get((source.name, fiat, crypto))
+    return entry["rate"] if _fresh(entry, _settings["max_age"]) else None
+
+
+def refresh(pairs) -> int:
+    """Refresh (source, fiat, crypto) ``pairs``, returns the number refreshed."""
+    pairs = set(pairs)
+    derived = {p for p in pairs if _cross(p[1])}
+    if derived:
+        fx_source = _fx_source()
+        pairs -= derived
+        pairs |= {(source, "USD", crypto) for source, _, crypto in derived}
+        pairs |= {(fx_source, fiat, "USD") for _, fiat, _ in derived}
+
+    refreshed = _refresh(pairs)
+    for source, fiat, crypto in derived:
+        usd = _entries.get((source.name, "USD", crypto))
+        fx = _entries.get((fx_source.name, fiat, "USD"))
+        if _fresh(usd, _settings["max_age"]) and _fresh(fx, _settings["max_age"]):
+            _store((source.name, fiat, crypto), usd["rate"] * fx["rate"])
+            refreshed += 1
+    return refreshed
+
+
+def _refresh(pairs) -> int:
+    by_source = defaultdict(list)
+    for source, fiat, crypto in pairs:
+        by_source[source].append((fiat, crypto))
+
+    refreshed = 0
+    for source, source_pairs in by_source.items():
+        try:
+            rates = source.get_rates(source_pairs)
+        except Exception as e:
+            refresh_errors.labels(source=source.name).inc()
+            app.logger.warning(f"[Rates] {source.name} refresh failed: {e}")
+            continue
+        for (fiat, crypto), rate in rates.items():
+            _store((source.name, fiat, crypto), rate)
+        refreshed += len(rates)
+        if missing := set(source_pairs) - rates.keys():
+            app.logger.warning(f"[Rates] {source.name} has no rate for {missing}")
+    return refreshed
+
+
+class _RateAgeCollector:
+    def collect(self):
+        age = GaugeMetricFamily(
+            "shkeeper_rate_max_age_seconds",
+            "Age of the oldest cached exchange rate",
+            labels=["source"],
+        )
+        now = time.monotonic()
+        oldest = {}
+        for (source, _, _), entry in list(_entries.items()):
+            oldest[source] = max(oldest.get(source, 0), now - entry["fetched_at"])
+        for source, seconds in oldest.items():
+            age.add_metric([source], seconds)
+        yield age
+
+
+prometheus_client.REGISTRY.register(_RateAgeCollector())
@@ -0,0 +1,187 @@
+"""Exchange rate history.
+
+The rates task appends the current rate of every pair to a one minute bucket.
+The rate_history task averages finished minute buckets into hour buckets and
+hours into days, then drops buckets past their resolution's retention.
+:func:`rates_at` prices many timestamps with one range query per resolution,
+so past transactions can be priced without asking a rate source.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from shkeeper import db
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+EPOCH = datetime(1970, 1, 1)
+# coarser buckets filled per run, keeps a catch-up after downtime bounded
+ROLLUP_BUCKETS = 24
+# a bucket prices timestamps up to this many buckets after its start
+MAX_GAP = 2
+
+# days to keep each resolution, 0 keeps it forever
+_settings = {MINUTE: 2, HOUR: 365, DAY: 0}
+
+
+def configure(minute_days=None, hour_days=None, day_days=None):
+    for resolution, days in ((MINUTE, minute_days), (HOUR, hour_days), (DAY, day_days)):
+        if days is not None:
+            _settings[resolution] = int(days)
+
+
+def bucket_start(ts: datetime, resolution: int) -> datetime:
+    seconds = int((ts - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % resolution)
+
+
+def record(rates, now=None) -> int:
+    """Append (crypto, fiat, rate) points unless their minute already has one."""
+    from shkeeper.models import RateHistory
+
+    bucket = bucket_start(now or datetime.utcnow(), MINUTE)
+    seen = set(
+        db.session.query(RateHistory.crypto, RateHistory.fiat).filter_by(
+            resolution=MINUTE, bucket=bucket
+        )
+    )
+    added = 0
+    for crypto, fiat, rate in rates:
+        if rate is None or (crypto, fiat) in seen:
+            continue
+        seen.add((crypto, fiat))
+        db.session.add(
+            RateHistory(
+                crypto=crypto, fiat=fiat, resolution=MINUTE, bucket=bucket, rate=rate
+            )
+        )
+        added += 1
+    db.session.commit()
+    return added
+
+
+def _roll_up(finer, coarser, now) -> int:
+    from shkeeper.models import RateHistory
+
+    last = (
+        db.session.query(db.func.max(RateHistory.bucket))
+        .filter(RateHistory.resolution == coarser)
+        .scalar()
+    )
+    first_finer = db.session.query(db.func.min(RateHistory.bucket)).filter(
+        RateHistory.resolution == finer
+    )
+    if last is not None:
+        first_finer = first_finer.filter(
+            RateHistory.bucket >= last + timedelta(seconds=coarser)
+        )
+    first_finer = first_finer.scalar()
+    if first_finer is None:
+        return 0
+
+    start = bucket_start(first_finer, coarser)
+    end = min(
+        start + timedelta(seconds=coarser * ROLLUP_BUCKETS),
+        bucket_start(now, coarser),
+    )
+    if end <= start:
+        return 0
+
+    buckets = defaultdict(list)
+    rows = db.session.query(
+        RateHistory.crypto, RateHistory.fiat, RateHistory.bucket, RateHistory.rate
+    ).filter(
+        RateHistory.resolution == finer,
+        RateHistory.bucket >= start,
+        RateHistory.bucket < end,
+    )
+    for crypto, fiat, bucket, rate in rows:
+        buckets[(crypto, fiat, bucket_start(bucket, coarser))].append(rate)
+    db.session.add_all(
+        RateHistory(
+            crypto=crypto,
+            fiat=fiat,
+            resolution=coarser,
+            bucket=bucket,
+            rate=sum(rates) / len(rates),
+        )
+        for (crypto, fiat, bucket), rates in buckets.items()
+    )
+    db.session.commit()
+    return len(buckets)
+
+
+def _expire(now) -> int:
+    from shkeeper.models import RateHistory
+
+    deleted = 0
+    for resolution, days in _settings.items():
+        if days:
+            deleted += RateHistory.query.filter(
+                RateHistory.resolution == resolution,
+                RateHistory.bucket < now - timedelta(days=days),
+            ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def downsample(now=None) -> int:
+    """Roll finished buckets up and expire old ones, returns buckets added."""
+    now = now or datetime.utcnow()
+    added = _roll_up(MINUTE, HOUR, now) + _roll_up(HOUR, DAY, now)
+    _expire(now)
+    return added
+
+
+def _resolution_for(age: timedelta) -> int:
+    for resolution in (MINUTE, HOUR):
+        if age < timedelta(days=_settings[resolution]) or not _settings[resolution]:
+            return resolution
+    return DAY
+
+
+def rates_at(crypto, fiat, timestamps):
+    """Rates of ``crypto`` in ``fiat`` at each UTC timestamp, None where unknown.
+
+    Timestamps are looked up at the finest resolution still kept for their
+    age, falling back to coarser buckets where that one has a gap.
+    """
+    from shkeeper.models import RateHistory
+
+    now = datetime.utcnow()
+    by_resolution = defaultdict(list)
+    for i, ts in enumerate(timestamps):
+        by_resolution[_resolution_for(now - ts)].append(i)
+
+    result = [None] * len(timestamps)
+    for resolution, coarser in ((MINUTE, HOUR), (HOUR, DAY), (DAY, None)):
+        indexes = by_resolution.pop(resolution, None)
+        if not indexes:
+            continue
+        max_gap = timedelta(seconds=resolution * MAX_GAP)
+        wanted = [timestamps[i] for i in indexes]
+        rows = (
+            db.session.query(RateHistory.bucket, RateHistory.rate)
+            .filter(
+                RateHistory.crypto == crypto,
+                RateHistory.fiat == fiat,
+                RateHistory.resolution == resolution,
+                RateHistory.bucket > min(wanted) - max_gap,
+                RateHistory.bucket <= max(wanted),
+            )
+            .order_by(RateHistory.bucket)
+            .all()
+        )
+        buckets = [row.bucket for row in rows]
+        for i in indexes:
+            pos = bisect_right(buckets, timestamps[i]) - 1
+            if pos >= 0 and timestamps[i] - buckets[pos] < max_gap:
+                result[i] = rows[pos].rate
+            elif coarser:
+                by_resolution[coarser].append(i)
+    return result
+
+
+def rate_at(crypto, fiat, ts):
+    return rates_at(crypto, fiat, [ts])[0]
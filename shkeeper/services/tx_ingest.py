@@ -0,0 +1,153 @@
+"""Recording of wallet transactions reported by crypto backends.
+
+``/walletnotify`` hands over one transaction at a time, cryptos that can list
+their wallet history (see ``Crypto.pull_transactions``) hand over whole
+ranges. Both end up in :func:`ingest_tx`, so a transaction is recorded the
+same way whichever path sees it first.
+"""
+from flask import current_app as app
+from flask_sqlalchemy import sqlalchemy
+
+from shkeeper import db
+from shkeeper.callback import send_notification, send_unconfirmed_notification
+from shkeeper.exceptions import NotRelatedToAnyInvoice
+from shkeeper.models import Setting, Transaction, UnconfirmedTransaction
+from shkeeper.services import balance_cache
+
+# keep IN (...) lists below the sqlite bound parameter limit
+LOOKUP_CHUNK = 500
+
+
+def ingest_tx(crypto, txid, details):
+    """Record ``details`` of ``txid`` as returned by ``crypto.getaddrbytx()``.
+
+    Raises NotRelatedToAnyInvoice when a receive does not belong to an invoice.
+    """
+    for addr, amount, confirmations, category in details:
+        try:
+            if category not in ("send", "receive"):
+                app.logger.warning(
+                    f"[{crypto.crypto}/{txid}] ignoring unknown category: {category}"
+                )
+                continue
+
+            if category == "send":
+                Transaction.add_outgoing(crypto, txid)
+                continue
+
+            if confirmations == 0:
+                app.logger.info(
+                    f"[{crypto.crypto}/{txid}] TX has no confirmations yet (entered mempool)"
+                )
+
+                if app.config.get("UNCONFIRMED_TX_NOTIFICATION"):
+                    utx = UnconfirmedTransaction.add(
+                        crypto.crypto, txid, addr, amount
+                    )
+                    send_unconfirmed_notification(utx)
+
+                continue
+
+            tx = Transaction.add(
+                crypto,
+                {
+                    "txid": txid,
+                    "addr": addr,
+                    "amount": amount,
+                    "confirmations": confirmations,
+                },
+            )
+            tx.invoice.update_with_tx(tx)
+            UnconfirmedTransaction.delete(crypto.crypto, txid)
+            app.logger.info(f"[{crypto.crypto}/{txid}] TX has been added to db")
+            if not tx.need_more_confirmations:
+                send_notification(tx)
+        except sqlalchemy.exc.IntegrityError as e:
+            app.logger.warning(f"[{crypto.crypto}/{txid}] TX already exist in db")
+            db.session.rollback()
+
+
+def _known_txids(model, crypto_name, txids):
+    known = set()
+    txids = list(txids)
+    for i in range(0, len(txids), LOOKUP_CHUNK):
+        chunk = txids[i : i + LOOKUP_CHUNK]
+        rows = (
+            db.session.query(model.txid)
+            .filter(model.crypto == crypto_name, model.txid.in_(chunk))
+            .all()
+        )
+        known.update(row.txid for row in rows)
+    return known
+
+
+def ingest_many(crypto, txs):
+    """Record a batch of transactions, ``txs`` maps txid to getaddrbytx() details.
+
+    Transactions already in the db are skipped without touching the backend
+    or the rate sources. Returns the txids that failed and should be retried.
+    """
+    if not txs:
+        return set()
+
+    recorded = _known_txids(Transaction, crypto.crypto, txs)
+    pending = _known_txids(UnconfirmedTransaction, crypto.crypto, txs)
+
+    failed = set()
+    for txid, details in txs.items():
+        if txid in recorded:
+            continue
+        if txid in pending and all(d[2] == 0 for d in details):
+            continue
+        try:
+            ingest_tx(crypto, txid, details)
+        except NotRelatedToAnyInvoice:
+            app.logger.debug(f"[{crypto.crypto}/{txid}] not related to any invoice")
+        except Exception:
+            app.logger.exception(f"[{crypto.crypto}/{txid}] failed to ingest")
+            db.session.rollback()
+            failed.add(txid)
+
+    balance_cache.invalidate(crypto.crypto)
+    return failed
+
+
+def refresh_confirmations(crypto, confirmations, tip=None):
+    """Apply ``confirmations`` (txid to count) to transactions still waiting.
+
+    ``tip`` must be taken after the counts, see Crypto.block_height_from_confirmations().
+    """
+    txids = list(confirmations)
+    for i in range(0, len(txids), LOOKUP_CHUNK):
+        chunk = txids[i : i + LOOKUP_CHUNK]
+        waiting = Transaction.query.filter(
+            Transaction.crypto == crypto.crypto,
+            Transaction.txid.in_(chunk),
+            Transaction.need_more_confirmations == True,
+            Transaction.callback_confirmed == False,
+        ).all()
+        for tx in waiting:
+            try:
+                if not tx.is_more_confirmations_needed(confirmations[tx.txid], tip):
+                    app.logger.info(f"[{tx.crypto}/{tx.txid}] Got enough confirmations")
+            except Exception:
+                app.logger.exception(
+                    f"Exception while updating tx confirmations for {tx.crypto}/{tx.txid}"
+                )
+                db.session.rollback()
+
+
+def get_cursor(name):
+    if setting := Setting.query.get(name):
+        return setting.value
+    return None
+
+
+def set_cursor(name, value):
+    setting = Setting.query.get(name)
+    if not setting:
+        setting = Setting(name=name, value=str(value))
+        db.session.add(setting)
+    else:
+        setting.value = str(value)
+    db.session.commit()
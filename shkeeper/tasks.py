@@ -4,6 +4,7 @@ from datetime import timedelta, datetime
 from flask_apscheduler import APScheduler
 from shkeeper import scheduler, callback
 from shkeeper.modules.classes.crypto import Crypto
+from shkeeper.services import address_pool, quotes, rate_engine, rate_history
 from shkeeper.models import *
 
 @scheduler.task("interval", id="callback", seconds=60)
@@ -29,6 +30,93 @@ def task_send_payout_callback_notifier():
             return
         callback.send_payout_callback_notifier()
 
+@scheduler.task("interval", id="pull_transactions", seconds=60)
+def task_pull_transactions():
+    with scheduler.app.app_context():
+        for crypto in Crypto.instances.values():
+            if not crypto.wallet_created:
+                continue
+            try:
+                crypto.pull_transactions()
+            except Exception as e:
+                scheduler.app.logger.warning(
+                    f"[Pull transactions] {crypto.crypto} pull failed: {e}"
+                )
+
+@scheduler.task("interval", id="address_pool", seconds=10)
+def task_refill_address_pool():
+    with scheduler.app.app_context():
+        for crypto in Crypto.instances.values():
+            if not crypto.wallet_created or not address_pool.enabled(crypto):
+                continue
+            try:
+                if added := address_pool.refill(crypto):
+                    scheduler.app.logger.info(
+                        f"[Address pool] {crypto.crypto} added {added} addresses"
+                    )
+            except Exception as e:
+                db.session.rollback()
+                scheduler.app.logger.warning(
+                    f"[Address pool] {crypto.crypto} refill failed: {e}"
+                )
+
+
+@scheduler.task("interval", id="import_derived_addresses", seconds=10)
+def task_import_derived_addresses():
+    with scheduler.app.app_context():
+        for crypto in Crypto.instances.values():
+            if not crypto.wallet_created or not crypto.xpub_deriver:
+                continue
+            try:
+                if imported := crypto.xpub_deriver.import_pending(crypto):
+                    scheduler.app.logger.info(
+                        f"[Derived addresses] {crypto.crypto} imported {imported} addresses"
+                    )
+            except Exception as e:
+                db.session.rollback()
+                scheduler.app.logger.warning(
+                    f"[Derived addresses] {crypto.crypto} import failed: {e}"
+                )
+
+
+@scheduler.task("interval", id="refresh_rates", seconds=30)
+def task_refresh_rates():
+    with scheduler.app.app_context():
+        # disabled wallets take no invoices, keep their sources out of it
+        enabled = db.session.query(Wallet.crypto).filter(
+            Wallet.crypto.in_(list(Crypto.instances)), Wallet.enabled.is_(True)
+        )
+        rates = ExchangeRate.query.filter(ExchangeRate.crypto.in_(enabled)).all()
+        dynamic = [r for r in rates if r.source != "manual"]
+        rate_engine.refresh((r.rate_source, r.fiat, r.crypto) for r in dynamic)
+        rate_history.record(
+            (
+                r.crypto,
+                r.fiat,
+                r.rate
+                if r.source == "manual"
+                else rate_engine.cached_rate(r.rate_source, r.fiat, r.crypto),
+            )
+            for r in rates
+        )
+
+
+@scheduler.task("interval", id="rate_history", seconds=600)
+def task_downsample_rate_history():
+    with scheduler.app.app_context():
+        try:
+            rate_history.downsample()
+        except Exception as e:
+            db.session.rollback()
+            scheduler.app.logger.warning(f"[Rate history] downsampling failed: {e}")
+
+
+@scheduler.task("interval", id="expired_quotes", seconds=600)
+def task_delete_expired_quotes():
+    with scheduler.app.app_context():
+        quotes.delete_expired()
+
+
 @scheduler.task("interval", id="payout", seconds=60)
 def task_payout():
     scheduler.app.logger.info(f"[Autopayout] Task started")
@@ -39,10 +127,10 @@ def task_payout():
                     f"[Autopayout] {crypto.crypto} payout policy is {crypto.wallet.ppolicy}"
                 )
                 limit = Decimal(crypto.wallet.pcond)
-                if crypto.balance() >= limit:
+                if crypto.cached_balance() >= limit:
                     scheduler.app.logger.info(
                         f"[Autopayout] {crypto.crypto} payout limit reached. "
-                        f"Need: {limit}, has: {crypto.balance()}"
+                        f"Need: {limit}, has: {crypto.cached_balance()}"
                     )
                     res = crypto.wallet.do_payout()
                     scheduler.app.logger.info(
@@ -51,14 +139,14 @@ def task_payout():
                 else:
                     scheduler.app.logger.info(
                         f"[Autopayout] {crypto.crypto} payout limit is not reached. "
-                        f"Need: {limit}, has: {crypto.balance()}"
+                        f"Need: {limit}, has: {crypto.cached_balance()}"
                     )
 
             elif crypto.wallet.ppolicy == PayoutPolicy.SCHEDULED:
                 scheduler.app.logger.info(
                     f"[Autopayout] {crypto.crypto} payout policy is {crypto.wallet.ppolicy}"
                 )
-                if crypto.balance() == 0:
+                if crypto.cached_balance() == 0:
                     scheduler.app.logger.info(
                         f"[Autopayout] {crypto.crypto} has no coins"
                     )
@@ -1,12 +1,19 @@
-from decimal import Decimal
+from decimal import ROUND_HALF_EVEN, Context, Decimal
+
+_PLACES = Decimal("1e-10")
+_CONTEXT = Context(prec=100, rounding=ROUND_HALF_EVEN)
 
 
 def remove_exponent(d: Decimal) -> str:
-    # return d.quantize(Decimal(1)) if d == d.to_integral() else d.normalize()
-    try:
-        return ("%.10f" % d).rstrip("0").rstrip(".")
-    except TypeError:
+    # rounds the Decimal itself, "%.10f" went through float and dropped digits
+    if isinstance(d, (int, float)):
+        d = Decimal(d)
+    if not isinstance(d, Decimal):
         return "0"
+    if not d.is_finite():
+        return str(float(d))
+    text = format(d.quantize(_PLACES, context=_CONTEXT), "f")
+    return text.rstrip("0").rstrip(".") if "." in text else text
 
 
 def format_decimal(d: Decimal, precision: int = 8, st: bool = False) -> str:
@@ -1,5 +1,4 @@
 from collections import defaultdict
-import concurrent.futures
 import copy
 import csv
 from decimal import Decimal, InvalidOperation
@@ -21,6 +20,7 @@ from flask import current_app as app
 import prometheus_client
 
 from shkeeper import db
+from shkeeper.services import async_backend
 from shkeeper.auth import login_required, metrics_basic_auth
 from shkeeper.wallet_encryption import (
     wallet_encryption,
@@ -608,16 +608,8 @@ def metrics():
             seen.add(crypto.__class__.__base__)
             unique_cryptos.append(crypto)
 
-    # Fetch all crypto node metrics in parallel
-    crypto_metrics = ""
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = {executor.submit(crypto.metrics): crypto for crypto in unique_cryptos}
-        for future in concurrent.futures.as_completed(futures):
-            crypto = futures[future]
-            try:
-                crypto_metrics += future.result()
-            except Exception as e:
-                app.logger.warning(f"metrics() failed for {crypto.crypto}: {e}")
+    # Fetch all crypto node metrics concurrently
+    crypto_metrics = "".join(async_backend.gather_metrics(unique_cryptos))
 
     # Shkeeper metrics
     crypto_metrics += prometheus_client.generate_latest().decode()
@@ -0,0 +1,64 @@
+from __future__ import annotations
+import importlib.util
+import unittest
+from pathlib import Path
+
+
+def _load_backend_transport_from_path():
+    root = Path(__file__).resolve().parents[1]
+    path = root / "shkeeper" / "services" / "backend_transport.py"
+    spec = importlib.util.spec_from_file_location(
+        "shkeeper_services_backend_transport_testonly", path
+    )
+    assert spec and spec.loader
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+try:
+    import requests  # noqa: F401
+except ImportError:  # pragma: no cover
+    raise unittest.SkipTest("requests is not installed")
+
+try:
+    from shkeeper.services import backend_transport as bt
+except Exception:  # noqa: BLE001 — shkeeper/__init__ pulls Flask/DB; tests only need this module
+    bt = _load_backend_transport_from_path()
+
+
+class TestParseTimeouts(unittest.TestCase):
+    def test_parses_env_string(self) -> None:
+        self.assertEqual(
+            bt.parse_timeouts("getstatus=3, metrics=5.5"),
+            {"getstatus": 3.0, "metrics": 5.5},
+        )
+
+    def test_ignores_empty_and_malformed_items(self) -> None:
+        self.assertEqual(bt.parse_timeouts(""), {})
+        self.assertEqual(bt.parse_timeouts("balance,=,mkpayout=60"), {"mkpayout": 60.0})
+
+
+class TestTransportPool(unittest.TestCase):
+    def setUp(self) -> None:
+        bt.configure(timeout=10, timeouts={"getstatus": 2})
+
+    def tearDown(self) -> None:
+        bt.configure(timeout=bt.DEFAULT_TIMEOUT, timeouts={})
+
+    def test_same_host_shares_session(self) -> None:
+        a = bt.get_transport("backend-a:6000", ("user", "pass"))
+        b = bt.get_transport("backend-a:6000", ["other", "creds"])
+        self.assertIsNot(a, b)
+        self.assertIs(a.session, b.session)
+        self.assertIs(a, bt.get_transport("backend-a:6000", ("user", "pass")))
+
+    def test_per_method_timeout(self) -> None:
+        t = bt.get_transport("backend-b:6000")
+        self.assertEqual(t.timeout_for("getstatus"), 2)
+        self.assertEqual(t.timeout_for("balance"), 10)
+        self.assertEqual(t.timeout_for("balance", 60), 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+from __future__ import annotations
+import unittest
+
+try:
+    from shkeeper.modules.cryptos.bitcoin_lightning import decode_bolt11
+except ImportError:  # pragma: no cover
+    raise unittest.SkipTest("shkeeper dependencies are not installed")
+
+# test vectors of BOLT #11
+PAYMENT_HASH = "0001020304050607080900010203040506070809000102030405060708090102"
+WITH_AMOUNT = (
+    "lnbc2500u1pvjluezsp5zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zygs"
+    "pp5qqqsyqcyq5rqwzqfqqqsyqcyq5rqwzqfqqqsyqcyq5rqwzqfqypqdq5xysxxatsyp3k7en"
+    "xv4jsxqzpu9qrsgquk0rl77nj30yxdy8j9vdx85fkpmdla2087ne0xh8nhedh8w27kyke0lp"
+    "53ut353s06fv3qfegext0eh0ymjpf39tuven09sam30g4vgpfna3rh"
+)
+WITHOUT_AMOUNT = (
+    "lnbc1pvjluezsp5zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zygspp5qqq"
+    "syqcyq5rqwzqfqqqsyqcyq5rqwzqfqqqsyqcyq5rqwzqfqypqdpl2pkx2ctnv5sxxmmwwd5kg"
+    "etjypeh2ursdae8g6twvus8g6rfwvs8qun0dfjkxaq9qrsgq357wnc5r2ueh7ck6q93dj32d"
+    "lqnls087fxdwk8qakdyafkq3yap9us6v52vjjsrvywa6rt52cm9r9zqt8r2t7mlcwspyetp5"
+    "h2tztugp9lfyql"
+)
+
+
+class TestDecodeBolt11(unittest.TestCase):
+    def test_amount_hash_and_expiry(self) -> None:
+        decoded = decode_bolt11(WITH_AMOUNT)
+        self.assertEqual(decoded["payment_hash"], PAYMENT_HASH)
+        self.assertEqual(decoded["num_satoshis"], "250000")
+        self.assertEqual(decoded["timestamp"], "1496314658")
+        self.assertEqual(decoded["expiry"], "60")
+
+    def test_zero_amount_request(self) -> None:
+        decoded = decode_bolt11(WITHOUT_AMOUNT)
+        self.assertEqual(decoded["payment_hash"], PAYMENT_HASH)
+        self.assertEqual(decoded["num_msat"], "0")
+        self.assertEqual(decoded["expiry"], "3600")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+import asyncio
+import unittest
+
+try:
+    import requests
+
+    from shkeeper.services import async_backend
+    from shkeeper.services import circuit_breaker as cb
+except ImportError:  # pragma: no cover
+    raise unittest.SkipTest("shkeeper dependencies are not installed")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self) -> None:
+        cb.configure(window=10, min_calls=4, failure_rate=0.5)
+        self.breaker = cb.CircuitBreaker("test-backend:1")
+        # keep the background prober out of unit tests
+        self.breaker._open = lambda: self.breaker._set_state(cb.OPEN)
+
+    def _fail(self) -> None:
+        with self.assertRaises(ConnectionRefusedError):
+            with self.breaker.guard():
+                raise ConnectionRefusedError()
+
+    def test_opens_on_failure_rate(self) -> None:
+        with self.breaker.guard():
+            pass
+        for _ in range(2):
+            self._fail()
+        self.assertEqual(self.breaker.state, cb.CLOSED)
+        self._fail()
+        self.assertEqual(self.breaker.state, cb.OPEN)
+        with self.assertRaises(cb.BackendUnavailable):
+            with self.breaker.guard():
+                self.fail("call must not run while open")
+
+    def test_half_open_allows_single_trial(self) -> None:
+        self.breaker._set_state(cb.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, cb.CLOSED)
+
+    def test_half_open_failure_reopens(self) -> None:
+        self.breaker._set_state(cb.HALF_OPEN)
+        self._fail()
+        self.assertEqual(self.breaker.state, cb.OPEN)
+
+    def test_http_level_errors_do_not_count(self) -> None:
+        for _ in range(5):
+            with self.assertRaises(KeyError):
+                with self.breaker.guard():
+                    raise KeyError("status")
+        self.assertEqual(self.breaker.state, cb.CLOSED)
+
+    def test_client_errors_do_not_count(self) -> None:
+        for exc in (requests.exceptions.InvalidURL, requests.exceptions.MissingSchema):
+            for _ in range(3):
+                with self.assertRaises(exc):
+                    with self.breaker.guard():
+                        raise exc("bad url")
+        self.assertEqual(self.breaker.state, cb.CLOSED)
+
+    def test_cancellation_is_not_an_outcome(self) -> None:
+        self.breaker._set_state(cb.HALF_OPEN)
+        with self.assertRaises(asyncio.CancelledError):
+            with self.breaker.guard():
+                raise asyncio.CancelledError()
+        self.assertEqual(self.breaker.state, cb.HALF_OPEN)
+        self.assertEqual(len(self.breaker._outcomes), 0)
+        self.assertTrue(self.breaker.allow())
+
+    def test_fanout_deadline_counts_as_failure(self) -> None:
+        async def hung():
+            with self.breaker.guard():
+                await asyncio.sleep(60)
+
+        results = async_backend.gather(
+            [hung() for _ in range(4)], deadline=0.05, default="Offline"
+        )
+        self.assertEqual(results, ["Offline"] * 4)
+        self.assertEqual(self.breaker.state, cb.OPEN)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+import unittest
+
+try:
+    from shkeeper.services.hd_wallet import (
+        ExtendedPublicKey,
+        _ripemd160_python,
+        address_from_pubkey,
+    )
+except ImportError:  # pragma: no cover
+    raise unittest.SkipTest("shkeeper dependencies are not installed")
+
+# BIP84 test vector, account m/84'/0'/0'
+ZPUB = (
+    "zpub6rFR7y4Q2AijBEqTUquhVz398htDFrtymD9xYYfG1m4wAcvPhXNfE3EfH1r1ADqtf"
+    "SdVCToUG868RvUUkgDKf31mGDtKsAYz2oz2AGutZYs"
+)
+
+
+class TestHdWallet(unittest.TestCase):
+    def test_bip84_receive_addresses(self) -> None:
+        key = ExtendedPublicKey(ZPUB)
+        self.assertEqual(
+            address_from_pubkey("BTC", key.derive(0, 0)),
+            "bc1qcr8te4kr609gcawutmrza0j4xv80jy8z306fyu",
+        )
+        self.assertEqual(
+            address_from_pubkey("BTC", key.derive(0, 1)),
+            "bc1qnjg0jd8228aq7egyzacy8cys3knf9xvrerkf9g",
+        )
+
+    def test_bad_checksum_is_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            ExtendedPublicKey(ZPUB[:-1] + "t")
+
+    def test_python_ripemd160(self) -> None:
+        self.assertEqual(
+            _ripemd160_python(b"").hex(), "9c1185a5c5e9fc54612808977ee8f548b2258d31"
+        )
+        self.assertEqual(
+            _ripemd160_python(b"message digest").hex(),
+            "5d0689ef49d2fae572b881b123a85ffa21595f36",
+        )
+        self.assertEqual(
+            _ripemd160_python(b"1234567890" * 8).hex(),
+            "9b752e45573d4b39f4dbd3323cab82bf63326bfb",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
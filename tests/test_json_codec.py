@@ -0,0 +1,70 @@
+from __future__ import annotations
+import json
+import unittest
+from decimal import Decimal
+
+try:
+    from shkeeper.services import json_codec
+    from shkeeper.utils import remove_exponent
+except ImportError:  # pragma: no cover
+    raise unittest.SkipTest("shkeeper dependencies are not installed")
+
+
+class TestJSONCodec(unittest.TestCase):
+    def tearDown(self) -> None:
+        json_codec.configure(backend="orjson")
+
+    def test_backends_agree(self) -> None:
+        obj = {"b": Decimal("0.123456789012345678901"), "a": [1, "x", None]}
+        outputs = set()
+        for backend in ("json", "orjson"):
+            json_codec.configure(backend=backend)
+            outputs.add(json_codec.dumps(obj, sort_keys=True))
+        self.assertEqual(len(outputs), 1)
+        self.assertIn('"b":"0.123456789012345678901"', outputs.pop())
+
+    def test_backends_agree_on_non_ascii(self) -> None:
+        obj = {"name": "Łukasz €"}
+        for ensure_ascii in (False, True):
+            outputs = set()
+            for backend in ("json", "orjson"):
+                json_codec.configure(backend=backend)
+                outputs.add(json_codec.dumps(obj, ensure_ascii=ensure_ascii))
+            self.assertEqual(len(outputs), 1)
+        self.assertEqual(json_codec.dumps(obj), '{"name":"Łukasz €"}')
+
+    def test_loads_keeps_decimal_digits(self) -> None:
+        self.assertEqual(
+            json_codec.loads('{"amount": 0.1000000000000000000001}'),
+            {"amount": Decimal("0.1000000000000000000001")},
+        )
+
+    def test_streamed_object_matches_dumps(self) -> None:
+        items = [{"amount": Decimal(i) / 7} for i in range(11)]
+        streamed = b"".join(
+            json_codec.iter_object({"status": "success"}, "txs", items, chunk_size=4)
+        )
+        self.assertEqual(
+            json.loads(streamed, parse_float=Decimal),
+            json.loads(json_codec.dumpb({"status": "success", "txs": items})),
+        )
+        self.assertEqual(
+            b"".join(json_codec.iter_object({}, "txs", [])), b'{"txs":[]}\n'
+        )
+
+
+class TestRemoveExponent(unittest.TestCase):
+    def test_exact_formatting(self) -> None:
+        self.assertEqual(
+            remove_exponent(Decimal("123456789012345678.1234567891")),
+            "123456789012345678.1234567891",
+        )
+        self.assertEqual(remove_exponent(Decimal("1E+3")), "1000")
+        self.assertEqual(remove_exponent(Decimal("0.00000000005")), "0")
+        self.assertEqual(remove_exponent(Decimal("0.00000000015")), "0.0000000002")
+        self.assertEqual(remove_exponent(0.1), "0.1")
+        self.assertEqual(remove_exponent(None), "0")
+
+
+if __name__ == "__main__":
+    unittest.main()
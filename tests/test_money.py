@@ -0,0 +1,46 @@
+from __future__ import annotations
+import unittest
+from decimal import ROUND_DOWN, Decimal
+
+try:
+    from shkeeper import models
+    from shkeeper.services import money
+except ImportError:  # pragma: no cover
+    raise unittest.SkipTest("shkeeper dependencies are not installed")
+
+
+class TestMoney(unittest.TestCase):
+    def test_units_round_trip(self) -> None:
+        self.assertEqual(money.to_units(Decimal("1.23456789"), 8), 123456789)
+        self.assertEqual(money.from_units(123456789, 8), Decimal("1.23456789"))
+        self.assertEqual(money.to_units("0.1", 12), 100000000000)
+        self.assertEqual(money.to_units(0.1, 8), 10000000)
+
+    def test_rounding(self) -> None:
+        self.assertEqual(money.to_units(Decimal("0.000000025"), 8), 2)
+        self.assertEqual(money.to_units(Decimal("0.000000035"), 8), 4)
+        self.assertEqual(
+            money.to_units(Decimal("0.000000019"), 8, rounding=ROUND_DOWN), 1
+        )
+
+    def test_rescale(self) -> None:
+        self.assertEqual(money.rescale(123456789, 8, 12), 1234567890000)
+        self.assertEqual(money.rescale(123456789012, 12, 8), 12345679)
+        self.assertIsNone(money.rescale(None, 8, 12))
+
+    def test_precision_of_disabled_crypto(self) -> None:
+        self.assertEqual(money.precision("XMR"), 12)
+        self.assertEqual(money.precision("NOT-A-CRYPTO"), money.DEFAULT_PRECISION)
+
+    def test_received_amounts_round_down(self) -> None:
+        tx = models.Transaction(crypto="ETH")
+        tx.amount_crypto = Decimal("0.099999999999999999")
+        tx.amount_fiat = tx.amount_crypto * Decimal("3000.123456789")
+        self.assertEqual(tx.amount_crypto, Decimal("0.09999999"))
+        self.assertEqual(tx.amount_fiat, Decimal("300.01231567"))
+        invoice = models.Invoice(crypto="ETH", amount_crypto=Decimal("0.099999995"))
+        self.assertEqual(invoice.amount_crypto, Decimal("0.10000000"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+import time
+import unittest
+from decimal import Decimal
+
+try:
+    from shkeeper.modules.rates import aggregate
+    from shkeeper.modules.classes.rate_source import RateSource
+except ImportError:  # pragma: no cover
+    raise unittest.SkipTest("shkeeper dependencies are not installed")
+
+
+class FakeSource:
+    def __init__(self, name, rate, delay=0.0) -> None:
+        self.name = name
+        self.rate = Decimal(rate)
+        self.delay = delay
+
+    def get_rate(self, fiat, crypto):
+        time.sleep(self.delay)
+        return self.rate
+
+
+class TestAggregate(unittest.TestCase):
+    def setUp(self) -> None:
+        self.source = RateSource.instances["aggregate"]
+        self.saved = dict(aggregate._settings)
+        aggregate.configure(quorum=2, hedge_delay=0.05)
+
+    def tearDown(self) -> None:
+        aggregate._settings.update(self.saved)
+        for name in ("fake1", "fake2", "fake3"):
+            RateSource.instances.pop(name, None)
+
+    def _use(self, *sources) -> None:
+        for source in sources:
+            RateSource.instances[source.name] = source
+        aggregate.configure(sources=",".join(source.name for source in sources))
+
+    def test_slow_source_is_hedged(self) -> None:
+        self._use(
+            FakeSource("fake1", "100", delay=1),
+            FakeSource("fake2", "101"),
+            FakeSource("fake3", "102"),
+        )
+        started = time.monotonic()
+        self.assertEqual(self.source.get_rate("USD", "BTC"), Decimal("101.5"))
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_outlier_is_dropped(self) -> None:
+        self.assertEqual(
+            aggregate.median_without_outliers(
+                [Decimal("100"), Decimal("101"), Decimal("150")]
+            ),
+            Decimal("100.5"),
+        )
+
+    def test_disagreement_asks_a_third_source(self) -> None:
+        self._use(
+            FakeSource("fake1", "100"),
+            FakeSource("fake2", "150"),
+            FakeSource("fake3", "101"),
+        )
+        self.assertEqual(self.source.get_rate("USD", "BTC"), Decimal("100.5"))
+        with self.assertRaises(Exception):
+            aggregate.median_without_outliers([Decimal("100"), Decimal("150")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+import threading
+import time
+import unittest
+from decimal import Decimal
+
+try:
+    from flask import Flask
+
+    from shkeeper.modules.classes.rate_source import RateSource
+    from shkeeper.services import rate_engine
+except ImportError:  # pragma: no cover
+    raise unittest.SkipTest("shkeeper dependencies are not installed")
+
+
+class FakeSource:
+    name = "fake"
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.failing = False
+
+    def get_rate(self, fiat, crypto):
+        self.calls += 1
+        time.sleep(0.05)
+        if self.failing:
+            raise Exception("source is down")
+        return Decimal("100")
+
+    def get_rates(self, pairs):
+        self.calls += 1
+        # the price of "USD" is this source's USD/fiat table
+        return {
+            (fiat, crypto): Decimal("0.5" if crypto == "USD" else "200")
+            for fiat, crypto in pairs
+        }
+
+
+class TestRateEngine(unittest.TestCase):
+    def setUp(self) -> None:
+        rate_engine._entries.clear()
+        rate_engine.configure(max_age=60, max_stale=300)
+        self.source = FakeSource()
+        self.ctx = Flask(__name__).app_context()
+        self.ctx.push()
+
+    def tearDown(self) -> None:
+        rate_engine.configure(cross_fx=False)
+        RateSource.instances.pop("fake", None)
+        self.ctx.pop()
+
+    def test_concurrent_misses_share_one_fetch(self) -> None:
+        threads = [
+            threading.Thread(
+                target=rate_engine.get_rate, args=(self.source, "USD", "BTC")
+            )
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.source.calls, 1)
+
+    def test_refresh_fills_every_pair_in_one_call(self) -> None:
+        pairs = [(self.source, "USD", "BTC"), (self.source, "EUR", "BTC")]
+        self.assertEqual(rate_engine.refresh(pairs), 2)
+        self.assertEqual(rate_engine.get_rate(self.source, "EUR", "BTC"), 200)
+        self.assertEqual(self.source.calls, 1)
+
+    def test_stale_rate_is_served_while_source_fails(self) -> None:
+        rate_engine.refresh([(self.source, "USD", "BTC")])
+        rate_engine.configure(max_age=0)
+        self.source.failing = True
+        self.assertEqual(rate_engine.get_rate(self.source, "USD", "BTC"), 200)
+        rate_engine.configure(max_stale=0)
+        with self.assertRaises(Exception):
+            rate_engine.get_rate(self.source, "USD", "BTC")
+
+    def test_cross_rates_are_derived_from_usd(self) -> None:
+        RateSource.instances["fake"] = self.source
+        rate_engine.configure(cross_fx=True, fx_source="fake")
+        pairs = [(self.source, fiat, "BTC") for fiat in ("USD", "EUR", "TRY")]
+        rate_engine.refresh(pairs)
+        self.assertEqual(self.source.calls, 1)
+        self.assertEqual(rate_engine.get_rate(self.source, "USD", "BTC"), 200)
+        self.assertEqual(rate_engine.get_rate(self.source, "TRY", "BTC"), 100)
+        self.assertEqual(self.source.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
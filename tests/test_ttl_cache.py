@@ -0,0 +1,32 @@
+from __future__ import annotations
+import time
+import unittest
+
+try:
+    from shkeeper.services.ttl_cache import TTLCache
+except ImportError:  # pragma: no cover
+    raise unittest.SkipTest("shkeeper dependencies are not installed")
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_entries_expire(self) -> None:
+        cache = TTLCache(ttl=0.05)
+        cache.set("lnurl", {"callback": "https://example.com/cb"})
+        self.assertEqual(cache.get("lnurl"), {"callback": "https://example.com/cb"})
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("lnurl"))
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_is_evicted(self) -> None:
+        cache = TTLCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()